@@ -1,21 +1,44 @@
 """Darker - apply black reformatting to only areas edited since the last commit"""
 
 import logging
+import os
 import sys
+import time
+from contextlib import ExitStack
 from difflib import unified_diff
 from pathlib import Path
-from typing import Generator, Iterable, List, Tuple
+from typing import TYPE_CHECKING, Dict, Generator, Iterable, List, Optional, Tuple
 
-from darker.black_diff import BlackArgs, run_black
-from darker.chooser import choose_lines
-from darker.command_line import ISORT_INSTRUCTION, parse_command_line
+from darker.chooser import choose_lines, map_edited_linenums
+from darker.command_line import (
+    ISORT_INSTRUCTION,
+    is_isort_installed,
+    parse_command_line,
+)
 from darker.config import dump_config
-from darker.diff import diff_and_get_opcodes, opcodes_to_chunks
-from darker.git import EditedLinenumsDiffer, RevisionRange, git_get_modified_files
-from darker.import_sorting import apply_isort, isort
-from darker.linting import run_linter
-from darker.utils import TextDocument, get_common_root
-from darker.verification import NotEquivalentError, verify_ast_unchanged
+from darker.diff import LineInterner, diff_and_get_opcodes, opcodes_to_chunks
+from darker.git import (
+    WORKTREE,
+    EditedLinenumsCache,
+    EditedLinenumsDiffer,
+    RevisionRange,
+    git_get_modified_files,
+)
+from darker.git_bundle import record_git, remove_option, replay_git
+from darker.linting import (
+    LinterOptions,
+    cancel_linters,
+    get_linter_options,
+    parse_linter_options,
+    run_linter,
+    start_linters,
+)
+from darker.profiling import FileProfiler
+from darker.stats import STATS
+from darker.utils import DiffChunk, TextDocument, get_common_root
+
+if TYPE_CHECKING:
+    from darker.black_diff import BlackArgs
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +48,14 @@ def format_edited_parts(
     revrange: RevisionRange,
     enable_isort: bool,
     linter_cmdlines: List[str],
-    black_args: BlackArgs,
+    black_args: "BlackArgs",
+    *,
+    write_back: bool = False,
+    linter_options: Dict[str, LinterOptions] = None,
+    profiler: FileProfiler = None,
+    format_regions: bool = False,
+    parallel_threshold: int = 0,
+    lint_edited_linenums: EditedLinenumsCache = None,
 ) -> Generator[Tuple[Path, TextDocument, TextDocument], None, None]:
     """Black (and optional isort) formatting for chunks with edits since the last commit
 
@@ -49,12 +79,38 @@ def format_edited_parts(
     12. extract line numbers in each file reported by a linter for changed lines
     13. print only linter error lines which fall on changed lines
 
+    Edited line numbers found in steps 2. and 3. are mapped through the chunks chosen in
+    step 7. so steps 11. and 12. don't need to diff files again. For files which are
+    reformatted, the caller must call ``lint_edited_linenums.mark_written()`` after
+    writing the file for the mapped line numbers to be used.
+
+    Steps 5. to 8. are skipped if Black didn't change the file, or if all lines of the
+    file are edited and Black's output is used as it is.
+
+    If reformatted files aren't going to be written back, the working tree stays intact
+    and step 10. is done as soon as modified files are known. Linters then run in the
+    background while files are being reformatted, and their output is printed at the
+    end.
+
     :param srcs: Directories and files to re-format
     :param revrange: The Git revision against which to compare the working tree
     :param enable_isort: ``True`` to also run ``isort`` first on each changed file
     :param linter_cmdlines: The command line(s) for running linters on the changed
                             files.
     :param black_args: Command-line arguments to send to ``black.FileMode``
+    :param write_back: ``True`` if the caller will write the changes into files in the
+                       working tree, or ``False`` if it will only report them
+    :param linter_options: Options for running linters, keyed by linter name
+    :param profiler: A profiler for saving profiles of files which are slow to process,
+                     or ``None`` to not profile
+    :param format_regions: ``True`` to only run Black on the top-level and class-level
+                           statements which enclose edited lines, and on the whole file
+                           only if that fails
+    :param parallel_threshold: Split files with at least this many lines into pieces,
+                               and run Black on them in parallel, or ``0`` to always
+                               run Black on whole files
+    :param lint_edited_linenums: Edited line numbers of files for filtering linter
+                                 output, or ``None`` to always compute them from files
     :return: A generator which yields details about changes for each file which should
              be reformatted, and skips unchanged files.
 
@@ -62,92 +118,249 @@ def format_edited_parts(
     git_root = get_common_root(srcs)
     changed_files = git_get_modified_files(srcs, revrange, git_root)
     edited_linenums_differ = EditedLinenumsDiffer(git_root, revrange)
+    # Edited line numbers for each file are computed once and shared by all linters
+    if lint_edited_linenums is None:
+        lint_edited_linenums = EditedLinenumsCache(git_root, revrange)
+    # Linters check the working tree unless the revision range ends at a commit. Only
+    # in the former case do edits found while reformatting apply to linted files.
+    reuse_edited_linenums = bool(linter_cmdlines) and revrange.rev2 == WORKTREE
+    if not write_back:
+        # 10. start linter subprocesses for all edited files already now, since linters
+        #     read files from the working tree and it won't be modified
+        print_linter_output = start_linters(
+            linter_cmdlines,
+            git_root,
+            changed_files,
+            revrange,
+            linter_options,
+            lint_edited_linenums,
+        )
+
+    if not changed_files:
+        # There's nothing to reformat or lint
+        return
+
+    # Black is slow to import, so only do it when there are files to reformat
+    # pylint: disable=import-outside-toplevel
+    from darker.black_diff import run_black
+    from darker.verification import NotEquivalentError, verify_ast_unchanged
 
     for path_in_repo in sorted(changed_files):
-        src = git_root / path_in_repo
-        worktree_content = TextDocument.from_file(src)
-
-        # 1. run isort
-        if enable_isort:
-            edited = apply_isort(
-                worktree_content,
-                src,
-                black_args.get("config"),
-                black_args.get("line_length"),
-            )
-        else:
-            edited = worktree_content
-        max_context_lines = len(edited.lines)
-        for context_lines in range(max_context_lines + 1):
-            # 2. diff the given revision and worktree for the file
-            # 3. extract line numbers in the edited to-file for changed lines
-            edited_linenums = edited_linenums_differ.revision_vs_lines(
-                path_in_repo, edited, context_lines
-            )
-            if enable_isort and not edited_linenums and edited == worktree_content:
-                logger.debug("No changes in %s after isort", src)
-                break
-
-            # 4. run black
-            formatted = run_black(src, edited, black_args)
-            logger.debug("Read %s lines from edited file %s", len(edited.lines), src)
-            logger.debug("Black reformat resulted in %s lines", len(formatted.lines))
-
-            # 5. get the diff between the edited and reformatted file
-            opcodes = diff_and_get_opcodes(edited, formatted)
-
-            # 6. convert the diff into chunks
-            black_chunks = list(opcodes_to_chunks(opcodes, edited, formatted))
-
-            # 7. choose reformatted content
-            chosen = TextDocument.from_lines(
-                choose_lines(black_chunks, edited_linenums),
-                encoding=worktree_content.encoding,
-                newline=worktree_content.newline,
-            )
-
-            # 8. verify
-            logger.debug(
-                "Verifying that the %s original edited lines and %s reformatted lines "
-                "parse into an identical abstract syntax tree",
-                len(edited.lines),
-                len(chosen.lines),
-            )
-            try:
-                verify_ast_unchanged(edited, chosen, black_chunks, edited_linenums)
-            except NotEquivalentError:
-                # Diff produced misaligned chunks which couldn't be reconstructed into
-                # a partially re-formatted Python file which produces an identical AST.
-                # Try again with a larger `-U<context_lines>` option for `git diff`,
-                # or give up if `context_lines` is already very large.
-                if context_lines == max_context_lines:
-                    raise
+        file_start_time = time.perf_counter()
+        if profiler:
+            profiler.start()
+        context_lines = 0
+        try:
+            src = git_root / path_in_repo
+            worktree_content = TextDocument.from_file(src)
+            STATS.count("bytes_read", src.stat().st_size, src)
+
+            # 1. run isort
+            if enable_isort:
+                from darker.import_sorting import apply_isort
+
+                with STATS.time_stage("isort", src):
+                    edited = apply_isort(
+                        worktree_content,
+                        src,
+                        black_args.get("config"),
+                        black_args.get("line_length"),
+                    )
+            else:
+                edited = worktree_content
+            # Both diffs of the file compare integer identifiers of lines instead of
+            # lines
+            interner = LineInterner()
+            # Black's output for the whole file doesn't depend on the number of context
+            # lines, so it's computed at most once even if reformatting is retried
+            whole_file_formatted: Optional[TextDocument] = None
+            whole_file_in_pieces = False
+            max_context_lines = edited.line_count
+            for context_lines in range(max_context_lines + 1):
+                # 2. diff the given revision and worktree for the file
+                # 3. extract line numbers in the edited to-file for changed lines
+                with STATS.time_stage("git_diff", src):
+                    edited_linenums = edited_linenums_differ.revision_vs_lines(
+                        path_in_repo, edited, context_lines, interner
+                    )
+                if context_lines == 0:
+                    unformatted_edited_linenums = edited_linenums
+                if enable_isort and not edited_linenums and edited == worktree_content:
+                    logger.debug("No changes in %s after isort", src)
+                    if reuse_edited_linenums:
+                        lint_edited_linenums.set(path_in_repo, [])
+                    chosen = worktree_content
+                    break
+
+                # 4. run black
+                with STATS.time_stage("black", src):
+                    formatted = None
+                    if format_regions:
+                        from darker.regions import run_black_for_regions
+
+                        STATS.count("black_invocations", path=src)
+                        formatted = run_black_for_regions(
+                            src, edited, black_args, edited_linenums
+                        )
+                        if formatted is None:
+                            STATS.count("black_region_fallbacks", path=src)
+                    formatted_in_pieces = False
+                    if formatted is None:
+                        if whole_file_formatted is None:
+                            STATS.count("black_invocations", path=src)
+                            workers = os.cpu_count() or 1
+                            if (
+                                workers > 1
+                                and 0 < parallel_threshold <= edited.line_count
+                            ):
+                                from darker.regions import run_black_in_parallel
+
+                                whole_file_formatted = run_black_in_parallel(
+                                    src, edited, black_args, workers
+                                )
+                                whole_file_in_pieces = whole_file_formatted is not None
+                            if whole_file_formatted is None:
+                                whole_file_formatted = run_black(
+                                    src, edited, black_args
+                                )
+                        formatted = whole_file_formatted
+                        formatted_in_pieces = whole_file_in_pieces
                 logger.debug(
-                    "AST verification failed. "
-                    "Trying again with %s lines of context for `git diff -U`",
-                    context_lines + 1,
+                    "Read %s lines from edited file %s", edited.line_count, src
                 )
-                continue
-            else:
-                # 9. A re-formatted Python file which produces an identical AST was
-                #    created successfully - write an updated file or print the diff if
-                #    there were any changes to the original
-                if chosen != worktree_content:
-                    yield src, worktree_content, chosen
-                break
+                logger.debug(
+                    "Black reformat resulted in %s lines", formatted.line_count
+                )
+
+                black_chunks: List[DiffChunk]
+                verify = False
+                if formatted == edited:
+                    # Steps 5.-8. aren't needed if Black didn't change anything
+                    logger.debug("Black made no changes to %s", src)
+                    STATS.count("fast_path_unchanged", path=src)
+                    black_chunks = [(1, edited.lines, edited.lines)]
+                    chosen_lines: Iterable[str] = edited.lines
+                elif not formatted_in_pieces and edited_linenums == list(
+                    range(1, edited.line_count + 1)
+                ):
+                    # Every line is edited, e.g. in a new file, so all of Black's output
+                    # is chosen as one chunk. Only output of pieces formatted in
+                    # parallel needs to be verified as a whole.
+                    logger.debug(
+                        "All lines of %s are edited, using Black's output", src
+                    )
+                    STATS.count("fast_path_all_edited", path=src)
+                    black_chunks = [(1, edited.lines, formatted.lines)]
+                    chosen_lines = formatted.lines
+                else:
+                    with STATS.time_stage("chunks", src):
+                        # 5. get the diff between the edited and reformatted file
+                        opcodes = diff_and_get_opcodes(edited, formatted, interner)
+
+                        # 6. convert the diff into chunks
+                        black_chunks = list(
+                            opcodes_to_chunks(opcodes, edited, formatted)
+                        )
+
+                    # 7. choose reformatted content
+                    with STATS.time_stage("choose", src):
+                        chosen_lines = list(choose_lines(black_chunks, edited_linenums))
+                    verify = True
+                chosen = TextDocument.from_lines(
+                    chosen_lines,
+                    encoding=worktree_content.encoding,
+                    newline=worktree_content.newline,
+                )
+
+                try:
+                    if verify:
+                        # 8. verify
+                        logger.debug(
+                            "Verifying that the %s original edited lines and %s"
+                            " reformatted lines parse into an identical abstract syntax"
+                            " tree",
+                            edited.line_count,
+                            chosen.line_count,
+                        )
+                        with STATS.time_stage("verify", src):
+                            verify_ast_unchanged(
+                                edited, chosen, black_chunks, edited_linenums
+                            )
+                except NotEquivalentError:
+                    # Diff produced misaligned chunks which couldn't be reconstructed
+                    # into a partially re-formatted Python file which produces an
+                    # identical AST. Try again with a larger `-U<context_lines>` option
+                    # for `git diff`, or give up if `context_lines` is already very
+                    # large.
+                    if context_lines == max_context_lines:
+                        raise
+                    logger.debug(
+                        "AST verification failed. "
+                        "Trying again with %s lines of context for `git diff -U`",
+                        context_lines + 1,
+                    )
+                    STATS.count("context_retries", path=src)
+                    continue
+                else:
+                    # Record edited lines of the resulting file for steps 11. and 12.
+                    if (
+                        reuse_edited_linenums
+                        and write_back
+                        and chosen != worktree_content
+                    ):
+                        # The diff of ``rev1`` to the edited content is still cached
+                        old, old_opcodes = edited_linenums_differ.diff_to_revision(
+                            path_in_repo, edited, interner
+                        )
+                        mapped_linenums = map_edited_linenums(
+                            black_chunks, edited_linenums, old.lines, old_opcodes
+                        )
+                        lint_edited_linenums.set_unwritten(
+                            path_in_repo, list(mapped_linenums)
+                        )
+                    elif reuse_edited_linenums and edited == worktree_content:
+                        lint_edited_linenums.set(
+                            path_in_repo, unformatted_edited_linenums
+                        )
+                    break
+        finally:
+            # Stop before yielding so time spent by the caller isn't counted for the
+            # file, and also if reformatting fails
+            if profiler:
+                profiler.stop(path_in_repo, context_retries=context_lines)
+        STATS.add_span(str(path_in_repo), "file", file_start_time)
+        # 9. A re-formatted Python file which produces an identical AST was created
+        #    successfully - write an updated file or print the diff if there were any
+        #    changes to the original
+        if chosen != worktree_content:
+            yield src, worktree_content, chosen
     # 10. run linter subprocesses for all edited files (11.-14. optional)
     # 11. diff the given revision and worktree (after isort and Black reformatting) for
     #     each file reported by a linter
     # 12. extract line numbers in each file reported by a linter for changed lines
     # 13. print only linter error lines which fall on changed lines
-    for linter_cmdline in linter_cmdlines:
-        run_linter(linter_cmdline, git_root, changed_files, revrange)
+    with STATS.time_stage("lint"):
+        if write_back:
+            for linter_cmdline in linter_cmdlines:
+                run_linter(
+                    linter_cmdline,
+                    git_root,
+                    changed_files,
+                    revrange,
+                    get_linter_options(linter_cmdline, linter_options),
+                    lint_edited_linenums,
+                )
+        else:
+            print_linter_output()
 
 
 def modify_file(path: Path, new_content: TextDocument) -> None:
     """Write new content to a file and inform the user by logging"""
     logger.info("Writing %s bytes into %s", len(new_content.string), path)
-    path.write_bytes(new_content.encoded_string)
+    with STATS.time_stage("write", path):
+        encoded_string = new_content.encoded_string
+        path.write_bytes(encoded_string)
+    STATS.count("bytes_written", len(encoded_string), path)
 
 
 def print_diff(path: Path, old: TextDocument, new: TextDocument) -> None:
@@ -182,6 +395,10 @@ def main(argv: List[str] = None) -> int:
     if argv is None:
         argv = sys.argv[1:]
     args, config, config_nondefault = parse_command_line(argv)
+    if args.replay:
+        with replay_git(Path(args.replay)) as recorded_argv:
+            return main(recorded_argv + remove_option(argv, "--replay"))
+    STATS.reset(trace=bool(args.trace))
     logging.basicConfig(level=args.log_level)
     if args.log_level == logging.INFO:
         formatter = logging.Formatter("%(levelname)s: %(message)s")
@@ -197,11 +414,11 @@ def main(argv: List[str] = None) -> int:
         print(dump_config(config_nondefault))
         print("\n")
 
-    if args.isort and not isort:
+    if args.isort and not is_isort_installed():
         logger.error(f"{ISORT_INSTRUCTION} to use the `--isort` option.")
         exit(1)
 
-    black_args = BlackArgs()
+    black_args: "BlackArgs" = {}
     if args.config:
         black_args["config"] = args.config
     if args.line_length:
@@ -212,14 +429,45 @@ def main(argv: List[str] = None) -> int:
     paths = {Path(p) for p in args.src}
     some_files_changed = False
     revrange = RevisionRange.parse(args.revision)
-    for path, old, new in format_edited_parts(
-        paths, revrange, args.isort, args.lint, black_args
-    ):
-        some_files_changed = True
-        if args.diff:
-            print_diff(path, old, new)
-        if not args.check and not args.diff:
-            modify_file(path, new)
+    write_back = not args.check and not args.diff
+    linter_options = parse_linter_options(
+        args.lint_shards, args.lint_backend, args.lint_cache, args.lint_baseline
+    )
+    profiler = (
+        FileProfiler(Path(args.profile_dir), args.profile_threshold)
+        if args.profile_dir
+        else None
+    )
+    lint_edited_linenums = EditedLinenumsCache(get_common_root(paths), revrange)
+    with ExitStack() as stack:
+        # Don't leave linters running in the background if reformatting fails
+        stack.callback(cancel_linters)
+        if args.record:
+            stack.enter_context(record_git(argv, config, Path(args.record)))
+        for path, old, new in format_edited_parts(
+            paths,
+            revrange,
+            args.isort,
+            args.lint,
+            black_args,
+            write_back=write_back,
+            linter_options=linter_options,
+            profiler=profiler,
+            format_regions=args.format_regions,
+            parallel_threshold=args.parallel_threshold,
+            lint_edited_linenums=lint_edited_linenums,
+        ):
+            some_files_changed = True
+            if args.diff:
+                print_diff(path, old, new)
+            if write_back:
+                modify_file(path, new)
+                lint_edited_linenums.mark_written(path)
+    STATS.log_summary()
+    if args.stats:
+        STATS.write_json(Path(args.stats))
+    if args.trace:
+        STATS.write_trace(Path(args.trace))
     return 1 if args.check and some_files_changed else 0
 
 
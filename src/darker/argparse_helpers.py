@@ -2,9 +2,9 @@
 
 import logging
 import re
-from argparse import Action, ArgumentParser, HelpFormatter, Namespace
+from argparse import Action, ArgumentParser, ArgumentTypeError, HelpFormatter, Namespace
 from textwrap import fill
-from typing import Any, List, Sequence, Union
+from typing import Any, Callable, Collection, List, Sequence, Union
 
 WORD_RE = re.compile(r"\w")
 
@@ -67,3 +67,39 @@ class LogLevelAction(Action):  # pylint: disable=too-few-public-methods
         new_level = max(new_level, logging.DEBUG)
         new_level = min(new_level, logging.CRITICAL)
         setattr(namespace, self.dest, new_level)
+
+
+def name_and_positive_int(value: str) -> str:
+    """Validate a ``NAME=N`` command line argument where ``N`` is a positive integer
+
+    The value is returned intact so it can be stored in configuration as a string.
+
+    """
+    name, equals, number = value.partition("=")
+    if not name or not equals or not number.isdigit() or int(number) < 1:
+        raise ArgumentTypeError(
+            f"expected NAME=N with a positive integer N, got {value!r}"
+        )
+    return value
+
+
+def name_and_choice(choices: Collection[str]) -> Callable[[str], str]:
+    """Return a validator for ``NAME=CHOICE`` command line arguments
+
+    The validator returns the value intact so it can be stored in configuration as a
+    string.
+
+    :param choices: The allowed values after the equals sign
+
+    """
+
+    def validate(value: str) -> str:
+        name, equals, choice = value.partition("=")
+        if not name or not equals or choice not in choices:
+            raise ArgumentTypeError(
+                f"expected NAME=CHOICE with CHOICE one of {', '.join(choices)},"
+                f" got {value!r}"
+            )
+        return value
+
+    return validate
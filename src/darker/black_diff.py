@@ -89,15 +89,10 @@ def read_black_config(src: Path, value: Optional[str]) -> BlackArgs:
     )
 
 
-def run_black(
-    src: Path, src_contents: TextDocument, black_args: BlackArgs
-) -> TextDocument:
-    """Run the black formatter for the Python source code given as a string
-
-    Return lines of the original file as well as the formatted content.
+def get_black_mode(src: Path, black_args: BlackArgs) -> Mode:
+    """Combine Black configuration for a file with command line arguments
 
     :param src: The originating file path for the source code
-    :param src_contents: The source code
     :param black_args: Command-line arguments to send to ``black.FileMode``
 
     """
@@ -119,7 +114,22 @@ def run_black(
 
     # Override defaults and pyproject.toml settings if they've been specified
     # from the command line arguments
-    mode = Mode(**effective_args)
+    return Mode(**effective_args)
+
+
+def run_black(
+    src: Path, src_contents: TextDocument, black_args: BlackArgs
+) -> TextDocument:
+    """Run the black formatter for the Python source code given as a string
+
+    Return lines of the original file as well as the formatted content.
+
+    :param src: The originating file path for the source code
+    :param src_contents: The source code
+    :param black_args: Command-line arguments to send to ``black.FileMode``
+
+    """
+    mode = get_black_mode(src, black_args)
     return TextDocument.from_str(
         format_str(src_contents.string, mode=mode),
         encoding=src_contents.encoding,
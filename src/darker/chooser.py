@@ -30,14 +30,16 @@ Example::
 """
 
 import logging
-from typing import Generator, Iterable, List
+from difflib import SequenceMatcher
+from typing import Generator, Iterable, List, Sequence, Tuple
 
+from darker.diff import opcodes_to_edit_linenums
 from darker.utils import DiffChunk
 
 logger = logging.getLogger(__name__)
 
 
-def _any_item_in_range(items: List[int], start: int, length: int) -> bool:
+def _has_item_in_range(items: List[int], start: int, length: int) -> bool:
     """Return ``True`` if any item falls inside the slice ``[start : start + length]``
 
     If ``length == 0``, add one to make sure an edit at the position of an inserted
@@ -45,7 +47,13 @@ def _any_item_in_range(items: List[int], start: int, length: int) -> bool:
 
     """
     end = start + (length or 1) - 1
-    has_edits = any(start <= n <= end for n in items)
+    return any(start <= n <= end for n in items)
+
+
+def _any_item_in_range(items: List[int], start: int, length: int) -> bool:
+    """Return ``True`` if any item falls inside the slice, and log the result"""
+    end = start + (length or 1) - 1
+    has_edits = _has_item_in_range(items, start, length)
     line_range = f'line {start}' if end == start else f'lines {start}-{end}'
     if has_edits:
         logger.debug("Found edits on %s", line_range)
@@ -79,3 +87,97 @@ def choose_lines(
             original_lines_offset,
         )
         yield from chosen_lines
+
+
+def _old_range(
+    old_opcodes: List[Tuple[str, int, int, int, int]], start: int, end: int
+) -> Tuple[int, int]:
+    """Find the range of old lines which were diffed to a range of original lines
+
+    :param old_opcodes: Diff opcodes from the old revision to the original content
+    :param start: The 0-based index of the first original line in the range
+    :param end: The 0-based index after the last original line in the range
+    :return: The 0-based start and end indices of the corresponding old lines
+
+    """
+    old_starts, old_ends = [], []
+    for tag, i1, i2, j1, j2 in old_opcodes:
+        if j1 == j2:
+            overlaps = start <= j1 <= end
+        else:
+            overlaps = j1 < end and j2 > start
+        if not overlaps:
+            continue
+        if tag == "equal":
+            old_starts.append(i1 + max(start - j1, 0))
+            old_ends.append(i1 + min(end, j2) - j1)
+        else:
+            old_starts.append(i1)
+            old_ends.append(i2)
+    if not old_starts:
+        return 0, 0
+    return min(old_starts), max(old_ends)
+
+
+def map_edited_linenums(
+    black_chunks: Iterable[DiffChunk],
+    edit_linenums: List[int],
+    old_lines: Sequence[str],
+    old_opcodes: List[Tuple[str, int, int, int, int]],
+) -> Generator[int, None, None]:
+    """Find line numbers which differ between the old revision and the chosen result
+
+    Chunks are chosen just like :func:`choose_lines` does for ``edit_linenums``. Lines
+    edited since the old revision in chunks whose original lines are kept are shifted
+    by the difference in length of reformatted chunks above them. Reformatted chunks
+    are diffed against the old lines which correspond to their original lines.
+
+    >>> list(
+    ...     map_edited_linenums(
+    ...         [
+    ...             (1, ("a", "b"), ("ab",)),
+    ...             (3, ("c",), ("c",)),
+    ...             (4, ("d",), ("d1", "d2")),
+    ...             (5, ("e", "f"), ("e", "f")),
+    ...         ],
+    ...         [2, 6],
+    ...         ("ab", "c", "d", "e"),
+    ...         [
+    ...             ("replace", 0, 1, 0, 2),
+    ...             ("equal", 1, 4, 2, 5),
+    ...             ("insert", 4, 4, 5, 6),
+    ...         ],
+    ...     )
+    ... )
+    [5]
+
+    :param black_chunks: Chunks of original and reformatted lines
+    :param edit_linenums: Line numbers of edits which decide which chunks to reformat
+    :param old_lines: Lines of the file at the old revision
+    :param old_opcodes: Diff opcodes from ``old_lines`` to the original content
+    :return: Line numbers of edited lines in the resulting content
+
+    """
+    linenums = set(opcodes_to_edit_linenums(old_opcodes, 0))
+    result_linenum = 1
+    for original_lines_offset, original_lines, formatted_lines in black_chunks:
+        if formatted_lines != original_lines and _has_item_in_range(
+            edit_linenums, original_lines_offset, len(original_lines)
+        ):
+            old_start, old_end = _old_range(
+                old_opcodes,
+                original_lines_offset - 1,
+                original_lines_offset - 1 + len(original_lines),
+            )
+            matcher = SequenceMatcher(
+                None, old_lines[old_start:old_end], formatted_lines, autojunk=False
+            )
+            for tag, _i1, _i2, j1, j2 in matcher.get_opcodes():
+                if tag != "equal":
+                    yield from range(result_linenum + j1, result_linenum + j2)
+            result_linenum += len(formatted_lines)
+        else:
+            for delta in range(len(original_lines)):
+                if original_lines_offset + delta in linenums:
+                    yield result_linenum + delta
+            result_linenum += len(original_lines)
@@ -1,17 +1,36 @@
+import sys
 from argparse import ArgumentParser, Namespace
+from importlib.util import find_spec
 from typing import List, Tuple
 
-from darker.argparse_helpers import LogLevelAction, NewlinePreservingFormatter
+from darker.argparse_helpers import (
+    LogLevelAction,
+    NewlinePreservingFormatter,
+    name_and_choice,
+    name_and_positive_int,
+)
 from darker.config import (
     DarkerConfig,
     get_effective_config,
     get_modified_config,
     load_config,
 )
+from darker.linter_backends import LINTER_BACKENDS
+from darker.profiling import DEFAULT_PROFILE_THRESHOLD
 from darker.version import __version__
 
 ISORT_INSTRUCTION = "Please run `pip install 'darker[isort]'`"
 
+# Files with at least this many lines are reformatted in pieces in parallel by default
+DEFAULT_PARALLEL_THRESHOLD = 20000
+
+
+def is_isort_installed() -> bool:
+    """Return ``True`` if the ``isort`` package is available, without importing it"""
+    if "isort" in sys.modules:
+        return sys.modules["isort"] is not None
+    return find_spec("isort") is not None
+
 
 def make_argument_parser(require_src: bool) -> ArgumentParser:
     """Create the argument parser object
@@ -26,10 +45,8 @@ def make_argument_parser(require_src: bool) -> ArgumentParser:
         " sections",
         "- `black` to re-format code changed since the last Git commit",
     ]
-    try:
-        import isort
-    except ImportError:
-        isort = None  # type: ignore
+    isort_installed = is_isort_installed()
+    if not isort_installed:
         description.extend(
             ["", f"{ISORT_INSTRUCTION} to enable sorting of import definitions"]
         )
@@ -58,7 +75,7 @@ def make_argument_parser(require_src: bool) -> ArgumentParser:
         ),
     )
     isort_help = ["Also sort imports using the `isort` package"]
-    if not isort:
+    if not isort_installed:
         isort_help.append(f". {ISORT_INSTRUCTION} to enable usage of this option.")
     parser.add_argument(
         "--diff",
@@ -91,6 +108,76 @@ def make_argument_parser(require_src: bool) -> ArgumentParser:
             "linter binary, or a full quoted command line"
         ),
     )
+    parser.add_argument(
+        "--lint-shards",
+        action="append",
+        metavar="NAME=N",
+        type=name_and_positive_int,
+        default=[],
+        help=(
+            "Run N processes of the linter NAME in parallel, each checking its own"
+            " share of the changed files. NAME is the name of the linter executable,"
+            " e.g. `pylint=4`."
+        ),
+    )
+    parser.add_argument(
+        "--lint-backend",
+        action="append",
+        metavar="NAME=BACKEND",
+        type=name_and_choice(LINTER_BACKENDS),
+        default=[],
+        help=(
+            "Choose how to run the linter NAME. BACKEND can be `subprocess` (the"
+            " default), `dmypy` to keep a Mypy daemon running for the repository, or"
+            " `inprocess` to run Mypy or Pylint using their Python API, e.g."
+            " `mypy=dmypy`."
+        ),
+    )
+    parser.add_argument(
+        "--lint-cache",
+        action="append",
+        metavar="NAME",
+        default=[],
+        help=(
+            "Cache output of the linter NAME for each file, and only run the linter on"
+            " files whose content, linter configuration, linter command line or linter"
+            " executable has changed since an earlier run. Configuration files outside"
+            " the repository root aren't tracked. Only use this with linters which"
+            " check each file independently, e.g. `flake8` or `pylint`."
+        ),
+    )
+    parser.add_argument(
+        "--lint-baseline",
+        action="append",
+        metavar="NAME",
+        default=[],
+        help=(
+            "Also run the linter NAME on the changed files as they were in the first"
+            " revision of the range, and only report messages which are new since"
+            " then, on any line. Baseline output is cached for each commit."
+        ),
+    )
+    parser.add_argument(
+        "--format-regions",
+        action="store_true",
+        help=(
+            "Only run Black on the top-level and class-level statements which contain"
+            " edited lines instead of on whole files. Speeds up reformatting small"
+            " edits in large files. Falls back to reformatting the whole file if the"
+            " statements can't be reformatted separately."
+        ),
+    )
+    parser.add_argument(
+        "--parallel-threshold",
+        metavar="LINES",
+        type=int,
+        default=DEFAULT_PARALLEL_THRESHOLD,
+        help=(
+            "Split files with at least LINES lines into pieces between top-level"
+            " statements, and run Black on the pieces in parallel processes. Use 0 to"
+            f" always run Black on whole files [default: {DEFAULT_PARALLEL_THRESHOLD}]"
+        ),
+    )
     parser.add_argument(
         "-c",
         "--config",
@@ -113,6 +200,62 @@ def make_argument_parser(require_src: bool) -> ArgumentParser:
         const=10,
         help="Reduce amount of output",
     )
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help=(
+            "Write statistics about time spent in each stage of processing, in total"
+            " and for each file, counters, and resources used by linters and Git into"
+            " FILE in JSON format. A summary is also shown with `--verbose`."
+        ),
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help=(
+            "Write a timeline of each file, processing stage, Git command and linter"
+            " run into FILE in the Chrome trace event format. Open it in"
+            " chrome://tracing or https://ui.perfetto.dev/ to see how they overlap."
+        ),
+    )
+    parser.add_argument(
+        "--profile-dir",
+        metavar="DIR",
+        help=(
+            "Profile processing of each file using cProfile, and save the profile into"
+            " DIR for each file which takes longer than the --profile-threshold."
+            " The time spent in isort, Black, difflib and AST verification and the"
+            " number of retries with more context lines are also logged for such files."
+        ),
+    )
+    parser.add_argument(
+        "--profile-threshold",
+        metavar="SECONDS",
+        type=float,
+        default=DEFAULT_PROFILE_THRESHOLD,
+        help=(
+            "Save profiles with --profile-dir only for files which take longer than"
+            f" SECONDS to process [default: {DEFAULT_PROFILE_THRESHOLD}]"
+        ),
+    )
+    parser.add_argument(
+        "--record",
+        metavar="BUNDLE",
+        help=(
+            "Record the output of all Git commands, the working tree contents of"
+            " modified files, configuration files and the command line into the ZIP"
+            " archive BUNDLE. Use --replay to reproduce the run without the repository."
+        ),
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="BUNDLE",
+        help=(
+            "Re-run Darker using the command line, files and Git output recorded into"
+            " BUNDLE with --record, in a temporary directory and without running Git."
+            " Other command line options are added to the recorded ones."
+        ),
+    )
     parser.add_argument(
         "--version",
         action="version",
@@ -157,26 +300,30 @@ def parse_command_line(argv: List[str]) -> Tuple[Namespace, DarkerConfig, Darker
     Finally, also return the set of configuration options which differ from defaults.
 
     """
-    # 1. Parse the paths of files/directories to process into `args.src`.
-    parser_for_srcs = make_argument_parser(require_src=False)
-    args = parser_for_srcs.parse_args(argv)
+    # 1. Parse the paths of files/directories to process into `args.src`. The parser is
+    #    only built once, so paths aren't required by it.
+    parser = make_argument_parser(require_src=False)
+    args = parser.parse_args(argv)
 
     # 2. Locate `pyproject.toml` based on those paths, or in the current directory if no
     #    paths were given. Load Darker configuration from it.
     config = load_config(args.src)
 
-    # 3. Use configuration as defaults for re-parsing command line arguments, and don't
-    #    require file/directory paths if they are specified in configuration.
-    parser = make_argument_parser(require_src=not config.get("src"))
+    # 3. Use configuration as defaults for re-parsing command line arguments, and
+    #    require file/directory paths unless they are specified in configuration or a
+    #    recorded run is replayed.
+    original_defaults = {option: parser.get_default(option) for option in config}
     parser.set_defaults(**config)
     args = parser.parse_args(argv)
+    if not args.src and not args.replay:
+        parser.error("the following arguments are required: PATH")
 
-    # 4. Also create a parser which uses the original default configuration values.
-    #    This is used to find out differences between the effective configuration and
-    #    default configuration values, and print them out in verbose mode.
-    parser_with_original_defaults = make_argument_parser(require_src=True)
+    # 4. Restore the original default configuration values. They are used to find out
+    #    differences between the effective configuration and default configuration
+    #    values, and print them out in verbose mode.
+    parser.set_defaults(**original_defaults)
     return (
         args,
         get_effective_config(args),
-        get_modified_config(parser_with_original_defaults, args),
+        get_modified_config(parser, args),
     )
@@ -2,10 +2,11 @@
 
 import logging
 from argparse import ArgumentParser, Namespace
-from typing import Dict, Iterable, List, Union, cast
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union, cast
 
 import toml
-from black import find_project_root
 
 
 class TomlArrayLinesEncoder(toml.TomlEncoder):  # type: ignore[name-defined]
@@ -27,6 +28,40 @@ def replace_log_level_name(config: DarkerConfig) -> None:
         config["log_level"] = logging.getLevelName(cast(int, config["log_level"]))
 
 
+@lru_cache()
+def find_project_root(srcs: Tuple[str, ...]) -> Path:
+    """Return a directory containing .git, .hg, or pyproject.toml
+
+    That directory will be a common parent of all files and directories passed in
+    ``srcs``. If no directory in the tree contains such a marker, the root of the file
+    system is returned.
+
+    This is equivalent to :func:`black.find_project_root`, but doesn't require
+    importing Black just to read the configuration.
+
+    """
+    if not srcs:
+        return Path("/").resolve()
+    path_srcs = [Path(Path.cwd(), src).resolve() for src in srcs]
+    # A list of lists of parents for each 'src'. 'src' is included as a "parent" of
+    # itself if it is a directory.
+    src_parents = [
+        list(path.parents) + ([path] if path.is_dir() else []) for path in path_srcs
+    ]
+    common_base = max(
+        set.intersection(*(set(parents) for parents in src_parents)),
+        key=lambda path: path.parts,
+    )
+    for directory in (common_base, *common_base.parents):
+        if (directory / ".git").exists():
+            return directory
+        if (directory / ".hg").is_dir():
+            return directory
+        if (directory / "pyproject.toml").is_file():
+            return directory
+    return directory
+
+
 def load_config(srcs: Iterable[str]) -> DarkerConfig:
     """Find and load Darker configuration from given path or pyproject.toml
 
@@ -70,16 +70,50 @@ a mixed result with only selected regions reformatted can be reconstructed.
 """
 
 import logging
+from array import array
 from difflib import SequenceMatcher
-from typing import Generator, List, Tuple
+from typing import Dict, Generator, Iterable, Iterator, List, Sequence, Tuple
 
-from darker.utils import DiffChunk, TextDocument
+from darker.utils import DiffChunk, LinesView, TextDocument
 
 logger = logging.getLogger(__name__)
 
 
+class LineInterner:
+    """Map each distinct line in related documents to a small integer
+
+    All diffs for one file can share an interner. Each document is converted once into
+    a compact array of integers, and diffing arrays is faster than diffing strings,
+    since integers are quicker to hash and compare.
+
+    >>> interner = LineInterner()
+    >>> interner.intern(TextDocument.from_lines(["a", "", "b", ""]))
+    array('i', [0, 1, 2, 1])
+    >>> interner.intern(TextDocument.from_lines(["", "c"]))
+    array('i', [1, 3])
+
+    """
+
+    def __init__(self) -> None:
+        self._line_ids: Dict[str, int] = {}
+        # Keep a reference to each document so its id isn't reused
+        self._sequences: Dict[int, Tuple[TextDocument, "array[int]"]] = {}
+
+    def intern(self, document: TextDocument) -> "array[int]":
+        """Return the integer identifiers of the lines of a document"""
+        cached = self._sequences.get(id(document))
+        if cached:
+            return cached[1]
+        line_ids = self._line_ids
+        sequence = array(
+            "i", [line_ids.setdefault(line, len(line_ids)) for line in document.lines]
+        )
+        self._sequences[id(document)] = document, sequence
+        return sequence
+
+
 def diff_and_get_opcodes(
-    src: TextDocument, dst: TextDocument
+    src: TextDocument, dst: TextDocument, interner: LineInterner = None
 ) -> List[Tuple[str, int, int, int, int]]:
     """Return opcodes and line numbers for chunks in the diff of two lists of strings
 
@@ -93,8 +127,16 @@ def diff_and_get_opcodes(
 
     Line numbers are zero based.
 
+    :param src: The document to diff from
+    :param dst: The document to diff to
+    :param interner: An interner for diffing integer identifiers instead of lines
+
     """
-    matcher = SequenceMatcher(None, src.lines, dst.lines, autojunk=False)
+    src_lines: Sequence[object] = src.lines
+    dst_lines: Sequence[object] = dst.lines
+    if interner:
+        src_lines, dst_lines = interner.intern(src), interner.intern(dst)
+    matcher = SequenceMatcher(None, src_lines, dst_lines, autojunk=False)
     opcodes = matcher.get_opcodes()
     logger.debug(
         "Diff between edited and reformatted has %s opcode%s",
@@ -134,6 +176,47 @@ def opcodes_to_edit_linenums(
             prev_chunk_end = chunk_end
 
 
+class LinenumBitset:
+    """A set of line numbers stored as a bitmap for constant time membership tests
+
+    >>> linenums = LinenumBitset([1, 3, 10])
+    >>> [n in linenums for n in range(12)]
+    [False, True, False, True, False, False, False, False, False, False, True, False]
+    >>> list(linenums)
+    [1, 3, 10]
+
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, linenums: Iterable[int]):
+        linenums = list(linenums)
+        self._bits = bytearray((max(linenums, default=0) >> 3) + 1)
+        for linenum in linenums:
+            self._bits[linenum >> 3] |= 1 << (linenum & 7)
+
+    def __contains__(self, linenum: object) -> bool:
+        """Return ``True`` if the line number is in the set"""
+        if not isinstance(linenum, int) or linenum < 0:
+            return False
+        byte_index = linenum >> 3
+        if byte_index >= len(self._bits):
+            return False
+        return bool(self._bits[byte_index] >> (linenum & 7) & 1)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over line numbers in the set in ascending order"""
+        for byte_index, byte in enumerate(self._bits):
+            if byte:
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield byte_index << 3 | bit
+
+    def __repr__(self) -> str:
+        """Return a Python representation of the line number set"""
+        return f"{type(self).__name__}({list(self)})"
+
+
 def opcodes_to_chunks(
     opcodes: List[Tuple[str, int, int, int, int]],
     src: TextDocument,
@@ -150,7 +233,11 @@ def opcodes_to_chunks(
     Based on this, the patch can be constructed by choosing either original or modified
     lines for each chunk and concatenating them together.
 
+    Lines are returned as :class:`~darker.utils.LinesView` objects which refer to the
+    lines of the documents instead of copying them.
+
     """
     _validate_opcodes(opcodes)
+    src_lines, dst_lines = src.lines, dst.lines
     for tag, i1, i2, j1, j2 in opcodes:
-        yield i1 + 1, src.lines[i1:i2], dst.lines[j1:j2]
+        yield i1 + 1, LinesView(src_lines, i1, i2), LinesView(dst_lines, j1, j2)
@@ -9,9 +9,15 @@ from datetime import datetime
 from functools import lru_cache
 from pathlib import Path
 from subprocess import CalledProcessError, check_output
-from typing import Iterable, List, Set
-
-from darker.diff import diff_and_get_opcodes, opcodes_to_edit_linenums
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from darker.diff import (
+    LineInterner,
+    LinenumBitset,
+    diff_and_get_opcodes,
+    opcodes_to_edit_linenums,
+)
+from darker.stats import STATS
 from darker.utils import TextDocument
 
 logger = logging.getLogger(__name__)
@@ -32,6 +38,52 @@ WORKTREE = ":WORKTREE:"
 PRE_COMMIT_FROM_TO_REFS = ":PRE-COMMIT:"
 
 
+class GitBackend:
+    """Run Git commands as subprocesses
+
+    All Git commands run by Darker go through the active backend. It can be replaced
+    using :func:`set_git_backend`, e.g. to record Git output or to replay recorded
+    output without the original repository (see :mod:`darker.git_bundle`).
+
+    """
+
+    def check_output(
+        self, cmd: List[str], cwd: Path, stdin: Optional[bytes] = None
+    ) -> bytes:
+        """Run a Git command and return its output
+
+        :param cmd: The Git command line
+        :param cwd: The directory to run the command in
+        :param stdin: Bytes to feed to the command on standard input
+        :return: The standard output of the command
+        :raise CalledProcessError: if the command exits with a non-zero status
+
+        """
+        return check_output(cmd, cwd=str(cwd), input=stdin)
+
+
+_git_backend = GitBackend()
+
+
+def set_git_backend(backend: GitBackend) -> GitBackend:
+    """Use the given backend for running all Git commands
+
+    :param backend: The new Git backend
+    :return: The previously active Git backend
+
+    """
+    global _git_backend  # pylint: disable=global-statement
+    previous_backend, _git_backend = _git_backend, backend
+    return previous_backend
+
+
+def _git_check_output(cmd: List[str], cwd: Path, stdin: bytes = None) -> bytes:
+    """Log command line, run Git using the active backend and record its duration"""
+    logger.debug("[%s]$ %s", cwd, " ".join(cmd))
+    with STATS.time_git_call(cmd):
+        return _git_backend.check_output(cmd, cwd, stdin)
+
+
 def git_get_content_at_revision(path: Path, revision: str, cwd: Path) -> TextDocument:
     """Get unmodified text lines of a file at a Git revision
 
@@ -46,9 +98,10 @@ def git_get_content_at_revision(path: Path, revision: str, cwd: Path) -> TextDoc
         mtime = datetime.utcfromtimestamp(abspath.stat().st_mtime)
         return TextDocument.from_str(abspath.read_text("utf-8"), f"{mtime} +0000")
     cmd = ["git", "show", f"{revision}:./{path}"]
-    logger.debug("[%s]$ %s", cwd, " ".join(cmd))
     try:
-        return TextDocument.from_str(check_output(cmd, cwd=str(cwd), encoding="utf-8"))
+        output = _git_check_output(cmd, cwd).decode("utf-8")
+        # Translate newlines like reading Git output in text mode would
+        return TextDocument.from_str(output.replace("\r\n", "\n").replace("\r", "\n"))
     except CalledProcessError as exc_info:
         if exc_info.returncode == 128:
             # The file didn't exist at the given revision. Act as if it was an empty
@@ -58,6 +111,39 @@ def git_get_content_at_revision(path: Path, revision: str, cwd: Path) -> TextDoc
             raise
 
 
+def git_get_blobs_at_revision(
+    paths: Iterable[Path], revision: str, cwd: Path
+) -> Dict[Path, bytes]:
+    """Get the raw contents of files at a Git revision using a single Git command
+
+    Runs ``git cat-file --batch`` and feeds it a ``<revision>:<path>`` line for each
+    file. Files which don't exist at the revision are left out of the result.
+
+    :param paths: Paths of the files, relative to the repository root
+    :param revision: The Git revision for which to get file contents
+    :param cwd: The root of the Git repository
+    :return: The contents of each existing file, keyed by the given paths
+
+    """
+    path_list = list(paths)
+    cmd = ["git", "cat-file", "--batch"]
+    objects = "".join(f"{revision}:{path.as_posix()}\n" for path in path_list)
+    output = _git_check_output(cmd, cwd, objects.encode("utf-8"))
+    blobs = {}
+    position = 0
+    for path in path_list:
+        header_end = output.index(b"\n", position)
+        header = output[position:header_end].split()
+        position = header_end + 1
+        if header[-1] == b"missing":
+            continue
+        object_end = position + int(header[2])
+        if header[1] == b"blob":
+            blobs[path] = output[position:object_end]
+        position = object_end + 1
+    return blobs
+
+
 @dataclass(frozen=True)
 class RevisionRange:
     """Represent a range of commits in a Git repository for comparing differences
@@ -125,9 +211,8 @@ def should_reformat_file(path: Path) -> bool:
 
 def _git_check_output_lines(cmd: List[str], cwd: Path) -> List[str]:
     """Log command line, run Git, split stdout to lines, exit with 123 on error"""
-    logger.debug("[%s]$ %s", cwd, " ".join(cmd))
     try:
-        return check_output(cmd, cwd=str(cwd)).decode("utf-8").splitlines()
+        return _git_check_output(cmd, cwd).decode("utf-8").splitlines()
     except CalledProcessError as exc_info:
         if exc_info.returncode == 128:
             # Bad revision or another Git failure
@@ -136,6 +221,18 @@ def _git_check_output_lines(cmd: List[str], cwd: Path) -> List[str]:
             raise
 
 
+def git_get_tree_hash(revision: str, cwd: Path) -> str:
+    """Return the hash of the Git tree object of a revision
+
+    :param revision: The Git revision, e.g. a commit hash or a branch name
+    :param cwd: The root of the Git repository
+    :return: The tree hash, which changes if any file in the revision changes
+
+    """
+    cmd = ["git", "rev-parse", "--verify", f"{revision}^{{tree}}"]
+    return _git_check_output_lines(cmd, cwd)[0]
+
+
 def git_get_modified_files(
     paths: Iterable[Path], revrange: RevisionRange, cwd: Path
 ) -> Set[Path]:
@@ -152,7 +249,8 @@ def git_get_modified_files(
 
     """
     relative_paths = {p.resolve().relative_to(cwd) for p in paths}
-    str_paths = [str(path) for path in relative_paths]
+    # Sort paths so the Git command line doesn't depend on the hash seed
+    str_paths = [str(path) for path in sorted(relative_paths)]
     if revrange.use_common_ancestor:
         rev2 = "HEAD" if revrange.rev2 == WORKTREE else revrange.rev2
         merge_base_cmd = ["git", "merge-base", revrange.rev1, rev2]
@@ -202,18 +300,102 @@ class EditedLinenumsDiffer:
         return self.revision_vs_lines(path_in_repo, content, context_lines)
 
     def revision_vs_lines(
-        self, path_in_repo: Path, content: TextDocument, context_lines: int
+        self,
+        path_in_repo: Path,
+        content: TextDocument,
+        context_lines: int,
+        interner: LineInterner = None,
     ) -> List[int]:
         """For file `path_in_repo`, return changed line numbers from given revision
 
         :param path_in_repo: Path of the file to compare, relative to repository root
         :param content: The contents to compare to, e.g. from current working tree
         :param context_lines: The number of lines to include before and after a change
+        :param interner: The line interner shared by all diffs of the file, if any
         :return: Line numbers of lines changed between the revision and given content
 
+        """
+        _old, edited_opcodes = self.diff_to_revision(path_in_repo, content, interner)
+        return list(opcodes_to_edit_linenums(edited_opcodes, context_lines))
+
+    @lru_cache(maxsize=1)
+    def diff_to_revision(
+        self,
+        path_in_repo: Path,
+        content: TextDocument,
+        interner: Optional[LineInterner] = None,
+    ) -> Tuple[TextDocument, List[Tuple[str, int, int, int, int]]]:
+        """Diff given content to the file at the old revision
+
+        The result is cached using the content digest as the key, so retrying with more
+        context lines doesn't need to run Git and diff the file again.
+
+        :return: The file at the old revision, and opcodes for diffing it to `content`
+
         """
         old = git_get_content_at_revision(
             path_in_repo, self.revrange.rev1, self.git_root
         )
-        edited_opcodes = diff_and_get_opcodes(old, content)
-        return list(opcodes_to_edit_linenums(edited_opcodes, context_lines))
+        return old, diff_and_get_opcodes(old, content, interner)
+
+
+class EditedLinenumsCache:
+    """Look up whether lines were edited, computing edits once for each file
+
+    Linters may report on files in any order. Edited line numbers for each file are
+    computed once when first needed and stored as a bitset, so each look-up after that
+    takes constant time regardless of the order in which files are queried.
+
+    """
+
+    def __init__(self, git_root: Path, revrange: RevisionRange):
+        self._differ = EditedLinenumsDiffer(git_root, revrange)
+        self._edited_linenums: Dict[Path, LinenumBitset] = {}
+        self._unwritten_linenums: Dict[Path, List[int]] = {}
+
+    def set(self, path_in_repo: Path, linenums: Iterable[int]) -> None:
+        """Store already known edited line numbers for a file
+
+        :param path_in_repo: Path of the file, relative to the repository root
+        :param linenums: Line numbers of edited lines in the newer revision of the file
+
+        """
+        self._edited_linenums[path_in_repo] = LinenumBitset(linenums)
+
+    def set_unwritten(self, path_in_repo: Path, linenums: Iterable[int]) -> None:
+        """Store edited line numbers for new content not yet written to the file
+
+        The line numbers are only used after :meth:`mark_written` is called for the
+        file. Until then, edited lines are computed from the file as it is.
+
+        :param path_in_repo: Path of the file, relative to the repository root
+        :param linenums: Line numbers of edited lines in the new content
+
+        """
+        self._unwritten_linenums[path_in_repo] = list(linenums)
+
+    def mark_written(self, path: Path) -> None:
+        """Use line numbers stored by :meth:`set_unwritten` once the file is written
+
+        :param path: Absolute path of the written file
+
+        """
+        path_in_repo = path.relative_to(self._differ.git_root)
+        linenums = self._unwritten_linenums.pop(path_in_repo, None)
+        if linenums is not None:
+            self.set(path_in_repo, linenums)
+
+    def is_edited(self, path_in_repo: Path, linenum: int) -> bool:
+        """Return ``True`` if the line was changed between the revisions
+
+        :param path_in_repo: Path of the file, relative to the repository root
+        :param linenum: The 1-based line number in the newer revision of the file
+
+        """
+        edited_linenums = self._edited_linenums.get(path_in_repo)
+        if edited_linenums is None:
+            edited_linenums = LinenumBitset(
+                self._differ.compare_revisions(path_in_repo, context_lines=0)
+            )
+            self._edited_linenums[path_in_repo] = edited_linenums
+        return linenum in edited_linenums
@@ -0,0 +1,314 @@
+"""Record Git output and worktree files into a bundle, and replay them without Git
+
+With ``--record BUNDLE``, Darker runs as usual, but the output of every Git command is
+also captured together with the command line arguments, the effective configuration,
+and the working tree contents of modified files and configuration files. These are
+written into a single ZIP archive.
+
+With ``--replay BUNDLE``, the files are extracted into a temporary directory, and
+Darker is run again with the recorded command line in that directory. Instead of
+running Git, recorded Git output is returned for each command, so the results are
+identical to the recorded run even without the original repository. This allows
+sharing and benchmarking slow cases.
+
+The archive contains a ``manifest.json`` file and the recorded files under ``files/``.
+All paths are relative to the root of the Git repository which was recorded.
+
+"""
+
+import base64
+import json
+import logging
+import os
+import sys
+import threading
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from subprocess import CalledProcessError, check_output
+from tempfile import TemporaryDirectory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from darker.config import DarkerConfig
+from darker.git import GitBackend, set_git_backend
+from darker.linter_cache import LINTER_CONFIG_FILES
+
+if sys.version_info >= (3, 8):
+    from typing import TypedDict
+else:
+    from typing_extensions import TypedDict
+
+logger = logging.getLogger(__name__)
+
+
+BUNDLE_FORMAT_VERSION = 1
+
+# Configuration files for Darker, Black and isort to include in bundles, in addition to
+# linter configuration files
+CONFIG_FILES = ["pyproject.toml", "setup.cfg", ".isort.cfg", ".editorconfig"]
+
+# Key for looking up recorded output: the command line, the working directory relative
+# to the repository root, and standard input
+GitCallKey = Tuple[Tuple[str, ...], str, Optional[bytes]]
+
+
+class GitCall(TypedDict):
+    """A recorded Git command and its output, with bytes encoded in Base64"""
+
+    cmd: List[str]
+    cwd: str
+    stdin: Optional[str]
+    output: str
+    returncode: int
+
+
+def _relative_posix(path: Path, root: Path) -> str:
+    """Return a path relative to the root in POSIX format, allowing ``..`` components"""
+    return Path(os.path.relpath(path.resolve(), root.resolve())).as_posix()
+
+
+def _is_outside_root(relative_path: str) -> bool:
+    """Return ``True`` if a relative path from :func:`_relative_posix` escapes the root
+
+    >>> [_is_outside_root(path) for path in ["a/b.py", "../a.py", "a/../../b", "/a"]]
+    [False, True, True, True]
+
+    """
+    path = PurePosixPath(relative_path)
+    return path.is_absolute() or ".." in path.parts
+
+
+def _encode(data: Optional[bytes]) -> Optional[str]:
+    """Encode standard input for storing in JSON"""
+    return None if data is None else base64.b64encode(data).decode("ascii")
+
+
+def _decode(data: Optional[str]) -> Optional[bytes]:
+    """Decode standard input stored in JSON"""
+    return None if data is None else base64.b64decode(data)
+
+
+def remove_option(argv: List[str], option: str) -> List[str]:
+    """Remove an option and its value from command line arguments
+
+    >>> remove_option(["--record", "a.zip", "-v", "--record=b.zip", "."], "--record")
+    ['-v', '.']
+
+    """
+    result = []
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument == option:
+            next(arguments, None)
+        elif not argument.startswith(f"{option}="):
+            result.append(argument)
+    return result
+
+
+class RecordingGitBackend(GitBackend):
+    """Run Git commands as subprocesses and record their output"""
+
+    def __init__(self, root: Path):
+        """Initialize the recorder
+
+        :param root: The root of the Git repository, used to make paths relative
+
+        """
+        self.root = root
+        self.calls: List[GitCall] = []
+        self.files: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def check_output(
+        self, cmd: List[str], cwd: Path, stdin: Optional[bytes] = None
+    ) -> bytes:
+        """Run a Git command, and record its output or the failure"""
+        try:
+            output = super().check_output(cmd, cwd, stdin)
+            returncode = 0
+        except CalledProcessError as exc_info:
+            output = exc_info.output or b""
+            returncode = exc_info.returncode
+            raise
+        finally:
+            self._record(cmd, cwd, stdin, output, returncode)
+        return output
+
+    def _record(
+        self,
+        cmd: List[str],
+        cwd: Path,
+        stdin: Optional[bytes],
+        output: bytes,
+        returncode: int,
+    ) -> None:
+        """Store the output of a Git command, and the contents of modified files
+
+        Files are read as soon as Git lists them, before Darker reformats them.
+
+        """
+        relative_cwd = _relative_posix(cwd, self.root)
+        with self._lock:
+            self.calls.append(
+                {
+                    "cmd": cmd,
+                    "cwd": relative_cwd,
+                    "stdin": _encode(stdin),
+                    "output": base64.b64encode(output).decode("ascii"),
+                    "returncode": returncode,
+                }
+            )
+            if returncode == 0 and cmd[1:3] in (["diff", "--name-only"], ["ls-files"]):
+                for line in output.decode("utf-8").splitlines():
+                    self._add_file(cwd / line)
+
+    def _add_file(self, path: Path) -> None:
+        """Store the contents and modification time of a file, if not done already"""
+        relative_path = _relative_posix(path, self.root)
+        if _is_outside_root(relative_path):
+            logger.warning("Not recording %s which is outside the repository", path)
+            return
+        if relative_path not in self.files and path.is_file():
+            self.files[relative_path] = path.read_bytes(), path.stat().st_mtime
+
+    def write_bundle(
+        self, path: Path, argv: List[str], config: DarkerConfig, cwd: Path
+    ) -> None:
+        """Write recorded Git output, files and configuration into a bundle
+
+        :param path: The path of the ZIP archive to write
+        :param argv: The Darker command line arguments to record
+        :param config: The effective configuration of the recorded run
+        :param cwd: The working directory of the recorded run
+
+        """
+        for directory in {self.root, cwd} | {
+            self.root / call["cwd"] for call in self.calls
+        }:
+            for filename in CONFIG_FILES + LINTER_CONFIG_FILES:
+                self._add_file(directory / filename)
+        if config.get("config"):
+            self._add_file(Path(str(config["config"])))
+        manifest = {
+            "version": BUNDLE_FORMAT_VERSION,
+            "argv": argv,
+            "cwd": _relative_posix(cwd, self.root),
+            "config": config,
+            "mtimes": {
+                relative_path: mtime for relative_path, (_, mtime) in self.files.items()
+            },
+            "git_calls": self.calls,
+        }
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr("manifest.json", json.dumps(manifest, indent=2))
+            for relative_path, (content, _) in sorted(self.files.items()):
+                bundle.writestr(f"files/{relative_path}", content)
+        logger.info(
+            "Recorded %s Git commands and %s files into %s",
+            len(self.calls),
+            len(self.files),
+            path,
+        )
+
+
+class ReplayGitBackend(GitBackend):
+    """Return recorded output for Git commands instead of running Git"""
+
+    def __init__(self, root: Path, calls: List[GitCall]):
+        """Initialize the replayer
+
+        :param root: The directory the recorded repository was extracted into
+        :param calls: Recorded Git commands and their output
+
+        """
+        self.root = root
+        self.outputs: Dict[GitCallKey, Tuple[bytes, int]] = {}
+        for call in calls:
+            key = (tuple(call["cmd"]), call["cwd"], _decode(call["stdin"]))
+            output = base64.b64decode(call["output"])
+            self.outputs[key] = output, call["returncode"]
+
+    def check_output(
+        self, cmd: List[str], cwd: Path, stdin: Optional[bytes] = None
+    ) -> bytes:
+        """Return recorded output, or raise the recorded failure, for a Git command"""
+        key = (tuple(cmd), _relative_posix(cwd, self.root), stdin)
+        if key not in self.outputs:
+            raise LookupError(
+                f"Git command {' '.join(cmd)} in {key[1]} wasn't recorded in the bundle"
+            )
+        output, returncode = self.outputs[key]
+        if returncode:
+            raise CalledProcessError(returncode, cmd, output)
+        return output
+
+
+@contextmanager
+def record_git(
+    argv: List[str], config: DarkerConfig, bundle_path: Path
+) -> Iterator[None]:
+    """Record Git output during the context, and write a bundle at the end
+
+    :param argv: The Darker command line arguments, including the ``--record`` option
+    :param config: The effective configuration of the Darker run
+    :param bundle_path: The path of the bundle to write
+
+    """
+    cwd = Path.cwd()
+    root = Path(
+        check_output(["git", "rev-parse", "--show-toplevel"], cwd=str(cwd))
+        .decode("utf-8")
+        .rstrip("\n")
+    )
+    recorder = RecordingGitBackend(root)
+    previous_backend = set_git_backend(recorder)
+    try:
+        yield
+    finally:
+        set_git_backend(previous_backend)
+    recorder.write_bundle(bundle_path, remove_option(argv, "--record"), config, cwd)
+
+
+@contextmanager
+def replay_git(bundle_path: Path) -> Iterator[List[str]]:
+    """Extract a bundle and replay its Git output during the context
+
+    The working directory is changed to the extracted copy of the recorded working
+    directory for the duration of the context.
+
+    :param bundle_path: The path of the bundle to replay
+    :return: The recorded Darker command line arguments
+
+    """
+    with zipfile.ZipFile(bundle_path) as bundle, TemporaryDirectory() as tmpdir:
+        manifest = json.loads(bundle.read("manifest.json"))
+        if manifest["version"] != BUNDLE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported bundle format version {manifest['version']}"
+                f" in {bundle_path}"
+            )
+        for relative_path in [manifest["cwd"], *manifest["mtimes"]]:
+            if _is_outside_root(relative_path):
+                raise ValueError(
+                    f"Path {relative_path} in {bundle_path} is outside the repository"
+                )
+        root = Path(tmpdir)
+        for name in bundle.namelist():
+            if name.startswith("files/"):
+                bundle.extract(name, root)
+        files_root = root / "files"
+        files_root.mkdir(exist_ok=True)
+        for relative_path, mtime in manifest["mtimes"].items():
+            os.utime(files_root / relative_path, (mtime, mtime))
+        cwd = files_root / manifest["cwd"]
+        cwd.mkdir(parents=True, exist_ok=True)
+        previous_cwd = Path.cwd()
+        previous_backend = set_git_backend(
+            ReplayGitBackend(files_root, manifest["git_calls"])
+        )
+        os.chdir(cwd)
+        try:
+            yield manifest["argv"]
+        finally:
+            os.chdir(previous_cwd)
+            set_git_backend(previous_backend)
@@ -3,8 +3,7 @@ import sys
 from pathlib import Path
 from typing import Optional
 
-from black import find_project_root
-
+from darker.config import find_project_root
 from darker.utils import TextDocument
 
 if sys.version_info >= (3, 8):
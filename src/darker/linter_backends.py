@@ -0,0 +1,247 @@
+"""Different ways of running a linter command line and capturing its output
+
+By default, each linter command line is run as a new subprocess. Some linters can also
+be run in other ways which avoid repeating expensive start-up work on every Darker run:
+
+``dmypy``
+    Run Mypy using ``dmypy run``. A Mypy daemon is kept running for each repository, so
+    only files modified since the previous run are type checked again. The daemon status
+    files are kept in the Darker cache directory.
+
+``inprocess``
+    Run Mypy or Pylint through their Python APIs inside the Darker process. This avoids
+    starting a new Python interpreter and importing the linter for each command line.
+
+All backends return linter output in the same format as the linter's command line
+would. That output is then filtered by :mod:`darker.linting`.
+
+"""
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from subprocess import PIPE, Popen
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+from darker.linter_cache import get_cache_dir
+from darker.stats import STATS, SubprocessStats, wait_for_subprocess
+
+logger = logging.getLogger(__name__)
+
+
+# Read linter output from pipes in large chunks instead of the default 8 KiB, since it
+# can run to tens of thousands of lines
+STDOUT_BUFFER_SIZE = 64 * 1024
+
+
+# Linter subprocesses which haven't finished yet, so they can be terminated if Darker
+# stops early
+_running_processes: Set["Popen[str]"] = set()
+_running_processes_lock = threading.Lock()
+
+
+def start_linter_process(cmd: List[str], cwd: Path = None) -> "Popen[str]":
+    """Start a linter subprocess with the given command line"""
+    logger.debug("[%s]$ %s", cwd or ".", " ".join(cmd))
+    process = Popen(
+        cmd, stdout=PIPE, encoding="utf-8", bufsize=STDOUT_BUFFER_SIZE, cwd=cwd
+    )
+    with _running_processes_lock:
+        _running_processes.add(process)
+    return process
+
+
+def terminate_linter_processes() -> None:
+    """Terminate all linter subprocesses which are still running"""
+    with _running_processes_lock:
+        for process in _running_processes:
+            logger.debug("Terminating linter process %s", process.pid)
+            process.terminate()
+
+
+class LinterBackend:
+    """Run linter command lines as subprocesses and yield lines from their output"""
+
+    # ``False`` if only one command line may be run at a time
+    concurrent = True
+
+    def run(
+        self, cmd: List[str], git_root: Path, cwd: Optional[Path] = None
+    ) -> Iterator[str]:
+        """Run the linter command line and yield lines from its standard output
+
+        :param cmd: The linter command line split into arguments, including the paths
+                    of files to check
+        :param git_root: The repository root for the files to check
+        :param cwd: The working directory for the linter, or ``None`` to run it in the
+                    current working directory
+
+        """
+        start_time = time.perf_counter()
+        linter_process = start_linter_process(cmd, cwd)
+        try:
+            # assert needed for MyPy (see https://stackoverflow.com/q/57350490/15770)
+            assert linter_process.stdout is not None
+            yield from linter_process.stdout
+            STATS.add_linter(
+                wait_for_subprocess(linter_process, Path(cmd[0]).name, start_time),
+                start_time,
+            )
+        finally:
+            with _running_processes_lock:
+                _running_processes.discard(linter_process)
+
+
+def get_dmypy_status_file(git_root: Path) -> Path:
+    """Return the path of the Mypy daemon status file for a repository
+
+    The status file is kept in the Darker cache directory instead of the repository so
+    it doesn't show up as an untracked file.
+
+    """
+    status_dir = get_cache_dir() / "dmypy"
+    status_dir.mkdir(parents=True, exist_ok=True)
+    repo_digest = hashlib.sha256(str(git_root.resolve()).encode("utf-8")).hexdigest()
+    return status_dir / f"{repo_digest[:16]}.json"
+
+
+def _get_dmypy_executable(mypy_executable: str) -> str:
+    """Return the ``dmypy`` executable installed along with the given ``mypy``
+
+    >>> _get_dmypy_executable("/venv/bin/mypy")
+    '/venv/bin/dmypy'
+    >>> _get_dmypy_executable("mypy")
+    'dmypy'
+
+    :param mypy_executable: The Mypy executable from the linter command line
+    :return: ``dmypy`` in the same directory, or just ``dmypy`` to look it up in
+             ``$PATH`` if ``mypy`` is looked up there as well
+
+    """
+    directory, filename = os.path.split(mypy_executable)
+    _, extension = os.path.splitext(filename)
+    if not directory:
+        return f"dmypy{extension}"
+    return os.path.join(directory, f"dmypy{extension}")
+
+
+class DmypyBackend(LinterBackend):
+    """Type check using a Mypy daemon which is kept running for each repository"""
+
+    # The daemon processes one request at a time
+    concurrent = False
+
+    def run(
+        self, cmd: List[str], git_root: Path, cwd: Optional[Path] = None
+    ) -> Iterator[str]:
+        """Convert a ``mypy`` command line to ``dmypy run`` and run it
+
+        Everything after the executable name is passed to the daemon as Mypy options
+        and files to check. The daemon is restarted automatically by ``dmypy run`` if
+        the Mypy options change.
+
+        Mypy is run as a subprocess instead if it needs to run in another working
+        directory, e.g. for a temporary checkout of a historical revision, since a
+        daemon started there would never be stopped.
+
+        """
+        if cwd is not None:
+            logger.warning(
+                "Can't run %s in a daemon, running a subprocess instead", cmd[0]
+            )
+            yield from super().run(cmd, git_root, cwd)
+            return
+        status_file = get_dmypy_status_file(git_root)
+        dmypy_cmd = [
+            _get_dmypy_executable(cmd[0]),
+            "--status-file",
+            str(status_file),
+            "run",
+            "--",
+        ]
+        yield from super().run(dmypy_cmd + cmd[1:], git_root, cwd)
+
+
+def _run_mypy_api(args: List[str]) -> str:
+    """Run Mypy in this process and return its standard output"""
+    from mypy import api  # pylint: disable=import-outside-toplevel
+
+    stdout, _stderr, _exit_status = api.run(args)
+    return stdout
+
+
+def _run_pylint_api(args: List[str]) -> str:
+    """Run Pylint in this process and return its standard output"""
+    # pylint: disable=import-outside-toplevel
+    from pylint.lint import Run
+    from pylint.reporters.text import TextReporter
+
+    output = io.StringIO()
+    Run(args, reporter=TextReporter(output), exit=False)
+    return output.getvalue()
+
+
+IN_PROCESS_RUNNERS: Dict[str, Callable[[List[str]], str]] = {
+    "mypy": _run_mypy_api,
+    "pylint": _run_pylint_api,
+}
+
+
+class InProcessBackend(LinterBackend):
+    """Run linters which have a Python API inside the Darker process
+
+    Linters without a supported API, or which aren't installed in the same Python
+    environment as Darker, are run as subprocesses instead.
+
+    """
+
+    # Linters modify global interpreter state like ``sys.path`` while running
+    concurrent = False
+    _lock = threading.Lock()
+
+    def run(
+        self, cmd: List[str], git_root: Path, cwd: Optional[Path] = None
+    ) -> Iterator[str]:
+        """Run the linter using its Python API if possible
+
+        Linters which need to run in another working directory are run as
+        subprocesses, since changing the working directory would affect the whole
+        Darker process.
+
+        """
+        name = Path(cmd[0]).name
+        runner = IN_PROCESS_RUNNERS.get(name)
+        if runner is None or cwd is not None:
+            logger.warning(
+                "Can't run %s in-process, running a subprocess instead", name
+            )
+            yield from super().run(cmd, git_root, cwd)
+            return
+        logger.debug("Running in-process: %s", " ".join(cmd))
+        try:
+            with self._lock:
+                start_time = time.perf_counter()
+                output = runner(cmd[1:])
+                STATS.add_linter(
+                    SubprocessStats(name, time.perf_counter() - start_time), start_time
+                )
+        except ImportError:
+            logger.warning(
+                "%s isn't installed for Darker's Python interpreter,"
+                " running a subprocess instead",
+                name,
+            )
+            yield from super().run(cmd, git_root, cwd)
+            return
+        yield from output.splitlines(keepends=True)
+
+
+LINTER_BACKENDS: Dict[str, LinterBackend] = {
+    "subprocess": LinterBackend(),
+    "dmypy": DmypyBackend(),
+    "inprocess": InProcessBackend(),
+}
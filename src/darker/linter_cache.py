@@ -0,0 +1,165 @@
+"""Cache linter output for each file across Darker runs
+
+For linters which check each file independently, like Flake8 or Pylint, the output for
+a file only depends on the content of the file, the linter command line, the linter
+version and the linter configuration. Darker can store the output lines for each file,
+and only run the linter on files for which there's no stored output.
+
+The linter version is tracked using the path and modification time of the linter
+executable, which change when the linter is upgraded or another installation of it is
+found on ``$PATH``. Only configuration files in the repository root are tracked.
+Changes in configuration files elsewhere, e.g. in the user's home directory, or in
+linter plugins installed separately from the linter, aren't noticed, and the cache
+directory needs to be cleared after such changes.
+
+Output lines are stored without the path of the file so they can be reused if the same
+content appears in another file, e.g. in another clone of the repository. Paths are
+added back when the lines are retrieved from the cache. The location part of a cached
+linter output line is thus a path relative to the current working directory if the
+linter originally output a relative path, and an absolute path otherwise.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from darker.utils import git_hash_object
+
+logger = logging.getLogger(__name__)
+
+
+# Linter configuration files which affect linter output if they're in the repository
+LINTER_CONFIG_FILES = [
+    ".flake8",
+    ".mypy.ini",
+    ".pylintrc",
+    "mypy.ini",
+    "pylintrc",
+    "pyproject.toml",
+    "setup.cfg",
+    "tox.ini",
+]
+
+
+def get_cache_dir() -> Path:
+    """Return the directory for storing Darker's cache files"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "darker"
+
+
+def get_config_digest(git_root: Path) -> str:
+    """Return a digest of the contents of all linter configuration files in the repo"""
+    config_hashes = {}
+    for name in LINTER_CONFIG_FILES:
+        config_path = git_root / name
+        if config_path.is_file():
+            config_hashes[name] = git_hash_object(config_path.read_bytes())
+    return hashlib.sha256(json.dumps(config_hashes).encode("ascii")).hexdigest()
+
+
+def get_executable_stamp(cmdline: str) -> str:
+    """Return the path and modification time of the executable of a linter command line
+
+    An empty string is returned if the executable isn't found.
+
+    """
+    executable = shutil.which(cmdline.split()[0])
+    if executable is None:
+        return ""
+    path = Path(executable).resolve()
+    return f"{path}:{path.stat().st_mtime_ns}"
+
+
+class LinterCache:
+    """Store and retrieve output lines of one linter command line for each file
+
+    Entries are keyed by the linter command line, the path and modification time of the
+    linter executable, the Git blob hash of the content of the file, and the contents of
+    linter configuration files in the repository root.
+    If linter output for a file also depends on other files, like Mypy output depends on
+    imported modules, a ``scope`` like the tree hash of a revision can be added to the
+    keys.
+
+    """
+
+    def __init__(
+        self, cmdline: str, git_root: Path, cache_dir: Path = None, scope: str = ""
+    ):
+        self.cmdline = cmdline
+        self.scope = scope
+        self.git_root = git_root
+        self.cache_dir = (cache_dir or get_cache_dir()) / "lint"
+        self.config_digest = get_config_digest(git_root)
+        self.executable_stamp = get_executable_stamp(cmdline)
+        self._keys: Dict[Path, str] = {}
+
+    def get_key(self, path_in_repo: Path, blob_hash: str = None) -> str:
+        """Return the cache key for the linter output for a file
+
+        :param path_in_repo: Path of the file relative to the repository root
+        :param blob_hash: The Git blob hash of the file content, or ``None`` to compute
+                          it from the file in the working tree
+
+        """
+        if blob_hash is None:
+            blob_hash = git_hash_object((self.git_root / path_in_repo).read_bytes())
+        key_data = [
+            self.cmdline,
+            self.executable_stamp,
+            blob_hash,
+            self.config_digest,
+            self.scope,
+        ]
+        return hashlib.sha256(json.dumps(key_data).encode("utf-8")).hexdigest()
+
+    def _get_entry_path(self, path_in_repo: Path) -> Path:
+        """Return the path of the cache entry file for a file in the working tree"""
+        if path_in_repo not in self._keys:
+            self._keys[path_in_repo] = self.get_key(path_in_repo)
+        key = self._keys[path_in_repo]
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, path_in_repo: Path, absolute: bool = False) -> Optional[List[str]]:
+        """Return cached linter output lines for a file, or ``None`` if not cached
+
+        :param path_in_repo: Path of the file relative to the repository root
+        :param absolute: ``True`` to return absolute paths even if the linter reported
+                         relative ones, e.g. when it was run in another directory
+        :return: The cached linter output lines for the file
+
+        """
+        entry_path = self._get_entry_path(path_in_repo)
+        try:
+            entry = json.loads(entry_path.read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+        if entry["absolute"] or absolute:
+            path_str = str(self.git_root / path_in_repo)
+        else:
+            path_str = os.path.relpath(self.git_root / path_in_repo)
+        return [f"{path_str}{tail}" for tail in entry["tails"]]
+
+    def put(self, path_in_repo: Path, lines: List[str]) -> None:
+        """Store linter output lines for a file
+
+        :param path_in_repo: Path of the file relative to the repository root
+        :param lines: Linter output lines which start with ``<path>:``
+
+        """
+        split_lines = [line.split(":", 1) for line in lines]
+        path_strs = [path_str for path_str, _ in split_lines]
+        entry = {
+            "absolute": any(Path(path_str).is_absolute() for path_str in path_strs),
+            "tails": [f":{tail}" for _, tail in split_lines],
+        }
+        entry_path = self._get_entry_path(path_in_repo)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write atomically since parallel Darker runs may use the same cache
+        temp_path = entry_path.with_name(f"{entry_path.name}.{os.getpid()}")
+        temp_path.write_text(json.dumps(entry), "utf-8")
+        os.replace(temp_path, entry_path)
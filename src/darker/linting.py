@@ -17,79 +17,655 @@ Pylint, on the other hand::
 All such output from the linter will be printed on the standard output
 provided that the ``<linenum>`` falls on a changed line.
 
+If the revision range ends at a commit instead of the working tree, the changed files
+and linter configuration files are written from that commit into a temporary directory,
+and the linter is run there.
+
 """
 
 import logging
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from subprocess import PIPE, Popen
-from typing import Set, Tuple, Union
+from tempfile import TemporaryDirectory
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
-from darker.git import WORKTREE, EditedLinenumsDiffer, RevisionRange
+from darker.diff import diff_and_get_opcodes
+from darker.git import (
+    WORKTREE,
+    EditedLinenumsCache,
+    RevisionRange,
+    git_get_blobs_at_revision,
+    git_get_content_at_revision,
+    git_get_tree_hash,
+)
+from darker.linter_backends import LINTER_BACKENDS, terminate_linter_processes
+from darker.linter_cache import LINTER_CONFIG_FILES, LinterCache
+from darker.stats import STATS
 
 logger = logging.getLogger(__name__)
 
 
-def _parse_linter_line(
-    line: str, git_root: Path
-) -> Union[Tuple[Path, int], Tuple[None, None]]:
-    # Parse an error/note line.
-    # Given: line == "dir/file.py:123: error: Foo\n"
-    # Sets: path = Path("abs/path/to/dir/file.py:123"
-    #       linenum = 123
-    #       description = "error: Foo"
+# Space to leave unused from the operating system limit for command line arguments
+ARG_MAX_HEADROOM = 4096
+ARG_POINTER_SIZE = 8
+# The maximum command line length for `CreateProcess()` on Windows
+WINDOWS_MAX_CMDLINE_LENGTH = 32767
+
+# Linters started in the background by :func:`start_linters`, and an event which stops
+# them from starting more linter subprocesses when they're cancelled
+_background_futures: List["Future[List[str]]"] = []
+_background_cancelled = threading.Event()
+
+
+# The location at the start of a linter output line, e.g. ``dir/file.py:123:`` or
+# ``dir/file.py:123:4:``, followed by a space. This covers the Mypy, Pylint and Flake8
+# output formats.
+LINTER_LINE_RE = re.compile(r"([^:\n]*):(\d+)(?::\d+)?: ")
+
+
+class LinterOutputParser:
+    """Parse locations from linter output lines
+
+    Linters report many errors in the same files, so each distinct path string in the
+    output is converted to a path relative to the repository root only once. The
+    current working directory must not change while a parser is in use.
+
+    """
+
+    def __init__(self, git_root: Path):
+        self.git_root = git_root
+        self._paths_in_repo: Dict[str, Path] = {}
+
+    def parse_line(self, line: str) -> Union[Tuple[Path, int], Tuple[None, None]]:
+        """Return the path relative to the repository root and line number of an error
+
+        For example, given ``"dir/file.py:123: error: Foo\\n"``, this returns
+        ``(Path("dir/file.py"), 123)`` if the current working directory is the
+        repository root.
+
+        """
+        match = LINTER_LINE_RE.match(line)
+        if not match:
+            # Encountered a non-parseable line which doesn't express a linting error.
+            # For example, on Mypy:
+            # "Found XX errors in YY files (checked ZZ source files)"
+            # "Success: no issues found in 1 source file"
+            logger.debug("Unparseable linter output: %s", line.rstrip("\n"))
+            return None, None
+        return self._get_path_in_repo(match.group(1)), int(match.group(2))
+
+    def parse_message(self, line: str) -> Optional[Tuple[Path, int, str]]:
+        """Return the path, line number and description of an error, or ``None``
+
+        The column number isn't included in the result.
+
+        """
+        match = LINTER_LINE_RE.match(line)
+        if not match:
+            return None
+        path_in_repo = self._get_path_in_repo(match.group(1))
+        description_start = match.end()
+        description = line[description_start:].rstrip("\n")
+        return path_in_repo, int(match.group(2)), description
+
+    def _get_path_in_repo(self, path_str: str) -> Path:
+        """Convert a path in linter output to a path relative to the repository root"""
+        path_in_repo = self._paths_in_repo.get(path_str)
+        if path_in_repo is None:
+            path_from_cwd = Path(path_str).absolute()
+            path_in_repo = path_from_cwd.relative_to(self.git_root)
+            self._paths_in_repo[path_str] = path_in_repo
+        return path_in_repo
+
+
+@dataclass(frozen=True)
+class LinterOptions:
+    """Options for running one linter, given per linter name on the command line
+
+    ``shards`` is the number of linter processes to run in parallel, each on its own
+    part of the sorted list of files to check. ``backend`` is the name of the way to
+    run the linter in :data:`darker.linter_backends.LINTER_BACKENDS`. If ``cache`` is
+    ``True``, linter output is cached for each file using
+    :class:`darker.linter_cache.LinterCache`, with ``cache_scope`` added to the cache
+    keys. If ``baseline`` is ``True``, only messages which the linter doesn't report for
+    the first revision of the range are printed.
+
+    """
+
+    shards: int = 1
+    backend: str = "subprocess"
+    cache: bool = False
+    baseline: bool = False
+    cache_scope: str = field(default="", repr=False)
+
+
+def get_linter_name(cmdline: str) -> str:
+    """Return the name of the linter executable in a linter command line
+
+    >>> get_linter_name("/usr/bin/pylint --disable=all")
+    'pylint'
+
+    """
+    return Path(cmdline.split()[0]).name
+
+
+def parse_linter_options(
+    lint_shards: Iterable[str],
+    lint_backends: Iterable[str] = (),
+    lint_cache: Iterable[str] = (),
+    lint_baseline: Iterable[str] = (),
+) -> Dict[str, LinterOptions]:
+    """Convert ``NAME=VALUE`` command line arguments into per-linter options
+
+    >>> parse_linter_options(["pylint=4"], ["mypy=dmypy"], ["pylint"], ["mypy"])
+    {'pylint': LinterOptions(shards=4, backend='subprocess', cache=True,
+                             baseline=False),
+     'mypy': LinterOptions(shards=1, backend='dmypy', cache=False, baseline=True)}
+
+    :param lint_shards: The ``--lint-shards NAME=N`` values
+    :param lint_backends: The ``--lint-backend NAME=BACKEND`` values
+    :param lint_cache: The ``--lint-cache NAME`` values
+    :param lint_baseline: The ``--lint-baseline NAME`` values
+    :return: Linter names mapped to options for running that linter
+
+    """
+    linter_options: Dict[str, LinterOptions] = {}
+    for name_and_shards in lint_shards:
+        name, shards = name_and_shards.split("=", 1)
+        linter_options[name] = replace(
+            linter_options.get(name, LinterOptions()), shards=int(shards)
+        )
+    for name_and_backend in lint_backends:
+        name, backend = name_and_backend.split("=", 1)
+        linter_options[name] = replace(
+            linter_options.get(name, LinterOptions()), backend=backend
+        )
+    for name in lint_cache:
+        linter_options[name] = replace(
+            linter_options.get(name, LinterOptions()), cache=True
+        )
+    for name in lint_baseline:
+        linter_options[name] = replace(
+            linter_options.get(name, LinterOptions()), baseline=True
+        )
+    return linter_options
+
+
+def get_linter_options(
+    cmdline: str, linter_options: Optional[Dict[str, LinterOptions]]
+) -> LinterOptions:
+    """Return the options for running the linter in the given command line"""
+    return (linter_options or {}).get(get_linter_name(cmdline), LinterOptions())
+
+
+def _get_max_cmdline_length() -> int:
+    """Return the number of bytes available for command line arguments of a linter
+
+    The operating system limits the combined size of command line arguments and
+    environment variables of a new process. Leave some headroom since the environment
+    may grow slightly before the linter is executed.
+
+    """
     try:
-        location, _ = line[:-1].split(": ", 1)
-        path_str, linenum_bytes, *rest = location.split(":")
-        linenum = int(linenum_bytes)
-        if len(rest) > 1:
-            raise ValueError("Too many colon-separated tokens")
-        if len(rest) == 1:
-            # Make sure it column looks like an int on "<path>:<linenum>:<column>"
-            _column = int(rest[0])  # noqa: F841
-    except ValueError:
-        # Encountered a non-parseable line which doesn't express a linting error.
-        # For example, on Mypy:
-        # "Found XX errors in YY files (checked ZZ source files)"
-        # "Success: no issues found in 1 source file"
-        logger.debug("Unparseable linter output: %s", line[:-1])
-        return None, None
-    path_from_cwd = Path(path_str).absolute()
-    path_in_repo = path_from_cwd.relative_to(git_root)
-    return path_in_repo, linenum
+        arg_max = os.sysconf("SC_ARG_MAX")
+    except (AttributeError, ValueError):
+        # Not a POSIX system, most likely Windows
+        return WINDOWS_MAX_CMDLINE_LENGTH
+    environment_size = sum(
+        _get_arg_length(f"{key}={value}") for key, value in os.environ.items()
+    )
+    return arg_max - environment_size - ARG_MAX_HEADROOM
+
+
+def _get_arg_length(arg: str) -> int:
+    """Return the bytes taken by a command line argument, its terminator and pointer"""
+    return len(os.fsencode(arg)) + 1 + ARG_POINTER_SIZE
+
+
+def _split_linter_cmdline(
+    cmdline: str, git_root: Path, paths: Set[Path], shards: int
+) -> List[List[str]]:
+    """Build linter command lines for checking the given files in contiguous shards
+
+    The sorted list of files is divided into ``shards`` contiguous parts of nearly
+    equal size. A part is split further if its command line would be too long for the
+    operating system. Concatenating linter output for the command lines in the returned
+    order gives the same order as running the linter once on all files.
+
+    :param cmdline: The command line for running the linter
+    :param git_root: The repository root for the changed files
+    :param paths: Paths of files to check, relative to ``git_root``
+    :param shards: The number of parts to divide the files into
+    :return: A list of complete linter command lines
+
+    """
+    cmd = cmdline.split()
+    path_strs = [str(git_root / path) for path in sorted(paths)]
+    shard_size = max(1, -(-len(path_strs) // shards))  # ceiling division
+    max_length = _get_max_cmdline_length()
+    cmd_length = sum(_get_arg_length(arg) for arg in cmd)
+    cmdlines = []
+    for shard_start in range(0, len(path_strs), shard_size):
+        batch: List[str] = []
+        batch_length = cmd_length
+        shard_end = shard_start + shard_size
+        for path_str in path_strs[shard_start:shard_end]:
+            path_length = _get_arg_length(path_str)
+            if batch and batch_length + path_length > max_length:
+                cmdlines.append(cmd + batch)
+                batch, batch_length = [], cmd_length
+            batch.append(path_str)
+            batch_length += path_length
+        cmdlines.append(cmd + batch)
+    return cmdlines
+
+
+def _collect_sharded_linter_output(
+    cmds: List[List[str]], git_root: Path, options: LinterOptions, cwd: Path = None
+) -> List[str]:
+    """Run linter command lines in parallel shards and concatenate their output"""
+    backend = LINTER_BACKENDS[options.backend]
+
+    def collect_output(cmd: List[str]) -> List[str]:
+        if _background_cancelled.is_set():
+            return []
+        return list(backend.run(cmd, git_root, cwd))
+
+    jobs = options.shards if backend.concurrent else 1
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        outputs = list(executor.map(collect_output, cmds))
+    return [line for output in outputs for line in output]
+
+
+def _make_linter_paths_absolute(lines: Iterable[str], cwd: Path) -> Iterator[str]:
+    """Convert relative paths at the start of linter output lines to absolute paths"""
+    for line in lines:
+        match = LINTER_LINE_RE.match(line)
+        if match and not Path(match.group(1)).is_absolute():
+            line = f"{cwd / match.group(1)}{line[match.end(1):]}"
+        yield line
+
+
+def _run_linter_shards(
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    options: LinterOptions,
+    cwd: Path = None,
+) -> Iterable[str]:
+    """Run the linter on given files, splitting them into shards if needed
+
+    If all files can be checked with a single linter command line, its output is
+    streamed while the linter is running. Otherwise all command lines are run to
+    completion first and their output is returned in the order of files.
+
+    If the linter is run in another working directory, relative paths in its output
+    are converted to absolute paths.
+
+    """
+    cmds = _split_linter_cmdline(cmdline, git_root, paths, options.shards)
+    lines: Iterable[str]
+    if len(cmds) == 1:
+        lines = LINTER_BACKENDS[options.backend].run(cmds[0], git_root, cwd)
+    else:
+        logger.debug("Running %s linter command lines for %s", len(cmds), cmdline)
+        lines = _collect_sharded_linter_output(cmds, git_root, options, cwd)
+    if cwd is None:
+        return lines
+    return _make_linter_paths_absolute(lines, cwd)
+
+
+def _run_linter_cached(
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    options: LinterOptions,
+    cwd: Path = None,
+) -> Iterator[str]:
+    """Run the linter only on files for which there's no cached output
+
+    Output lines for files found in the cache and fresh output lines are yielded in the
+    order of the files, followed by fresh output lines about any other files.
+
+    """
+    cache = LinterCache(cmdline, git_root, scope=options.cache_scope)
+    parser = LinterOutputParser(git_root)
+    # Fresh output is made absolute if the linter runs in another directory
+    cached_lines = {path: cache.get(path, absolute=cwd is not None) for path in paths}
+    missed_paths = {path for path, lines in cached_lines.items() if lines is None}
+    STATS.count("lint_cache_hits", len(paths) - len(missed_paths))
+    STATS.count("lint_cache_misses", len(missed_paths))
+    logger.debug(
+        "Cached output of %s found for %s of %s files",
+        cmdline,
+        len(paths) - len(missed_paths),
+        len(paths),
+    )
+    fresh_lines: Dict[Path, List[str]] = {path: [] for path in missed_paths}
+    other_lines = []
+    if missed_paths:
+        for line in _run_linter_shards(cmdline, git_root, missed_paths, options, cwd):
+            path_in_repo, _ = parser.parse_line(line)
+            if path_in_repo in fresh_lines:
+                fresh_lines[path_in_repo].append(line)
+            elif path_in_repo is not None:
+                other_lines.append(line)
+        for path, lines in fresh_lines.items():
+            cache.put(path, lines)
+    for path in sorted(paths):
+        if path in missed_paths:
+            yield from fresh_lines[path]
+        else:
+            yield from cached_lines[path] or []
+    yield from other_lines
+
+
+def _run_linter(
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    options: LinterOptions,
+    cwd: Path = None,
+) -> Iterable[str]:
+    """Run the linter on given files and return its output lines"""
+    if options.cache:
+        return _run_linter_cached(cmdline, git_root, paths, options, cwd)
+    return _run_linter_shards(cmdline, git_root, paths, options, cwd)
+
+
+def _materialize_revision(
+    git_root: Path, paths: Set[Path], revision: str, tree_root: Path
+) -> Set[Path]:
+    """Write files to check and linter configuration files at a revision to a directory
+
+    Along with the files to check, ``__init__.py`` files of the packages containing
+    them and linter configuration files in the repository root are written, so linters
+    see the same package structure and settings as in a checkout of the revision.
+
+    :param git_root: The repository root
+    :param paths: Paths of files to check, relative to ``git_root``
+    :param revision: The Git revision to get file contents from
+    :param tree_root: The directory to write files into
+    :return: Paths of files to check which exist at the revision
+
+    """
+    package_inits = {
+        parent / "__init__.py"
+        for path in paths
+        for parent in path.parents
+        if parent != Path(".")
+    }
+    config_paths = {Path(name) for name in LINTER_CONFIG_FILES}
+    blobs = git_get_blobs_at_revision(
+        sorted(paths | package_inits | config_paths), revision, git_root
+    )
+    for path, content in blobs.items():
+        (tree_root / path).parent.mkdir(parents=True, exist_ok=True)
+        (tree_root / path).write_bytes(content)
+    logger.debug("Wrote %s files at %s into %s", len(blobs), revision, tree_root)
+    return {path for path in paths if path in blobs}
+
+
+def _run_linter_at_revision(
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    revision: str,
+    options: LinterOptions,
+) -> Iterator[str]:
+    """Run the linter on files in the working tree or at a Git revision
+
+    For a revision other than the working tree, only files to check and the
+    configuration files needed by linters are written into a temporary directory, and
+    the linter is run there. Paths in its output are then mapped back to the
+    repository.
+
+    """
+    if revision == WORKTREE:
+        yield from _run_linter(cmdline, git_root, paths, options)
+        return
+    with TemporaryDirectory(prefix="darker-lint-") as tmpdir:
+        tree_root = Path(tmpdir).resolve()
+        tree_paths = _materialize_revision(git_root, paths, revision, tree_root)
+        if not tree_paths:
+            return
+        tree_prefix = f"{tree_root}{os.sep}"
+        repo_prefix = f"{git_root.absolute()}{os.sep}"
+        for line in _run_linter(cmdline, tree_root, tree_paths, options, tree_root):
+            if line.startswith(tree_prefix):
+                line = line.replace(tree_prefix, repo_prefix, 1)
+            yield line
+
+
+def _collect_linter_output(
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    revision: str,
+    options: LinterOptions,
+) -> List[str]:
+    """Run the linter on given files to completion and return its output lines"""
+    return list(_run_linter_at_revision(cmdline, git_root, paths, revision, options))
+
+
+def _print_lines_on_changed_linenums(
+    lines: Iterable[str], git_root: Path, edited_linenums: EditedLinenumsCache
+) -> None:
+    """Print linter output lines which report on lines changed in ``revrange``"""
+    parser = LinterOutputParser(git_root)
+    for line in lines:
+        path_in_repo, linter_error_linenum = parser.parse_line(line)
+        if path_in_repo is None or linter_error_linenum is None:
+            continue
+        if edited_linenums.is_edited(path_in_repo, linter_error_linenum):
+            print(line, end="")
+
+
+def _get_unchanged_linenum_map(
+    path_in_repo: Path, git_root: Path, revrange: RevisionRange
+) -> Dict[int, int]:
+    """Map numbers of lines unchanged between ``rev1`` and ``rev2`` to ``rev2`` lines"""
+    old = git_get_content_at_revision(path_in_repo, revrange.rev1, git_root)
+    new = git_get_content_at_revision(path_in_repo, revrange.rev2, git_root)
+    linenum_map: Dict[int, int] = {}
+    for tag, old_start, old_end, new_start, new_end in diff_and_get_opcodes(old, new):
+        if tag == "equal":
+            linenum_map.update(
+                zip(
+                    range(old_start + 1, old_end + 1), range(new_start + 1, new_end + 1)
+                )
+            )
+    return linenum_map
+
+
+def _print_new_messages(
+    lines: Iterable[str],
+    baseline_lines: Iterable[str],
+    git_root: Path,
+    revrange: RevisionRange,
+) -> None:
+    """Print linter output lines with messages which don't appear in the baseline
+
+    Line numbers in linter output for ``rev1`` are mapped to line numbers in ``rev2``
+    through a diff of each file. Messages on lines which were modified can't be mapped
+    and are thus always considered new.
+
+    :param lines: Linter output for ``rev2``
+    :param baseline_lines: Linter output for ``rev1``
+    :param git_root: The repository root for the changed files
+    :param revrange: The Git revision range to compare
+
+    """
+    parser = LinterOutputParser(git_root)
+    linenum_maps: Dict[Path, Dict[int, int]] = {}
+    baseline: Dict[Tuple[Path, int, str], int] = Counter()
+    for line in baseline_lines:
+        message = parser.parse_message(line)
+        if message is None:
+            continue
+        path_in_repo, linenum, description = message
+        if path_in_repo not in linenum_maps:
+            linenum_maps[path_in_repo] = _get_unchanged_linenum_map(
+                path_in_repo, git_root, revrange
+            )
+        new_linenum = linenum_maps[path_in_repo].get(linenum)
+        if new_linenum is not None:
+            baseline[path_in_repo, new_linenum, description] += 1
+    for line in lines:
+        message = parser.parse_message(line)
+        if message is None:
+            continue
+        if baseline[message]:
+            baseline[message] -= 1
+        else:
+            print(line, end="")
+
+
+def _collect_baseline_output(
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    revrange: RevisionRange,
+    options: LinterOptions,
+) -> List[str]:
+    """Run the linter on files at ``rev1``, caching its output for each file
+
+    If caching was enabled for the linter with ``--lint-cache``, cache entries are keyed
+    by the Git blob hash of each file in ``rev1`` like for the working tree. Otherwise
+    the output may depend on other files, so entries are also keyed by the tree hash of
+    ``rev1``. Either way, the baseline is computed only once for each target branch
+    commit.
+
+    """
+    if not options.cache:
+        tree_hash = git_get_tree_hash(revrange.rev1, git_root)
+        options = replace(options, cache=True, cache_scope=tree_hash)
+    return _collect_linter_output(cmdline, git_root, paths, revrange.rev1, options)
 
 
 def run_linter(
-    cmdline: str, git_root: Path, paths: Set[Path], revrange: RevisionRange
+    cmdline: str,
+    git_root: Path,
+    paths: Set[Path],
+    revrange: RevisionRange,
+    options: LinterOptions = LinterOptions(),
+    edited_linenums: EditedLinenumsCache = None,
 ) -> None:
     """Run the given linter and print linting errors falling on changed lines
 
+    With the ``baseline`` option, errors which are new since ``rev1`` are printed
+    instead, whether they fall on changed lines or not.
+
     :param cmdline: The command line for running the linter
     :param git_root: The repository root for the changed files
     :param paths: Paths of files to check, relative to ``git_root``
     :param revrange: The Git revision rango to compare
+    :param options: Options for running the linter, e.g. the number of shards and
+                    the backend
+    :param edited_linenums: Edited line numbers to share between linters. Created
+                            for this linter if omitted.
 
     """
     if not paths:
         return
-    if revrange.rev2 is not WORKTREE:
-        raise NotImplementedError(
-            "Linting arbitrary commits is not supported. "
-            "Please use -r {<rev>|<rev>..|<rev>...} instead."
+    _background_cancelled.clear()
+    lines = _run_linter_at_revision(cmdline, git_root, paths, revrange.rev2, options)
+    if options.baseline:
+        baseline_lines = _collect_baseline_output(
+            cmdline, git_root, paths, revrange, options
         )
-    linter_process = Popen(
-        cmdline.split() + [str(git_root / path) for path in sorted(paths)],
-        stdout=PIPE,
-        encoding="utf-8",
-    )
-    # assert needed for MyPy (see https://stackoverflow.com/q/57350490/15770)
-    assert linter_process.stdout is not None
-    edited_linenums_differ = EditedLinenumsDiffer(git_root, revrange)
-    for line in linter_process.stdout:
-        path_in_repo, linter_error_linenum = _parse_linter_line(line, git_root)
-        if path_in_repo is None:
-            continue
-        edited_linenums = edited_linenums_differ.compare_revisions(
-            path_in_repo, context_lines=0
+        _print_new_messages(lines, baseline_lines, git_root, revrange)
+    else:
+        _print_lines_on_changed_linenums(
+            lines, git_root, edited_linenums or EditedLinenumsCache(git_root, revrange)
         )
-        if linter_error_linenum in edited_linenums:
-            print(line, end="")
+
+
+def start_linters(
+    cmdlines: List[str],
+    git_root: Path,
+    paths: Set[Path],
+    revrange: RevisionRange,
+    linter_options: Dict[str, LinterOptions] = None,
+    edited_linenums: EditedLinenumsCache = None,
+) -> Callable[[], None]:
+    """Start linters in the background and return a function for printing their output
+
+    The linters read the files to check from the working tree. Because of this, this
+    may only be used when the working tree isn't modified before the linters have
+    finished, i.e. when reformatted files aren't written back.
+
+    Output from each linter is collected in a background thread so a linter subprocess
+    is never blocked by a full pipe buffer. Calling the returned function
+    waits for the linters to finish and prints errors falling on changed lines, in the
+    same order as :func:`run_linter` would for each linter in turn.
+
+    :param cmdlines: The command lines for running each linter
+    :param git_root: The repository root for the changed files
+    :param paths: Paths of files to check, relative to ``git_root``
+    :param revrange: The Git revision rango to compare
+    :param linter_options: Options for running linters, keyed by linter name
+    :param edited_linenums: Edited line numbers to share between linters. Created
+                            for these linters if omitted.
+    :return: A function which waits for the linters and prints their filtered output
+
+    """
+    if not paths or not cmdlines:
+        return lambda: None
+    options_list = [get_linter_options(cmdline, linter_options) for cmdline in cmdlines]
+    jobs = len(cmdlines) + sum(options.baseline for options in options_list)
+    _background_cancelled.clear()
+    _background_futures[:] = [f for f in _background_futures if not f.done()]
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    futures = []
+    for cmdline, options in zip(cmdlines, options_list):
+        future = executor.submit(
+            _collect_linter_output, cmdline, git_root, paths, revrange.rev2, options
+        )
+        baseline_future = None
+        if options.baseline:
+            baseline_future = executor.submit(
+                _collect_baseline_output, cmdline, git_root, paths, revrange, options
+            )
+        futures.append((future, baseline_future))
+        _background_futures.extend(filter(None, [future, baseline_future]))
+    executor.shutdown(wait=False)
+
+    edited_linenums_cache = edited_linenums or EditedLinenumsCache(git_root, revrange)
+
+    def print_linter_output() -> None:
+        for future, baseline_future in futures:
+            if baseline_future is None:
+                _print_lines_on_changed_linenums(
+                    future.result(), git_root, edited_linenums_cache
+                )
+            else:
+                _print_new_messages(
+                    future.result(), baseline_future.result(), git_root, revrange
+                )
+
+    return print_linter_output
+
+
+def cancel_linters() -> None:
+    """Stop linters started in the background by :func:`start_linters`
+
+    Linters which haven't started yet are cancelled, and linter subprocesses which are
+    still running are terminated. Nothing is done if the linters have already finished,
+    e.g. after their output has been printed.
+
+    """
+    unfinished = [future for future in _background_futures if not future.done()]
+    _background_futures.clear()
+    if not unfinished:
+        return
+    logger.debug("Stopping %s linters", len(unfinished))
+    _background_cancelled.set()
+    for future in unfinished:
+        future.cancel()
+    terminate_linter_processes()
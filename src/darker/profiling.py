@@ -0,0 +1,114 @@
+"""Profile the processing of each file and save profiles of files which are slow
+
+With ``--profile-dir DIR``, :func:`darker.__main__.format_edited_parts` runs each file
+through the pipeline under :mod:`cProfile`. If processing a file takes longer than the
+``--profile-threshold``, the profile is saved in ``DIR`` for inspection with
+:mod:`pstats` or tools like SnakeViz, and a summary of where the time went is logged.
+
+"""
+
+import cProfile
+import logging
+import pstats
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+
+# The default number of seconds processing a file can take before its profile is saved
+DEFAULT_PROFILE_THRESHOLD = 5.0
+
+# Functions whose cumulative time is summarized for slow files, as parts of paths of
+# source files, function names and the name to show for each. Black is matched on its
+# own entry points since Darker calls it from several places, and functions may move
+# between modules inside the Black package.
+DOMINANT_CALLERS = [
+    ("darker/import_sorting.py", "apply_isort", "isort"),
+    ("/black/", "format_file_contents", "Black"),
+    ("/black/", "format_str", "Black"),
+    ("darker/diff.py", "diff_and_get_opcodes", "difflib"),
+    ("/black/", "assert_equivalent", "assert_equivalent"),
+]
+
+
+def get_dominant_callers(stats: pstats.Stats) -> List[Tuple[str, float]]:
+    """Return cumulative time spent in isort, Black, difflib and AST verification
+
+    If several functions are matched for the same part, like ``format_file_contents()``
+    which calls ``format_str()`` in Black, the largest cumulative time is used so time
+    isn't counted twice.
+
+    :param stats: The profile of processing one file
+    :return: Names of those parts of processing which were run and the total time spent
+             in each, the slowest first
+
+    """
+    cumulative_times: Dict[str, float] = {}
+    # `Stats.stats` maps `(filename, line number, function name)` to
+    # `(primitive calls, total calls, total time, cumulative time, callers)`
+    profile_stats = stats.stats  # type: ignore[attr-defined]
+    for (filename, _linenum, funcname), stat in profile_stats.items():
+        for path_part, caller_funcname, name in DOMINANT_CALLERS:
+            if funcname == caller_funcname and path_part in Path(filename).as_posix():
+                cumulative_times[name] = max(cumulative_times.get(name, 0.0), stat[3])
+    return sorted(cumulative_times.items(), key=lambda item: item[1], reverse=True)
+
+
+class FileProfiler:
+    """Profile processing of one file at a time, saving profiles of slow files"""
+
+    def __init__(self, directory: Path, threshold: float):
+        """Initialize the profiler
+
+        :param directory: The directory to save ``.prof`` files in
+        :param threshold: The number of seconds processing a file must take for its
+                          profile to be saved
+
+        """
+        self.directory = directory
+        self.threshold = threshold
+        self._profile: Optional[cProfile.Profile] = None
+        self._start_time = 0.0
+
+    def start(self) -> None:
+        """Start profiling the processing of a file"""
+        self._profile = cProfile.Profile()
+        self._start_time = time.perf_counter()
+        self._profile.enable()
+
+    def stop(self, path_in_repo: Path, context_retries: int) -> Optional[Path]:
+        """Stop profiling, and save the profile if the file took too long to process
+
+        :param path_in_repo: The path of the processed file relative to the repository
+                             root
+        :param context_retries: The number of times reformatting was retried with more
+                                context lines
+        :return: The path to the saved profile, or ``None`` if the file was processed
+                 quickly enough
+
+        """
+        assert self._profile is not None
+        self._profile.disable()
+        elapsed = time.perf_counter() - self._start_time
+        profile, self._profile = self._profile, None
+        if elapsed < self.threshold:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Percent-encode the path so profiles of different files never collide
+        profile_name = quote(path_in_repo.as_posix(), safe="")
+        profile_path = self.directory / f"{profile_name}.prof"
+        profile.dump_stats(str(profile_path))
+        dominant_callers = get_dominant_callers(pstats.Stats(profile))
+        logger.warning(
+            "Processing %s took %.2fs with %s context retries, saved profile in %s."
+            " Time spent in %s",
+            path_in_repo,
+            elapsed,
+            context_retries,
+            profile_path,
+            ", ".join(f"{name} {seconds:.2f}s" for name, seconds in dominant_callers),
+        )
+        return profile_path
@@ -0,0 +1,381 @@
+"""Re-format parts of a file separately, either edited statements or large pieces
+
+Instead of running Black on the whole file, :func:`run_black_for_regions` finds the
+top-level statements which contain edited lines, using the line spans of statements in
+the abstract syntax tree. Inside classes, the class-level statements containing edited
+lines are used instead of the whole class. Only those regions are sent to Black, and the
+results are spliced back into the file, so the time spent in Black depends on the size
+of the edits instead of the size of the file.
+
+In this example, the method on the third line is the only edited statement::
+
+    >>> document = TextDocument.from_lines(
+    ...     ["x = [ 1 ]", "class A:", "    def f(self): return [ 2 ]", "y = [ 3 ]"]
+    ... )
+    >>> find_regions(document, [3])
+    [Region(start=3, end=3, indent='    ')]
+    >>> run_black_for_regions(Path("a.py"), document, {}, [3]).lines
+    ('x = [ 1 ]', 'class A:', '    def f(self):', '        return [2]', 'y = [ 3 ]')
+
+Class-level statements are dedented for Black, formatted with the line length reduced
+by the indentation, and indented again. Edited lines between statements, e.g. comment
+lines, are left as they are.
+
+For very large files, :func:`run_black_in_parallel` splits the whole file into pieces
+between top-level statements, and re-formats the pieces in parallel worker processes.
+
+If regions or pieces can't be found, e.g. on Python 3.7 and earlier or because of
+``# fmt: off`` comments, or if a reformatted region doesn't parse into an identical
+abstract syntax tree, ``None`` is returned, and the caller should reformat the whole
+file instead.
+
+"""
+
+import ast
+import logging
+import re
+import sys
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, replace
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from black import (
+    TargetVersion,
+    assert_equivalent,
+    detect_target_versions,
+    format_str,
+    lib2to3_parse,
+)
+
+from darker.black_diff import BlackArgs, Mode, get_black_mode
+from darker.stats import STATS
+from darker.utils import TextDocument
+
+logger = logging.getLogger(__name__)
+
+
+# Characters which ``str.splitlines()`` treats as line boundaries but Python doesn't
+NON_PYTHON_LINE_BOUNDARIES = re.compile("[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+# Comments which make Black leave code untouched, possibly across region boundaries
+FMT_OFF_RE = re.compile(r"#\s*(fmt:\s*(off|skip)|yapf:\s*disable)")
+
+# Black keeps two blank lines between top-level statements, so a file can be split there
+PIECE_SEPARATOR = ("", "")
+
+
+@dataclass(frozen=True)
+class Region:
+    """A range of lines with statements which enclose edited lines
+
+    ``start`` and ``end`` are the 1-based line numbers of the first and last lines, and
+    ``indent`` is the indentation of the statements.
+
+    """
+
+    start: int
+    end: int
+    indent: str
+
+
+def _statement_span(node: ast.stmt) -> Tuple[int, int]:
+    """Return the first and last line of a statement, including decorators"""
+    start = node.lineno
+    if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+        start = min([start] + [decorator.lineno for decorator in node.decorator_list])
+    return start, node.end_lineno or node.lineno
+
+
+def _statement_spans(
+    body: List[ast.stmt],
+) -> Iterator[Tuple[int, int, List[ast.stmt]]]:
+    """Yield line spans of statements, combining statements which share lines"""
+    group: List[ast.stmt] = []
+    group_start = group_end = 0
+    for node in body:
+        start, end = _statement_span(node)
+        if group and start <= group_end:
+            group.append(node)
+            group_end = max(group_end, end)
+            continue
+        if group:
+            yield group_start, group_end, group
+        group, group_start, group_end = [node], start, end
+    if group:
+        yield group_start, group_end, group
+
+
+def _find_regions(
+    body: List[ast.stmt], linenums: Sequence[int], lines: Sequence[str]
+) -> Iterator[Region]:
+    """Yield regions of statements in a block which enclose edited lines
+
+    :param body: The statements of a module or a class body
+    :param linenums: Sorted 1-based line numbers of edited lines
+    :param lines: The lines of the document
+
+    """
+    for start, end, group in _statement_spans(body):
+        index = bisect_left(linenums, start)
+        if index == len(linenums) or linenums[index] > end:
+            continue
+        node = group[0]
+        if len(group) == 1 and isinstance(node, ast.ClassDef):
+            body_start = _statement_span(node.body[0])[0]
+            column = node.body[0].col_offset
+            body_line_prefix = lines[body_start - 1][:column]
+            if linenums[index] >= body_start and not body_line_prefix.strip():
+                # Only the class body is edited, and it starts on a line of its own
+                yield from _find_regions(node.body, linenums, lines)
+                continue
+        start_line = lines[start - 1]
+        indent = start_line[: node.col_offset]
+        yield Region(start, end, indent)
+
+
+def find_regions(
+    document: TextDocument, edited_linenums: Iterable[int]
+) -> Optional[List[Region]]:
+    """Find the top-level and class-level statements which enclose edited lines
+
+    :param document: The source code
+    :param edited_linenums: The 1-based line numbers of edited lines
+    :return: Regions of statements to re-format, or ``None`` if they can't be found
+
+    """
+    tree = _parse_module(document)
+    if tree is None:
+        return None
+    return list(_find_regions(tree.body, sorted(edited_linenums), document.lines))
+
+
+def _parse_module(document: TextDocument) -> Optional[ast.Module]:
+    """Parse a document if line numbers of statements can be used to split it"""
+    if sys.version_info < (3, 8):
+        # Line spans of statements are only available in Python 3.8 and later
+        return None
+    source = document.string
+    if NON_PYTHON_LINE_BOUNDARIES.search(source) or FMT_OFF_RE.search(source):
+        return None
+    try:
+        return ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+
+
+def _format_region(
+    lines: Sequence[str], region: Region, mode: Mode
+) -> Optional[List[str]]:
+    """Re-format the lines of a region, keeping their indentation
+
+    :param lines: The lines of the document
+    :param region: The region to re-format
+    :param mode: The Black mode to use for the file
+    :return: The re-formatted lines, or ``None`` if the region can't be re-formatted
+
+    """
+    first, last, indent = region.start - 1, region.end, region.indent
+    region_lines = lines[first:last]
+    if any(line and not line.startswith(indent) for line in region_lines):
+        return None
+    width = len(indent)
+    dedented = "".join(f"{line[width:]}\n" for line in region_lines)
+    line_length = mode.line_length - len(indent.expandtabs())
+    try:
+        formatted = format_str(dedented, mode=replace(mode, line_length=line_length))
+    except ValueError:
+        return None
+    result = [f"{indent}{line}" if line else line for line in formatted.splitlines()]
+    # Indented statements are verified inside a block
+    wrapper = "if True:\n" if indent else ""
+    try:
+        assert_equivalent(
+            wrapper + "".join(f"{line}\n" for line in region_lines),
+            wrapper + "".join(f"{line}\n" for line in result),
+        )
+    except AssertionError:
+        return None
+    return result
+
+
+def run_black_for_regions(
+    src: Path,
+    src_contents: TextDocument,
+    black_args: BlackArgs,
+    edited_linenums: Iterable[int],
+) -> Optional[TextDocument]:
+    """Run Black on the statements which enclose edited lines, and splice the results
+
+    :param src: The originating file path for the source code
+    :param src_contents: The source code
+    :param black_args: Command-line arguments to send to ``black.FileMode``
+    :param edited_linenums: The 1-based line numbers of edited lines
+    :return: The source code with the regions re-formatted, or ``None`` if the whole
+             file needs to be re-formatted instead
+
+    """
+    regions = find_regions(src_contents, edited_linenums)
+    if regions is None:
+        logger.debug("Can't find statements enclosing edited lines in %s", src)
+        return None
+    mode = get_black_mode(src, black_args)
+    if not mode.target_versions:
+        # Features used anywhere in the file affect formatting of every region
+        target_versions = _detect_target_versions(src_contents.string)
+        if not target_versions:
+            return None
+        mode = replace(mode, target_versions=target_versions)
+    lines = src_contents.lines
+    result: List[str] = []
+    position = 0
+    for region in regions:
+        formatted = _format_region(lines, region, mode)
+        if formatted is None:
+            logger.debug(
+                "Can't re-format lines %s-%s of %s separately",
+                region.start,
+                region.end,
+                src,
+            )
+            return None
+        first = region.start - 1
+        result.extend(lines[position:first])
+        result.extend(formatted)
+        position = region.end
+    result.extend(lines[position:])
+    STATS.count("black_regions", len(regions), src)
+    STATS.count(
+        "black_region_lines",
+        sum(region.end - region.start + 1 for region in regions),
+        src,
+    )
+    return TextDocument.from_lines(
+        result, encoding=src_contents.encoding, newline=src_contents.newline
+    )
+
+
+def split_pieces(
+    document: TextDocument, piece_count: int
+) -> Optional[List[Tuple[int, int]]]:
+    """Split a document into pieces of about equal size between top-level statements
+
+    Pieces are only split where two top-level statements are separated by exactly two
+    empty lines, since Black leaves those lines untouched. The lines between pieces are
+    always :data:`PIECE_SEPARATOR`.
+
+    >>> lines = ["a = 1", "", "", "b = 2", "c = 3", "", "", "d = 4"]
+    >>> split_pieces(TextDocument.from_lines(lines), 2)
+    [(0, 5), (7, 8)]
+
+    :param document: The source code
+    :param piece_count: The number of pieces to aim for
+    :return: The 0-based first line and the line after the last line of each piece, or
+             ``None`` if the document can't be split
+
+    """
+    tree = _parse_module(document)
+    # Black removes ``u`` prefixes from strings in the whole file based on this import
+    if tree is None or "unicode_literals" in document.string:
+        return None
+    lines = document.lines
+    # The 0-based indices of the first and last empty line between statements
+    gaps: List[int] = []
+    previous_end: Optional[int] = None
+    for start, end, _group in _statement_spans(tree.body):
+        if (
+            previous_end is not None
+            and start - previous_end == 3
+            and not lines[previous_end]
+            and not lines[previous_end + 1]
+        ):
+            gaps.append(previous_end)
+        previous_end = end
+    pieces = []
+    piece_start = 0
+    for piece_index in range(1, piece_count):
+        target = piece_index * len(lines) // piece_count
+        # Choose the closest of the gaps before and after the target line
+        index = bisect_left(gaps, target)
+        first, last = max(index - 1, 0), index + 1
+        candidates = [gap for gap in gaps[first:last] if gap > piece_start]
+        if candidates:
+            gap = min(candidates, key=lambda gap: abs(gap - target))
+            pieces.append((piece_start, gap))
+            piece_start = gap + len(PIECE_SEPARATOR)
+    if not pieces:
+        return None
+    pieces.append((piece_start, len(lines)))
+    return pieces
+
+
+def _detect_target_versions(source: str) -> Set[TargetVersion]:
+    """Return the Python versions Black would target for a file or a piece of it
+
+    :param source: The source code of the file or piece
+    :return: The Python versions which support all syntax used in the source
+
+    """
+    return detect_target_versions(lib2to3_parse(source.lstrip()))
+
+
+def run_black_in_parallel(
+    src: Path, src_contents: TextDocument, black_args: BlackArgs, workers: int
+) -> Optional[TextDocument]:
+    """Split a file into pieces, and run Black on them in parallel worker processes
+
+    Black chooses the Python versions to target based on the syntax used in the file,
+    which affects e.g. trailing commas. The syntax used in each piece is checked in
+    parallel first, and all pieces are then re-formatted targeting the Python versions
+    which support the syntax of all pieces, like Black would do for the whole file.
+
+    :param src: The originating file path for the source code
+    :param src_contents: The source code
+    :param black_args: Command-line arguments to send to ``black.FileMode``
+    :param workers: The number of worker processes to use
+    :return: The re-formatted source code, or ``None`` if the whole file needs to be
+             re-formatted in one piece instead
+
+    """
+    pieces = split_pieces(src_contents, workers)
+    if pieces is None:
+        logger.debug("Can't split %s into pieces between statements", src)
+        return None
+    logger.info(
+        "Reformatting %s lines of %s in %s pieces in parallel",
+        src_contents.line_count,
+        src,
+        len(pieces),
+    )
+    mode = get_black_mode(src, black_args)
+    lines = src_contents.lines
+    sources = [
+        "".join(f"{line}\n" for line in lines[first:last]) for first, last in pieces
+    ]
+    try:
+        with ProcessPoolExecutor(len(pieces), mp_context=get_context("spawn")) as pool:
+            if not mode.target_versions:
+                target_versions = set.intersection(
+                    *pool.map(_detect_target_versions, sources)
+                )
+                if not target_versions:
+                    # Black would consider all features supported for the whole file
+                    return None
+                mode = replace(mode, target_versions=target_versions)
+            results = list(pool.map(partial(format_str, mode=mode), sources))
+    except (BrokenProcessPool, OSError, ValueError) as exc_info:
+        logger.debug("Can't re-format %s in pieces: %s", src, exc_info)
+        return None
+    result_lines: List[str] = []
+    for formatted in results:
+        if result_lines:
+            result_lines.extend(PIECE_SEPARATOR)
+        result_lines.extend(formatted.splitlines())
+    STATS.count("black_parallel_pieces", len(pieces), src)
+    return TextDocument.from_lines(
+        result_lines, encoding=src_contents.encoding, newline=src_contents.newline
+    )
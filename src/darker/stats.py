@@ -0,0 +1,352 @@
+"""Collect statistics about time and resources spent during a Darker run
+
+Statistics are collected into the module level :data:`STATS` object, which is reset at
+the start of :func:`darker.__main__.main`. It records
+
+- CPU time, peak memory use and wall time of each linter subprocess
+- the number and total wall time of Git subprocesses
+- wall and CPU time spent in each stage of the pipeline in
+  :func:`darker.__main__.format_edited_parts`, in total and for each file
+- counters like the number of Black invocations, retries with more context lines,
+  bytes read and written, and linter cache hits and misses
+
+A summary is logged at the ``INFO`` level at the end of the run, and the whole report
+can be written to a JSON file using the ``--stats FILE`` command line option.
+
+With ``--trace FILE``, the same measurements are also recorded as a timeline of spans
+for each file, pipeline stage, Git subprocess and linter run, and written in the Chrome
+trace event format. The file can be opened in ``chrome://tracing`` or Perfetto_ to see
+how work in different threads overlaps.
+
+.. _Perfetto: https://ui.perfetto.dev/
+
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from subprocess import Popen
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# Pipeline stages, in the order they are run for each file
+STAGES = ["isort", "git_diff", "black", "chunks", "choose", "verify", "write", "lint"]
+
+# CPU time of the current thread, so linters running in background threads aren't
+# counted in pipeline stages. Python 3.6 only has CPU time for the whole process.
+_get_cpu_time: Callable[[], float] = getattr(time, "thread_time", time.process_time)
+
+
+@dataclass
+class SubprocessStats:
+    """Resource usage of one finished subprocess
+
+    CPU times are ``None`` if they aren't available, e.g. on Windows or for linters run
+    inside the Darker process.
+
+    """
+
+    name: str
+    wall_time: float
+    user_time: Optional[float] = None
+    system_time: Optional[float] = None
+    max_rss_kib: Optional[int] = None
+
+
+@dataclass
+class StageStats:
+    """Total time spent in one pipeline stage, and the number of times it was run"""
+
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    count: int = 0
+
+    def add(self, wall_time: float, cpu_time: float) -> None:
+        """Add the time spent in one run of the stage"""
+        self.wall_time += wall_time
+        self.cpu_time += cpu_time
+        self.count += 1
+
+
+@dataclass
+class FileStats:
+    """Time spent in each pipeline stage and counters for one file"""
+
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+
+
+def _get_exit_code(status: int) -> int:
+    """Convert a process status from ``os.wait4()`` into a ``Popen`` return code"""
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def wait_for_subprocess(
+    process: "Popen[str]", name: str, start_time: float
+) -> SubprocessStats:
+    """Wait for a subprocess to finish and return its resource usage
+
+    :param process: The subprocess to wait for
+    :param name: The name to record the subprocess under, e.g. the linter name
+    :param start_time: The ``time.perf_counter()`` value when the process was started
+    :return: Wall time, and on Unix also CPU time and peak memory use of the process
+
+    """
+    if not hasattr(os, "wait4"):
+        process.wait()
+        return SubprocessStats(name, time.perf_counter() - start_time)
+    _pid, status, rusage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - start_time
+    process.returncode = _get_exit_code(status)
+    # `ru_maxrss` is in kilobytes on Linux but in bytes on macOS
+    max_rss_kib = (
+        rusage.ru_maxrss // 1024 if sys.platform == "darwin" else rusage.ru_maxrss
+    )
+    return SubprocessStats(
+        name, wall_time, rusage.ru_utime, rusage.ru_stime, max_rss_kib
+    )
+
+
+class DarkerStats:
+    """Statistics collected from all threads during a Darker run"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.linters: List[SubprocessStats] = []
+        self.git_calls = 0
+        self.git_time = 0.0
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.files: Dict[str, FileStats] = {}
+        self.trace_events: Optional[List[Dict[str, object]]] = None
+        self._trace_start_time = 0.0
+        self._traced_threads: Set[int] = set()
+
+    def reset(self, trace: bool = False) -> None:
+        """Forget all statistics collected so far
+
+        :param trace: ``True`` to also record a timeline of trace events
+
+        """
+        with self._lock:
+            self.linters = []
+            self.git_calls = 0
+            self.git_time = 0.0
+            self.stages = {}
+            self.counters = {}
+            self.files = {}
+            self.trace_events = [] if trace else None
+            self._trace_start_time = time.perf_counter()
+            self._traced_threads = set()
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        start_time: float,
+        end_time: float = None,
+        args: Dict[str, object] = None,
+    ) -> None:
+        """Record a span in the trace of the current thread, if tracing is enabled
+
+        :param name: The name to show for the span
+        :param category: The kind of the span, e.g. ``"stage"`` or ``"git"``
+        :param start_time: The ``time.perf_counter()`` value at the start of the span
+        :param end_time: The ``time.perf_counter()`` value at the end of the span, or
+                         ``None`` if the span ends now
+        :param args: Extra details to show for the span
+
+        """
+        if self.trace_events is None:
+            return
+        if end_time is None:
+            end_time = time.perf_counter()
+        thread_id = threading.get_ident()
+        with self._lock:
+            if thread_id not in self._traced_threads:
+                self._traced_threads.add(thread_id)
+                self.trace_events.append(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": os.getpid(),
+                        "tid": thread_id,
+                        "args": {"name": threading.current_thread().name},
+                    }
+                )
+            self.trace_events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": (start_time - self._trace_start_time) * 1_000_000,
+                    "dur": (end_time - start_time) * 1_000_000,
+                    "pid": os.getpid(),
+                    "tid": thread_id,
+                    "args": args or {},
+                }
+            )
+
+    def _get_file_stats(self, path: Path) -> FileStats:
+        """Return statistics for a file, creating them if needed, with the lock held"""
+        return self.files.setdefault(str(path), FileStats())
+
+    @contextmanager
+    def time_stage(self, stage: str, path: Path = None) -> Iterator[None]:
+        """Record wall and CPU time spent inside the context for a pipeline stage
+
+        :param stage: The name of the stage, one of :data:`STAGES`
+        :param path: The file being processed, or ``None`` if the stage isn't specific
+                     to a single file
+
+        """
+        start_time = time.perf_counter()
+        start_cpu_time = _get_cpu_time()
+        try:
+            yield
+        finally:
+            end_time = time.perf_counter()
+            wall_time = end_time - start_time
+            cpu_time = _get_cpu_time() - start_cpu_time
+            with self._lock:
+                self.stages.setdefault(stage, StageStats()).add(wall_time, cpu_time)
+                if path is not None:
+                    stages = self._get_file_stats(path).stages
+                    stages.setdefault(stage, StageStats()).add(wall_time, cpu_time)
+            if path is None:
+                self.add_span(stage, "stage", start_time, end_time)
+            else:
+                self.add_span(stage, "stage", start_time, end_time, {"path": str(path)})
+
+    def count(self, counter: str, value: int = 1, path: Path = None) -> None:
+        """Increment a counter, in total and for a file if given"""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+            if path is not None:
+                file_counters = self._get_file_stats(path).counters
+                file_counters[counter] = file_counters.get(counter, 0) + value
+
+    def get_lint_cache_hit_rate(self) -> Optional[float]:
+        """Return the ratio of linter cache hits to look-ups, or ``None`` if none"""
+        hits = self.counters.get("lint_cache_hits", 0)
+        lookups = hits + self.counters.get("lint_cache_misses", 0)
+        return hits / lookups if lookups else None
+
+    def add_linter(self, linter_stats: SubprocessStats, start_time: float) -> None:
+        """Record the resource usage of one linter run
+
+        :param linter_stats: The resource usage of the linter
+        :param start_time: The ``time.perf_counter()`` value when the linter was started
+
+        """
+        with self._lock:
+            self.linters.append(linter_stats)
+        if self.trace_events is not None:
+            self.add_span(
+                linter_stats.name,
+                "linter",
+                start_time,
+                start_time + linter_stats.wall_time,
+                asdict(linter_stats),
+            )
+
+    def add_git_call(self, wall_time: float) -> None:
+        """Record one Git subprocess and the time it took"""
+        with self._lock:
+            self.git_calls += 1
+            self.git_time += wall_time
+
+    @contextmanager
+    def time_git_call(self, cmd: List[str]) -> Iterator[None]:
+        """Record a Git subprocess run inside the context and the time it took
+
+        :param cmd: The Git command line, used to name the span in the trace
+
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            end_time = time.perf_counter()
+            self.add_git_call(end_time - start_time)
+            self.add_span(" ".join(cmd[:2]), "git", start_time, end_time, {"cmd": cmd})
+
+    def as_dict(self) -> Dict[str, object]:
+        """Return the statistics as a JSON compatible dictionary"""
+        with self._lock:
+            return {
+                "linters": [asdict(linter_stats) for linter_stats in self.linters],
+                "git": {"calls": self.git_calls, "wall_time": self.git_time},
+                "stages": {
+                    stage: asdict(stage_stats)
+                    for stage, stage_stats in _sort_stages(self.stages)
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "lint_cache_hit_rate": self.get_lint_cache_hit_rate(),
+                "files": {
+                    path: {
+                        "stages": {
+                            stage: asdict(stage_stats)
+                            for stage, stage_stats in _sort_stages(file_stats.stages)
+                        },
+                        "counters": dict(sorted(file_stats.counters.items())),
+                    }
+                    for path, file_stats in sorted(self.files.items())
+                },
+            }
+
+    def log_summary(self) -> None:
+        """Log the resource usage of linters and Git at the ``INFO`` level"""
+        for linter_stats in self.linters:
+            logger.info(
+                "Linter %s: %.2fs wall, %s user, %s system, %s max RSS",
+                linter_stats.name,
+                linter_stats.wall_time,
+                _format_optional(linter_stats.user_time, "{:.2f}s"),
+                _format_optional(linter_stats.system_time, "{:.2f}s"),
+                _format_optional(linter_stats.max_rss_kib, "{} KiB"),
+            )
+        logger.info("Git: %s subprocesses in %.2fs wall", self.git_calls, self.git_time)
+        for stage, stage_stats in _sort_stages(self.stages):
+            logger.info(
+                "Stage %s: %.2fs wall, %.2fs CPU in %s runs",
+                stage,
+                stage_stats.wall_time,
+                stage_stats.cpu_time,
+                stage_stats.count,
+            )
+        for counter, value in sorted(self.counters.items()):
+            logger.info("Counter %s: %s", counter, value)
+
+    def write_json(self, path: Path) -> None:
+        """Write the statistics into a JSON file"""
+        path.write_text(json.dumps(self.as_dict(), indent=2), "utf-8")
+
+    def write_trace(self, path: Path) -> None:
+        """Write recorded trace events into a file in the Chrome trace event format"""
+        with self._lock:
+            trace = {"traceEvents": self.trace_events or [], "displayTimeUnit": "ms"}
+            path.write_text(json.dumps(trace), "utf-8")
+
+
+def _sort_stages(stages: Dict[str, StageStats]) -> List[Tuple[str, StageStats]]:
+    """Sort stage statistics in pipeline order"""
+    return sorted(stages.items(), key=lambda item: STAGES.index(item[0]))
+
+
+def _format_optional(value: Optional[float], template: str) -> str:
+    """Format a statistic value, or return ``"n/a"`` if it's not available"""
+    return "n/a" if value is None else template.format(value)
+
+
+STATS = DarkerStats()
@@ -0,0 +1,177 @@
+"""Fixtures and baseline comparison for Darker's benchmark suite
+
+Benchmarks are marked with ``@pytest.mark.benchmark`` and deselected by default. Run
+them with::
+
+    pytest -m benchmark src/darker/tests/benchmarks
+
+Each benchmark measures the throughput of a scenario, e.g. lines of Python code
+processed per second, and compares it to ``baseline.json`` in this directory. These
+environment variables control the benchmarks:
+
+``DARKER_BENCHMARK_SCALE``
+    ``small`` (the default), ``medium`` or ``large`` to choose how large synthetic
+    repositories and inputs are used
+``DARKER_BENCHMARK_TOLERANCE``
+    The allowed slowdown compared to the baseline as a fraction, ``0.5`` by default
+``DARKER_BENCHMARK_UPDATE_BASELINE``
+    Set to ``1`` to store measured throughput in ``baseline.json`` instead of comparing
+
+"""
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, TypeVar
+
+import pytest
+
+from darker.tests.benchmarks.synthetic_repo import RepoSpec, SyntheticRepo
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+SCALES = ["small", "medium", "large"]
+
+T = TypeVar("T")
+
+
+def get_scale() -> int:
+    """Return the benchmark scale from the environment as an index into ``SCALES``"""
+    scale = os.environ.get("DARKER_BENCHMARK_SCALE", "small")
+    if scale not in SCALES:
+        raise ValueError(
+            f"DARKER_BENCHMARK_SCALE={scale} is not one of {', '.join(SCALES)}"
+        )
+    return SCALES.index(scale)
+
+
+def select_by_scale(scenarios: Dict[str, List[T]]) -> List[T]:
+    """Return scenarios of the current benchmark scale and all smaller scales
+
+    :param scenarios: Scenarios for each benchmark scale, keyed by name of the scale
+
+    """
+    return [
+        scenario
+        for scale in SCALES[: get_scale() + 1]
+        for scenario in scenarios.get(scale, [])
+    ]
+
+
+def measure(
+    function: Callable[[], object], rounds: int = 5, min_round_time: float = 0.1
+) -> float:
+    """Return the fastest time in seconds it takes to call the function once
+
+    The function is called repeatedly in each round until ``min_round_time`` has passed,
+    and the mean time per call is computed for each round. Taking the fastest round
+    filters out noise from other processes.
+
+    :param function: The function to call without arguments
+    :param rounds: The number of rounds to measure
+    :param min_round_time: The minimum time in seconds to keep calling the function in
+                           each round
+
+    """
+    fastest = float("inf")
+    for _round in range(rounds):
+        calls = 0
+        start_time = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start_time
+            if elapsed >= min_round_time:
+                break
+        fastest = min(fastest, elapsed / calls)
+    return fastest
+
+
+class BenchmarkBaseline:
+    """Compare measured throughput of benchmark scenarios to stored values"""
+
+    def __init__(self, path: Path, tolerance: float, update: bool):
+        """Load stored throughput values
+
+        :param path: The path to the JSON file with stored throughput values
+        :param tolerance: The allowed slowdown as a fraction of the stored throughput
+        :param update: ``True`` to store measured values instead of comparing
+
+        """
+        self.path = path
+        self.tolerance = tolerance
+        self.update = update
+        self.expected: Dict[str, float] = (
+            json.loads(path.read_text()) if path.is_file() else {}
+        )
+        self.results: Dict[str, float] = {}
+
+    def check(self, scenario: str, throughput: float) -> None:
+        """Record throughput for a scenario and fail if it's slower than the baseline
+
+        :param scenario: A unique name for the benchmark scenario
+        :param throughput: The measured throughput, higher is better
+
+        """
+        self.results[scenario] = throughput
+        expected = self.expected.get(scenario)
+        if self.update or expected is None:
+            return
+        assert throughput >= expected * (1 - self.tolerance), (
+            f"{scenario}: throughput {throughput:.1f} is below the baseline"
+            f" {expected:.1f} by more than {self.tolerance:.0%}"
+        )
+
+    def save(self) -> None:
+        """Store measured throughput values, keeping values of scenarios not run"""
+        results = {
+            scenario: round(value, 1) for scenario, value in self.results.items()
+        }
+        baseline = {**self.expected, **results}
+        self.path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+    def format_results(self) -> Iterator[str]:
+        """Yield a line of text for each measured scenario and its baseline"""
+        for scenario, throughput in sorted(self.results.items()):
+            expected = self.expected.get(scenario)
+            change = "" if expected is None else f" ({throughput / expected - 1:+.0%})"
+            yield f"{scenario}: {throughput:.1f}/s{change}"
+
+
+BASELINE = BenchmarkBaseline(
+    BASELINE_PATH,
+    float(os.environ.get("DARKER_BENCHMARK_TOLERANCE", "0.5")),
+    os.environ.get("DARKER_BENCHMARK_UPDATE_BASELINE") == "1",
+)
+
+
+@pytest.fixture(scope="session")
+def benchmark_baseline():
+    """Provide the benchmark baseline, and store it at the end if updating"""
+    yield BASELINE
+    if BASELINE.update:
+        BASELINE.save()
+
+
+@pytest.fixture(scope="session")
+def synthetic_repo_factory(tmp_path_factory):
+    """Create synthetic repositories, only once for each size and edit density"""
+    repos: Dict[RepoSpec, SyntheticRepo] = {}
+
+    def get_repo(spec: RepoSpec) -> SyntheticRepo:
+        if spec not in repos:
+            root = tmp_path_factory.mktemp(re.sub(r"\W", "_", spec.name))
+            repos[spec] = SyntheticRepo.create(root, spec)
+        return repos[spec]
+
+    return get_repo
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Show measured throughput of benchmark scenarios at the end of the test run"""
+    if BASELINE.results:
+        terminalreporter.section("Darker benchmarks")
+        for line in BASELINE.format_results():
+            terminalreporter.write_line(line)
@@ -0,0 +1,161 @@
+"""Replay pairs of original and edited Python files through Darker
+
+:func:`darker.__main__.format_edited_parts` retries reformatting with more context
+lines whenever the partially reformatted file doesn't parse into an identical AST. The
+helpers in this module run pairs of original and edited files through it and record the
+number of attempts and time spent for each file. Pairs come either from the checked-in
+corpus in the ``retry_corpus/`` directory, or are generated from snippets of Python code
+which Black reformats in ways known to cause misaligned chunks.
+
+"""
+
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from statistics import mean
+from subprocess import check_call
+from typing import Dict, Iterable, List
+
+from darker.__main__ import format_edited_parts
+from darker.git import RevisionRange
+from darker.stats import STATS
+from darker.verification import NotEquivalentError
+
+CORPUS_DIR = Path(__file__).parent / "retry_corpus"
+
+# Snippets of Python code to build generated files from. Black joins or splits lines in
+# each of them, and adjacent snippets may have identical lines which the diff aligns
+# across statement boundaries.
+SNIPPETS = [
+    "a{i} = foo(\n    {a}\n)\n"
+    "b{i} = bar(argument_number_one_{a}, argument_number_two_{b},"
+    " argument_number_three, argument_four)\n",
+    "c{i} = baz(\n    {a},\n    {b}\n)\n",
+    "x{i} = [\n    {a},\n    {b}\n]\n",
+    "def f{i}(a,\n       b = {a}):\n    return (a +\n            b * {b})\n",
+    "call_{i}(argument_number_one={a}, argument_number_two={b},"
+    " argument_number_three='{a}{b}', four=None)\n",
+    "if x{i}:\n  y = {{'a':{a},\n   'b':{b}}}\nelse:\n  y = ( {a} )\n",
+    "result_{i} = function_with_long_name(first_argument_{a},"
+    " second_argument_{b})[index_{a}]\n",
+    "class C{i}( object ):\n    attr = {a}\n    def m(self): return {b}\n",
+]
+
+
+@dataclass(frozen=True)
+class DocumentPair:
+    """The original content of a Python file and its content after edits"""
+
+    name: str
+    old: str
+    new: str
+
+
+@dataclass(frozen=True)
+class ReplayResult:
+    """The number of reformatting attempts and time spent for one file
+
+    ``failed`` is ``True`` if no number of context lines produced an identical AST.
+
+    """
+
+    name: str
+    attempts: int
+    seconds: float
+    failed: bool
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> List[DocumentPair]:
+    """Load document pairs from ``old.txt`` and ``new.txt`` in each corpus directory"""
+    return [
+        DocumentPair(
+            case_dir.name,
+            (case_dir / "old.txt").read_text(),
+            (case_dir / "new.txt").read_text(),
+        )
+        for case_dir in sorted(corpus_dir.iterdir())
+        if case_dir.is_dir()
+    ]
+
+
+def generate_pair(seed: int, snippets: int = 8, edits: int = 2) -> DocumentPair:
+    """Generate an original file from random snippets and change numbers on some lines
+
+    :param seed: The seed for choosing snippets and edited lines
+    :param snippets: The number of snippets in the file
+    :param edits: The number of lines to edit
+
+    """
+    rng = random.Random(seed)
+    old = "".join(
+        rng.choice(SNIPPETS).format(i=index, a=rng.randint(0, 99), b=rng.randint(0, 99))
+        for index in range(snippets)
+    )
+    lines = old.splitlines()
+    for _edit in range(edits):
+        linenum = rng.randrange(len(lines))
+        lines[linenum] = re.sub(
+            r"\d+", lambda _match: str(rng.randint(100, 999)), lines[linenum], count=1
+        )
+    return DocumentPair(f"generated_{seed}", old, "\n".join(lines) + "\n")
+
+
+def replay(pairs: Iterable[DocumentPair], root: Path) -> List[ReplayResult]:
+    """Run each pair of documents through Darker in a new Git repository
+
+    :param pairs: The original and edited contents of each file
+    :param root: An empty directory to create the Git repository in
+    :return: The number of attempts needed to reformat each file and the time spent
+
+    """
+    pair_list = list(pairs)
+    check_call(["git", "init", "--quiet"], cwd=root)
+    check_call(["git", "config", "user.email", "ci@example.com"], cwd=root)
+    check_call(["git", "config", "user.name", "CI system"], cwd=root)
+    for pair in pair_list:
+        (root / f"{pair.name}.py").write_text(pair.old)
+    check_call(["git", "add", "--all"], cwd=root)
+    check_call(["git", "commit", "--quiet", "-m", "Original files"], cwd=root)
+    results = []
+    for pair in pair_list:
+        path = root / f"{pair.name}.py"
+        path.write_text(pair.new)
+        STATS.reset()
+        start_time = time.perf_counter()
+        try:
+            for _change in format_edited_parts(
+                [path], RevisionRange("HEAD"), False, [], {}, write_back=False
+            ):
+                pass
+            failed = False
+        except NotEquivalentError:
+            failed = True
+        seconds = time.perf_counter() - start_time
+        attempts = STATS.counters.get("context_retries", 0) + 1
+        results.append(ReplayResult(pair.name, attempts, seconds, failed))
+    return results
+
+
+def summarize(results: List[ReplayResult]) -> Dict[str, object]:
+    """Return the distribution of attempts needed to reformat files
+
+    :param results: Results of replaying document pairs
+    :return: The number of files, how many of them needed retries or couldn't be
+             reformatted at all, statistics of attempts per file, a histogram of
+             attempts, and attempts for each file
+
+    """
+    attempts = sorted(result.attempts for result in results)
+    return {
+        "files": len(results),
+        "retried_files": sum(count > 1 for count in attempts),
+        "failed_files": sum(result.failed for result in results),
+        "mean_attempts": round(mean(attempts), 3),
+        "p90_attempts": attempts[int(0.9 * (len(attempts) - 1))],
+        "max_attempts": attempts[-1],
+        "histogram": sorted(Counter(attempts).items()),
+        "attempts_per_file": {result.name: result.attempts for result in results},
+    }
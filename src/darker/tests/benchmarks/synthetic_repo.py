@@ -0,0 +1,120 @@
+"""Generate Git repositories of configurable size with edited Python files"""
+
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from subprocess import check_call
+from typing import List
+
+# Each synthetic function consists of these lines. They need reformatting by Black, and
+# the edited variant changes the dictionary literal.
+FUNCTION_TEMPLATE = [
+    "def function_{index}(arg_a,arg_b = {index}):",
+    "    value = {{ 'a':arg_a, 'b':arg_b }}",
+    "    return value",
+    "",
+]
+EDITED_LINE = "    value = {{ 'a':arg_a, 'b':arg_b, 'edited':{index} }}"
+
+# Unsorted imports at the top of each file give isort something to do
+IMPORT_LINES = ["import sys", "import os", "from typing import List, Dict", ""]
+
+
+@dataclass(frozen=True)
+class RepoSpec:
+    """The size of a synthetic repository and the share of edited lines
+
+    :param files: The number of Python files in the repository
+    :param lines: The approximate number of lines in each file
+    :param edit_density: The share of functions edited since the last commit, between
+                         0.0 and 1.0
+    :param seed: The seed for choosing edited functions
+
+    """
+
+    files: int
+    lines: int
+    edit_density: float
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        """A short name for the spec, like ``10x100@1%``"""
+        size = f"{_format_count(self.files)}x{_format_count(self.lines)}"
+        return f"{size}@{self.edit_density:.0%}"
+
+    @property
+    def functions_per_file(self) -> int:
+        """The number of functions to generate in each file"""
+        return max(1, (self.lines - len(IMPORT_LINES)) // len(FUNCTION_TEMPLATE))
+
+
+def _format_count(count: int) -> str:
+    """Abbreviate a count of thousands, e.g. ``20000`` becomes ``20k``"""
+    return f"{count // 1000}k" if count >= 1000 and count % 1000 == 0 else str(count)
+
+
+def generate_source(spec: RepoSpec, file_index: int, edited: bool) -> str:
+    """Return the contents of one synthetic Python file
+
+    :param spec: The size of the repository and the share of edited functions
+    :param file_index: The number of the file in the repository
+    :param edited: ``True`` to return the edited version of the file, ``False`` for the
+                   committed version
+
+    """
+    rng = random.Random(spec.seed * 1_000_003 + file_index)
+    lines: List[str] = list(IMPORT_LINES)
+    for index in range(spec.functions_per_file):
+        function_lines = [line.format(index=index) for line in FUNCTION_TEMPLATE]
+        if edited and rng.random() < spec.edit_density:
+            function_lines[1] = EDITED_LINE.format(index=index)
+        lines.extend(function_lines)
+    return "\n".join(lines) + "\n"
+
+
+class SyntheticRepo:
+    """A Git repository with generated Python files, some of them edited"""
+
+    def __init__(self, root: Path, spec: RepoSpec):
+        self.root = root
+        self.spec = spec
+        self.paths = [
+            Path(f"package_{index // 100}") / f"module_{index}.py"
+            for index in range(spec.files)
+        ]
+
+    @classmethod
+    def create(cls, root: Path, spec: RepoSpec) -> "SyntheticRepo":
+        """Create a repository, commit the original files and apply edits on top"""
+        repo = cls(root, spec)
+        for command in [
+            ["init", "--quiet"],
+            ["config", "user.email", "ci@example.com"],
+            ["config", "user.name", "CI system"],
+        ]:
+            check_call(["git", *command], cwd=root)
+        repo.write_files(edited=False)
+        check_call(["git", "add", "--all"], cwd=root)
+        check_call(["git", "commit", "--quiet", "-m", "Initial commit"], cwd=root)
+        repo.write_files(edited=True)
+        return repo
+
+    def write_files(self, edited: bool) -> None:
+        """Write the original or edited contents of all files into the working tree
+
+        :param edited: ``True`` to apply edits, ``False`` to restore committed content
+
+        """
+        for file_index, path in enumerate(self.paths):
+            absolute_path = self.root / path
+            absolute_path.parent.mkdir(parents=True, exist_ok=True)
+            absolute_path.write_text(generate_source(self.spec, file_index, edited))
+
+    @property
+    def total_lines(self) -> int:
+        """The number of lines in all files of the repository"""
+        lines_per_file = len(IMPORT_LINES) + len(FUNCTION_TEMPLATE) * (
+            self.spec.functions_per_file
+        )
+        return len(self.paths) * lines_per_file
@@ -0,0 +1,50 @@
+"""Tests for the benchmark baseline comparison"""
+
+import json
+
+import pytest
+
+from darker.tests.benchmarks.conftest import BenchmarkBaseline
+from darker.tests.benchmarks.synthetic_repo import RepoSpec, generate_source
+
+
+@pytest.mark.parametrize(
+    "throughput, expect_failure", [(100.0, False), (51.0, False), (49.0, True)]
+)
+def test_benchmark_baseline_check(tmp_path, throughput, expect_failure):
+    """A scenario fails if it's slower than the baseline by more than the tolerance"""
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"scenario": 100.0}))
+    baseline = BenchmarkBaseline(path, tolerance=0.5, update=False)
+
+    if expect_failure:
+        with pytest.raises(AssertionError):
+            baseline.check("scenario", throughput)
+    else:
+        baseline.check("scenario", throughput)
+
+
+def test_benchmark_baseline_update(tmp_path):
+    """Updating the baseline keeps values for scenarios which weren't run"""
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"old": 1.0, "scenario": 100.0}))
+    baseline = BenchmarkBaseline(path, tolerance=0.5, update=True)
+
+    baseline.check("scenario", 10.04)
+    baseline.check("new", 20.0)
+    baseline.save()
+
+    assert json.loads(path.read_text()) == {"new": 20.0, "old": 1.0, "scenario": 10.0}
+    assert list(baseline.format_results()) == ["new: 20.0/s", "scenario: 10.0/s (-90%)"]
+
+
+def test_generate_source_edit_density():
+    """The share of edited functions follows the edit density of the repository spec"""
+    spec = RepoSpec(files=1, lines=4004, edit_density=0.25)
+
+    original = generate_source(spec, 0, edited=False).splitlines()
+    edited = generate_source(spec, 0, edited=True).splitlines()
+
+    assert len(original) == len(edited) == 4004
+    changed = sum(old != new for old, new in zip(original, edited))
+    assert 200 < changed < 300
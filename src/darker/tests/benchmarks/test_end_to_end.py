@@ -0,0 +1,105 @@
+"""End-to-end benchmarks running Darker on synthetic Git repositories"""
+
+import sys
+import time
+from subprocess import DEVNULL, check_call
+from typing import Dict, List
+
+import pytest
+
+from darker.__main__ import main
+from darker.tests.benchmarks.conftest import measure, select_by_scale
+from darker.tests.benchmarks.synthetic_repo import RepoSpec
+
+pytestmark = pytest.mark.benchmark
+
+REPO_SPECS = select_by_scale(
+    {
+        "small": [
+            RepoSpec(files=10, lines=100, edit_density=0.01),
+            RepoSpec(files=10, lines=100, edit_density=0.1),
+            RepoSpec(files=10, lines=100, edit_density=0.5),
+            RepoSpec(files=10, lines=500, edit_density=0.1),
+        ],
+        "medium": [
+            RepoSpec(files=1000, lines=100, edit_density=0.1),
+            RepoSpec(files=10, lines=2000, edit_density=0.1),
+        ],
+        "large": [
+            RepoSpec(files=10000, lines=100, edit_density=0.1),
+            RepoSpec(files=1000, lines=1000, edit_density=0.1),
+            RepoSpec(files=10, lines=20000, edit_density=0.5),
+        ],
+    }
+)
+
+# A fake linter which reports a message on every tenth line of each file it's given
+FAKE_LINTER = """\
+import sys
+for path in sys.argv[1:]:
+    with open(path) as source:
+        for linenum, _line in enumerate(source, 1):
+            if linenum % 10 == 0:
+                print(f"{path}:{linenum}: fake message")
+"""
+
+MODES: Dict[str, List[str]] = {
+    "diff": ["--diff"],
+    "check": ["--check"],
+    "write": [],
+    "isort": ["--diff", "--isort"],
+    "lint": ["--diff", "--lint", "{fake_linter}"],
+}
+
+
+@pytest.fixture(scope="module")
+def fake_linter(tmp_path_factory):
+    """Return the command line for running the fake linter"""
+    script = tmp_path_factory.mktemp("fake_linter") / "fake_linter.py"
+    script.write_text(FAKE_LINTER)
+    return f"{sys.executable} {script}"
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("spec", REPO_SPECS, ids=lambda spec: spec.name)
+def test_end_to_end(
+    synthetic_repo_factory,
+    benchmark_baseline,
+    fake_linter,
+    monkeypatch,
+    capsys,
+    spec,
+    mode,
+):
+    """Measure lines of code processed per second when running Darker"""
+    repo = synthetic_repo_factory(spec)
+    repo.write_files(edited=True)
+    monkeypatch.chdir(repo.root)
+    argv = [arg.format(fake_linter=fake_linter) for arg in MODES[mode]]
+
+    start_time = time.perf_counter()
+    main([*argv, str(repo.root)])
+    elapsed = time.perf_counter() - start_time
+
+    capsys.readouterr()
+    benchmark_baseline.check(
+        f"end_to_end/{mode}/{spec.name}", repo.total_lines / elapsed
+    )
+
+
+@pytest.mark.parametrize("argv", [["--version"], ["--diff", "."]], ids=" ".join)
+def test_startup(git_repo, benchmark_baseline, argv):
+    """Measure how many times per second Darker starts up when there's nothing to do"""
+    git_repo.add({"a.py": "a = 1\n"}, commit="Initial commit")
+
+    seconds = measure(
+        lambda: check_call(
+            [sys.executable, "-m", "darker", *argv],
+            cwd=str(git_repo.root),
+            stdout=DEVNULL,
+        ),
+        rounds=3,
+        min_round_time=0.5,
+    )
+
+    benchmark_baseline.check(f"startup/{' '.join(argv)}", 1 / seconds)
@@ -0,0 +1,172 @@
+"""Microbenchmarks for diffing, choosing chunks, text documents and AST verification
+
+Each benchmark measures the number of lines processed per second for a realistic
+module from the standard library, and for a synthetic module where almost every line is
+reformatted by Black.
+
+"""
+
+import difflib
+import inspect
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import pytest
+
+from darker.black_diff import run_black
+from darker.chooser import choose_lines
+from darker.diff import (
+    diff_and_get_opcodes,
+    opcodes_to_chunks,
+    opcodes_to_edit_linenums,
+)
+from darker.tests.benchmarks.conftest import measure, select_by_scale
+from darker.tests.benchmarks.synthetic_repo import RepoSpec, generate_source
+from darker.utils import TextDocument
+from darker.verification import verify_ast_unchanged
+
+pytestmark = pytest.mark.benchmark
+
+# Inputs as pairs of a name and a function returning Python source code
+INPUTS: List[Tuple[str, Callable[[], str]]] = select_by_scale(
+    {
+        "small": [
+            ("stdlib-2k", lambda: inspect.getsource(difflib)),
+            (
+                "reformat-500",
+                lambda: generate_source(RepoSpec(1, 500, edit_density=0.1), 0, True),
+            ),
+        ],
+        "medium": [
+            ("stdlib-8k", lambda: 4 * inspect.getsource(difflib)),
+            (
+                "reformat-1k",
+                lambda: generate_source(RepoSpec(1, 1000, edit_density=0.1), 0, True),
+            ),
+        ],
+        "large": [
+            ("stdlib-20k", lambda: 10 * inspect.getsource(difflib)),
+            (
+                "reformat-2k",
+                lambda: generate_source(RepoSpec(1, 2000, edit_density=0.1), 0, True),
+            ),
+        ],
+    }
+)
+
+INPUT_NAMES = [name for name, _get_source in INPUTS]
+
+
+@pytest.fixture(scope="module")
+def documents():
+    """Return original and Black reformatted documents for each input"""
+    result = {}
+    for name, get_source in INPUTS:
+        original = TextDocument.from_str(get_source())
+        result[name] = original, run_black(Path("a.py"), original, {})
+    return result
+
+
+@pytest.fixture(scope="module")
+def opcodes(documents):
+    """Return the diff opcodes between original and reformatted documents"""
+    return {
+        name: diff_and_get_opcodes(original, reformatted)
+        for name, (original, reformatted) in documents.items()
+    }
+
+
+def _edited_linenums(document: TextDocument) -> List[int]:
+    """Pretend that every tenth line of the document has been edited"""
+    return list(range(1, len(document.lines) + 1, 10))
+
+
+@pytest.mark.parametrize("name", INPUT_NAMES)
+def test_diff_and_get_opcodes(benchmark_baseline, documents, name):
+    """Diff an original and a reformatted document"""
+    original, reformatted = documents[name]
+
+    seconds = measure(lambda: diff_and_get_opcodes(original, reformatted), rounds=3)
+
+    benchmark_baseline.check(
+        f"diff_and_get_opcodes/{name}", len(original.lines) / seconds
+    )
+
+
+@pytest.mark.parametrize("name", INPUT_NAMES)
+def test_opcodes_to_edit_linenums(benchmark_baseline, documents, opcodes, name):
+    """Convert diff opcodes to edited line numbers with context lines"""
+    _original, reformatted = documents[name]
+
+    seconds = measure(lambda: list(opcodes_to_edit_linenums(opcodes[name], 3)))
+
+    benchmark_baseline.check(
+        f"opcodes_to_edit_linenums/{name}", len(reformatted.lines) / seconds
+    )
+
+
+@pytest.mark.parametrize("name", INPUT_NAMES)
+def test_opcodes_to_chunks(benchmark_baseline, documents, opcodes, name):
+    """Convert diff opcodes to chunks of original and reformatted lines"""
+    original, reformatted = documents[name]
+
+    seconds = measure(
+        lambda: list(opcodes_to_chunks(opcodes[name], original, reformatted))
+    )
+
+    benchmark_baseline.check(f"opcodes_to_chunks/{name}", len(original.lines) / seconds)
+
+
+@pytest.mark.parametrize("name", INPUT_NAMES)
+def test_choose_lines(benchmark_baseline, documents, opcodes, name):
+    """Choose original or reformatted chunks based on edited lines"""
+    original, reformatted = documents[name]
+    chunks = list(opcodes_to_chunks(opcodes[name], original, reformatted))
+    edited_linenums = _edited_linenums(original)
+
+    seconds = measure(lambda: list(choose_lines(chunks, edited_linenums)))
+
+    benchmark_baseline.check(f"choose_lines/{name}", len(original.lines) / seconds)
+
+
+@pytest.mark.parametrize("newline", ["\n", "\r\n"], ids=["lf", "crlf"])
+@pytest.mark.parametrize("name", INPUT_NAMES)
+def test_text_document(benchmark_baseline, documents, name, newline):
+    """Create documents from strings, and split them to lines and join them back"""
+    original, _reformatted = documents[name]
+    string = newline.join(original.lines) + newline
+    newline_name = "crlf" if newline == "\r\n" else "lf"
+
+    from_str_seconds = measure(lambda: TextDocument.from_str(string))
+    lines_seconds = measure(lambda: TextDocument.from_str(string).lines)
+    string_seconds = measure(
+        lambda: TextDocument.from_lines(original.lines, newline=newline).string
+    )
+
+    for operation, seconds in [
+        ("from_str", from_str_seconds),
+        ("lines", lines_seconds),
+        ("string", string_seconds),
+    ]:
+        benchmark_baseline.check(
+            f"TextDocument.{operation}/{name}-{newline_name}",
+            len(original.lines) / seconds,
+        )
+
+
+@pytest.mark.parametrize("name", INPUT_NAMES)
+def test_verify_ast_unchanged(benchmark_baseline, documents, opcodes, name):
+    """Verify that partially reformatted code has the same AST as the original"""
+    original, reformatted = documents[name]
+    chunks = list(opcodes_to_chunks(opcodes[name], original, reformatted))
+    edited_linenums = _edited_linenums(original)
+    chosen = TextDocument.from_lines(choose_lines(chunks, edited_linenums))
+
+    seconds = measure(
+        lambda: verify_ast_unchanged(original, chosen, chunks, edited_linenums),
+        rounds=3,
+    )
+
+    benchmark_baseline.check(
+        f"verify_ast_unchanged/{name}", len(original.lines) / seconds
+    )
@@ -0,0 +1,78 @@
+"""Measure retries with more context lines on a corpus of original and edited files"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from darker.tests.benchmarks.conftest import select_by_scale
+from darker.tests.benchmarks.retry_corpus import (
+    generate_pair,
+    load_corpus,
+    replay,
+    summarize,
+)
+
+pytestmark = pytest.mark.benchmark
+
+RETRY_BASELINE_PATH = Path(__file__).parent / "retry_baseline.json"
+
+# The number of generated pairs for the largest selected benchmark scale
+GENERATED_PAIRS = select_by_scale({"small": [100], "medium": [500], "large": [2000]})[
+    -1
+]
+
+# Metrics of the attempt distribution which must not grow compared to the baseline
+COMPARED_METRICS = [
+    "retried_files",
+    "failed_files",
+    "mean_attempts",
+    "p90_attempts",
+    "max_attempts",
+]
+
+
+@pytest.fixture(scope="module")
+def retry_baseline(benchmark_baseline):
+    """Load stored distributions of attempts, and store them at the end if updating"""
+    baseline = (
+        json.loads(RETRY_BASELINE_PATH.read_text())
+        if RETRY_BASELINE_PATH.is_file()
+        else {}
+    )
+    yield baseline
+    if benchmark_baseline.update:
+        RETRY_BASELINE_PATH.write_text(
+            json.dumps(baseline, indent=2, sort_keys=True) + "\n"
+        )
+
+
+@pytest.mark.parametrize("corpus", ["checked_in", f"generated_{GENERATED_PAIRS}"])
+def test_retry_distribution(
+    tmp_path, capsys, benchmark_baseline, retry_baseline, corpus
+):
+    """The distribution of attempts per file doesn't get worse than in the baseline"""
+    if corpus == "checked_in":
+        pairs = load_corpus()
+    else:
+        pairs = [generate_pair(seed) for seed in range(GENERATED_PAIRS)]
+
+    results = replay(pairs, tmp_path)
+
+    # Discard debug dumps of chunks printed for files which couldn't be reformatted
+    capsys.readouterr()
+    summary = summarize(results)
+    total_attempts = sum(result.attempts for result in results)
+    total_seconds = sum(result.seconds for result in results)
+    benchmark_baseline.check(f"retry_corpus/{corpus}", total_attempts / total_seconds)
+    expected = retry_baseline.get(corpus)
+    if benchmark_baseline.update or expected is None:
+        retry_baseline[corpus] = summary
+        return
+    assert summary["files"] == expected["files"]
+    worse = {
+        metric: (expected[metric], summary[metric])
+        for metric in COMPARED_METRICS
+        if summary[metric] > expected[metric]
+    }
+    assert not worse, f"Attempts per file got worse (baseline, now): {worse}"
@@ -8,9 +8,9 @@ from typing import Dict, Optional
 from unittest.mock import patch
 
 import pytest
-from black import find_project_root
 from py.path import local as LocalPath
 
+from darker.config import find_project_root
 from darker.git import _git_check_output_lines
 
 
@@ -88,5 +88,5 @@ def git_repo(tmpdir, monkeypatch):
 
 @pytest.fixture
 def find_project_root_cache_clear():
-    """Clear LRU caching in :func:`black.find_project_root` before each test"""
+    """Clear LRU caching in :func:`darker.config.find_project_root` before each test"""
     find_project_root.cache_clear()
@@ -1,6 +1,6 @@
 """Tests for the ``darker.argparse_helpers`` module"""
 
-from argparse import ArgumentParser, Namespace
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from logging import CRITICAL, DEBUG, ERROR, INFO, NOTSET, WARNING
 
 import pytest
@@ -117,3 +117,46 @@ def test_argumentparser_log_level_action(const, count, expect):
     args = parser.parse_args(count * ["-l"])
 
     assert args.log_level == expect
+
+
+@pytest.mark.parametrize(
+    "value, expect",
+    [
+        ("pylint=4", "pylint=4"),
+        ("flake8=1", "flake8=1"),
+        ("pylint=0", ArgumentTypeError),
+        ("pylint=-1", ArgumentTypeError),
+        ("pylint=four", ArgumentTypeError),
+        ("pylint=", ArgumentTypeError),
+        ("=4", ArgumentTypeError),
+        ("pylint", ArgumentTypeError),
+    ],
+)
+def test_name_and_positive_int(value, expect):
+    """``NAME=N`` arguments are validated and returned intact"""
+    with raises_if_exception(expect):
+
+        result = argparse_helpers.name_and_positive_int(value)
+
+        assert result == expect
+
+
+@pytest.mark.parametrize(
+    "value, expect",
+    [
+        ("mypy=dmypy", "mypy=dmypy"),
+        ("pylint=inprocess", "pylint=inprocess"),
+        ("mypy=unknown", ArgumentTypeError),
+        ("mypy=", ArgumentTypeError),
+        ("=dmypy", ArgumentTypeError),
+        ("mypy", ArgumentTypeError),
+    ],
+)
+def test_name_and_choice(value, expect):
+    """``NAME=CHOICE`` arguments are validated and returned intact"""
+    validate = argparse_helpers.name_and_choice(["dmypy", "inprocess"])
+    with raises_if_exception(expect):
+
+        result = validate(value)
+
+        assert result == expect
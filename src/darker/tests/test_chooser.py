@@ -1,6 +1,8 @@
 import pytest
 
-from darker.chooser import choose_lines
+from darker.chooser import choose_lines, map_edited_linenums
+from darker.diff import diff_and_get_opcodes
+from darker.utils import TextDocument
 
 
 @pytest.mark.parametrize(
@@ -24,3 +26,38 @@ def test_choose_edited_lines(edited_line_numbers, expect):
     ]
     result = list(choose_lines(black_chunks, edited_line_numbers))
     assert result == expect
+
+
+@pytest.mark.parametrize(
+    "old_lines, edit_linenums, expect",
+    [
+        (
+            ["original first line", "original second line", "original third line"],
+            [],
+            [],
+        ),
+        (["first line", "original second line", "third line"], [], [1, 3]),
+        (["original first line", "second line", "original third line"], [2], [2, 3]),
+        (["original first line", "changed second", "original third line"], [2], [3]),
+        (["original first line", "second line", "third line"], [2, 3], [2, 3, 4]),
+        (["original first line", "original second line", "third line"], [3], [3]),
+        (["original first line", "changed second", "line", "third"], [2], [4]),
+    ],
+)
+def test_map_edited_linenums(old_lines, edit_linenums, expect):
+    """Only lines which differ from the old revision are mapped as edited"""
+    original = TextDocument.from_lines(
+        ["original first line", "original second line", "original third line"]
+    )
+    old_opcodes = diff_and_get_opcodes(TextDocument.from_lines(old_lines), original)
+    black_chunks = [
+        (1, ("original first line",), ("original first line",)),
+        (2, ("original second line",), ("changed second", "line")),
+        (3, ("original third line",), ("original third line",)),
+    ]
+
+    result = list(
+        map_edited_linenums(black_chunks, edit_linenums, old_lines, old_opcodes)
+    )
+
+    assert result == expect
@@ -1,7 +1,7 @@
 import re
 from pathlib import Path
 from textwrap import dedent
-from unittest.mock import DEFAULT, Mock, call, patch
+from unittest.mock import ANY, DEFAULT, Mock, call, patch
 
 import pytest
 import toml
@@ -10,6 +10,7 @@ from darker import black_diff
 from darker.__main__ import main
 from darker.command_line import make_argument_parser, parse_command_line
 from darker.git import RevisionRange
+from darker.linting import LinterOptions
 from darker.tests.helpers import filter_dict, raises_if_exception
 from darker.utils import TextDocument, joinlines
 
@@ -122,6 +123,96 @@ def test_parse_command_line_config_src(
             ("lint", ["flake8", "mypy"]),
             ("lint", ["flake8", "mypy"]),
         ),
+        (["."], ("lint_shards", []), ("lint_shards", []), ("lint_shards", ...)),
+        (
+            ["--lint-shards", "pylint=4", "--lint-shards", "flake8=2", "."],
+            ("lint_shards", ["pylint=4", "flake8=2"]),
+            ("lint_shards", ["pylint=4", "flake8=2"]),
+            ("lint_shards", ["pylint=4", "flake8=2"]),
+        ),
+        (["."], ("lint_backend", []), ("lint_backend", []), ("lint_backend", ...)),
+        (
+            ["--lint-backend", "mypy=dmypy", "."],
+            ("lint_backend", ["mypy=dmypy"]),
+            ("lint_backend", ["mypy=dmypy"]),
+            ("lint_backend", ["mypy=dmypy"]),
+        ),
+        (["."], ("lint_cache", []), ("lint_cache", []), ("lint_cache", ...)),
+        (
+            ["--lint-cache", "flake8", "."],
+            ("lint_cache", ["flake8"]),
+            ("lint_cache", ["flake8"]),
+            ("lint_cache", ["flake8"]),
+        ),
+        (["."], ("lint_baseline", []), ("lint_baseline", []), ("lint_baseline", ...)),
+        (
+            ["--lint-baseline", "mypy", "."],
+            ("lint_baseline", ["mypy"]),
+            ("lint_baseline", ["mypy"]),
+            ("lint_baseline", ["mypy"]),
+        ),
+        (
+            ["."],
+            ("format_regions", False),
+            ("format_regions", False),
+            ("format_regions", ...),
+        ),
+        (
+            ["--format-regions", "."],
+            ("format_regions", True),
+            ("format_regions", True),
+            ("format_regions", True),
+        ),
+        (
+            ["."],
+            ("parallel_threshold", 20000),
+            ("parallel_threshold", 20000),
+            ("parallel_threshold", ...),
+        ),
+        (
+            ["--parallel-threshold", "0", "."],
+            ("parallel_threshold", 0),
+            ("parallel_threshold", 0),
+            ("parallel_threshold", 0),
+        ),
+        (["."], ("stats", None), ("stats", None), ("stats", ...)),
+        (
+            ["--stats", "stats.json", "."],
+            ("stats", "stats.json"),
+            ("stats", "stats.json"),
+            ("stats", "stats.json"),
+        ),
+        (
+            ["."],
+            ("profile_dir", None),
+            ("profile_dir", None),
+            ("profile_dir", ...),
+        ),
+        (
+            ["--profile-dir", "profiles", "."],
+            ("profile_dir", "profiles"),
+            ("profile_dir", "profiles"),
+            ("profile_dir", "profiles"),
+        ),
+        (
+            ["."],
+            ("profile_threshold", 5.0),
+            ("profile_threshold", 5.0),
+            ("profile_threshold", ...),
+        ),
+        (
+            ["--profile-threshold", "0.5", "."],
+            ("profile_threshold", 0.5),
+            ("profile_threshold", 0.5),
+            ("profile_threshold", 0.5),
+        ),
+        (["."], ("trace", None), ("trace", None), ("trace", ...)),
+        (
+            ["--trace", "trace.json", "."],
+            ("trace", "trace.json"),
+            ("trace", "trace.json"),
+            ("trace", "trace.json"),
+        ),
         (["."], ("config", None), ("config", None), ("config", ...)),
         (
             ["-c", "my.cfg", "."],
@@ -340,15 +431,34 @@ def test_black_options_skip_string_normalization(git_repo, config, options, expe
 @pytest.mark.parametrize(
     'options, expect',
     [
-        (["a.py"], ({Path("a.py")}, RevisionRange("HEAD"), False, [], {})),
-        (["--isort", "a.py"], ({Path("a.py")}, RevisionRange("HEAD"), True, [], {})),
+        (["a.py"], ({Path("a.py")}, RevisionRange("HEAD"), False, [], {}, True, {})),
+        (
+            ["--isort", "a.py"],
+            ({Path("a.py")}, RevisionRange("HEAD"), True, [], {}, True, {}),
+        ),
         (
             ["--config", "my.cfg", "a.py"],
-            ({Path("a.py")}, RevisionRange("HEAD"), False, [], {"config": "my.cfg"}),
+            (
+                {Path("a.py")},
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {"config": "my.cfg"},
+                True,
+                {},
+            ),
         ),
         (
             ["--line-length", "90", "a.py"],
-            ({Path("a.py")}, RevisionRange("HEAD"), False, [], {"line_length": 90}),
+            (
+                {Path("a.py")},
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {"line_length": 90},
+                True,
+                {},
+            ),
         ),
         (
             ["--skip-string-normalization", "a.py"],
@@ -358,9 +468,54 @@ def test_black_options_skip_string_normalization(git_repo, config, options, expe
                 False,
                 [],
                 {"skip_string_normalization": True},
+                True,
+                {},
+            ),
+        ),
+        (
+            ["--diff", "a.py"],
+            ({Path("a.py")}, RevisionRange("HEAD"), False, [], {}, False, {}),
+        ),
+        (
+            ["--check", "a.py"],
+            ({Path("a.py")}, RevisionRange("HEAD"), False, [], {}, False, {}),
+        ),
+        (
+            ["--lint-shards", "pylint=4", "a.py"],
+            (
+                {Path("a.py")},
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                True,
+                {"pylint": LinterOptions(shards=4)},
+            ),
+        ),
+        (
+            ["--lint-backend", "mypy=dmypy", "--lint-shards", "mypy=2", "a.py"],
+            (
+                {Path("a.py")},
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                True,
+                {"mypy": LinterOptions(shards=2, backend="dmypy")},
+            ),
+        ),
+        (
+            ["--lint-baseline", "mypy", "a.py"],
+            (
+                {Path("a.py")},
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                True,
+                {"mypy": LinterOptions(baseline=True)},
             ),
         ),
-        (["--diff", "a.py"], ({Path("a.py")}, RevisionRange("HEAD"), False, [], {})),
     ],
 )
 def test_options(tmpdir, monkeypatch, options, expect):
@@ -375,10 +530,37 @@ def test_options(tmpdir, monkeypatch, options, expect):
 
         retval = main(options)
 
-    format_edited_parts.assert_called_once_with(*expect)
+    format_edited_parts.assert_called_once_with(
+        *expect[:5],
+        write_back=expect[5],
+        linter_options=expect[6],
+        profiler=None,
+        format_regions=False,
+        parallel_threshold=20000,
+        lint_edited_linenums=ANY,
+    )
     assert retval == 0
 
 
+@pytest.mark.parametrize(
+    "options, expect_threshold",
+    [
+        (["--profile-dir", "profiles", "a.py"], 5.0),
+        (["--profile-dir", "profiles", "--profile-threshold", "0.5", "a.py"], 0.5),
+    ],
+)
+def test_options_profile_dir(tmpdir, monkeypatch, options, expect_threshold):
+    """A profiler for the given directory and threshold is passed to the main engine"""
+    monkeypatch.chdir(tmpdir)
+    with patch("darker.__main__.format_edited_parts") as format_edited_parts:
+
+        main(options)
+
+    profiler = format_edited_parts.call_args[1]["profiler"]
+    assert profiler.directory == Path("profiles")
+    assert profiler.threshold == expect_threshold
+
+
 @pytest.mark.parametrize(
     'check, changes, expect_retval',
     [(False, False, 0), (False, True, 0), (True, False, 0), (True, True, 1)],
@@ -389,7 +571,7 @@ def test_main_retval(check, changes, expect_retval):
     format_edited_parts.return_value = (
         [
             (
-                Path("/dummy.py"),
+                Path.cwd() / "dummy.py",
                 TextDocument.from_lines(["old"]),
                 TextDocument.from_lines(["new"]),
             )
@@ -4,11 +4,13 @@ from textwrap import dedent
 import pytest
 
 from darker.diff import (
+    LineInterner,
+    LinenumBitset,
     diff_and_get_opcodes,
     opcodes_to_chunks,
     opcodes_to_edit_linenums,
 )
-from darker.utils import TextDocument
+from darker.utils import LinesView, TextDocument
 
 FUNCTIONS2_PY = dedent(
     """\
@@ -103,6 +105,21 @@ def test_diff_and_get_opcodes():
     assert opcodes == EXPECT_OPCODES
 
 
+def test_diff_and_get_opcodes_interned():
+    """Diffing interned lines gives the same opcodes as diffing lines"""
+    src = TextDocument.from_str(FUNCTIONS2_PY)
+    dst = TextDocument.from_str(FUNCTIONS2_PY_REFORMATTED)
+    interner = LineInterner()
+
+    opcodes = diff_and_get_opcodes(src, dst, interner)
+
+    assert opcodes == EXPECT_OPCODES
+    assert interner.intern(src) is interner.intern(src)
+    assert len(set(interner.intern(src)) | set(interner.intern(dst))) == len(
+        set(src.lines) | set(dst.lines)
+    )
+
+
 def test_opcodes_to_chunks():
     src = TextDocument.from_str(FUNCTIONS2_PY)
     dst = TextDocument.from_str(FUNCTIONS2_PY_REFORMATTED)
@@ -179,6 +196,19 @@ def test_opcodes_to_chunks():
     ]
 
 
+def test_opcodes_to_chunks_views():
+    """Chunks refer to lines of the documents instead of copying them"""
+    src = TextDocument.from_str(FUNCTIONS2_PY)
+    dst = TextDocument.from_str(FUNCTIONS2_PY_REFORMATTED)
+
+    chunks = list(opcodes_to_chunks(EXPECT_OPCODES, src, dst))
+
+    assert all(isinstance(lines, LinesView) for _, *views in chunks for lines in views)
+    original_lines = [line for _, original, _ in chunks for line in original]
+    assert len(original_lines) == len(src.lines)
+    assert all(line is src_line for line, src_line in zip(original_lines, src.lines))
+
+
 EXAMPLE_OPCODES = [
     ("replace", 0, 4, 0, 1),
     ("equal", 4, 6, 1, 3),
@@ -217,3 +247,34 @@ def test_opcodes_to_edit_linenums_empty_opcodes():
     result = list(opcodes_to_edit_linenums([], context_lines=0))
 
     assert result == []
+
+
+@pytest.mark.parametrize(
+    "linenums, linenum, expect",
+    [
+        ([], 0, False),
+        ([], 1, False),
+        ([0], 0, True),
+        ([7], 7, True),
+        ([7], 8, False),
+        ([8], 8, True),
+        ([8], 7, False),
+        ([100_000], 100_000, True),
+        ([100_000], 99_999, False),
+        ([100_000], 100_001, False),
+        ([1], -1, False),
+        ([1], None, False),
+    ],
+)
+def test_linenum_bitset_contains(linenums, linenum, expect):
+    """Membership in a ``LinenumBitset`` matches membership in the original list"""
+    result = linenum in LinenumBitset(linenums)
+
+    assert result == expect
+
+
+def test_linenum_bitset_iter():
+    """A ``LinenumBitset`` iterates over unique line numbers in ascending order"""
+    result = list(LinenumBitset([15, 3, 8, 3, 16, 1]))
+
+    assert result == [1, 3, 8, 15, 16]
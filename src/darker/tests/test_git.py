@@ -8,13 +8,17 @@ from unittest.mock import patch
 
 import pytest
 
+from darker.diff import LineInterner
 from darker.git import (
+    EditedLinenumsCache,
     EditedLinenumsDiffer,
     RevisionRange,
+    git_get_blobs_at_revision,
     git_get_content_at_revision,
     git_get_modified_files,
     should_reformat_file,
 )
+from darker.stats import STATS
 from darker.tests.conftest import GitRepoFixture
 from darker.tests.helpers import raises_if_exception
 from darker.utils import TextDocument
@@ -42,6 +46,18 @@ def test_git_get_content_at_revision(git_repo, revision, expect):
     assert original.lines == expect
 
 
+def test_git_calls_are_counted(git_repo):
+    """The number and duration of Git subprocesses are recorded"""
+    git_repo.add({"my.txt": "content"}, commit="Initial commit")
+    STATS.reset()
+
+    git_get_content_at_revision(Path("my.txt"), "HEAD", Path(git_repo.root))
+    git_get_content_at_revision(Path("my.txt"), "HEAD", Path(git_repo.root))
+
+    assert STATS.git_calls == 2
+    assert STATS.git_time > 0
+
+
 @pytest.mark.parametrize(
     "revision, expect",
     [
@@ -51,13 +67,25 @@ def test_git_get_content_at_revision(git_repo, revision, expect):
 )
 def test_git_get_content_at_revision_git_calls(revision, expect):
     with patch("darker.git.check_output") as check_output:
-        check_output.return_value = "dummy output"
+        check_output.return_value = b"dummy output"
 
         git_get_content_at_revision(Path("my.txt"), revision, Path("cwd"))
 
-        check_output.assert_called_once_with(
-            expect.split(), cwd="cwd", encoding="utf-8"
-        )
+        check_output.assert_called_once_with(expect.split(), cwd="cwd", input=None)
+
+
+def test_git_get_blobs_at_revision(git_repo):
+    """Contents of existing files at a revision are read with one Git command"""
+    git_repo.add({"a.py": "original\n", "b/c.py": ""}, commit="Initial commit")
+    git_repo.add({"a.py": "modified\n"}, commit="Second commit")
+
+    result = git_get_blobs_at_revision(
+        [Path("a.py"), Path("missing.py"), Path("b/c.py"), Path("b")],
+        "HEAD^",
+        Path(git_repo.root),
+    )
+
+    assert result == {Path("a.py"): b"original\n", Path("b/c.py"): b""}
 
 
 @pytest.mark.parametrize(
@@ -341,3 +369,77 @@ def test_edited_linenums_differ_revision_vs_lines(git_repo, context_lines, expec
     result = differ.revision_vs_lines(Path("a.py"), content, context_lines)
 
     assert result == expect
+
+
+def test_edited_linenums_differ_revision_vs_lines_cached(git_repo):
+    """Retrying with more context lines doesn't run Git or diff the content again"""
+    git_repo.add({"a.py": "1\n2\n3\n"}, commit="Initial commit")
+    content = TextDocument.from_lines(["1", "two", "3"])
+    differ = EditedLinenumsDiffer(git_repo.root, RevisionRange("HEAD"))
+    STATS.reset()
+
+    results = [
+        differ.revision_vs_lines(Path("a.py"), content, context_lines)
+        for context_lines in range(3)
+    ]
+    # An equal document with a different newline is found in the cache, too
+    crlf_result = differ.revision_vs_lines(
+        Path("a.py"), TextDocument.from_str("1\r\ntwo\r\n3\r\n"), 1
+    )
+
+    assert results == [[2], [1, 2, 3], [1, 2, 3]]
+    assert crlf_result == [1, 2, 3]
+    assert STATS.git_calls == 1
+
+
+def test_edited_linenums_differ_revision_vs_lines_interned(git_repo):
+    """Diffing against the revision with a line interner gives the same line numbers"""
+    git_repo.add({"a.py": "1\n2\n3\n"}, commit="Initial commit")
+    content = TextDocument.from_lines(["1", "two", "3", "2"])
+    differ = EditedLinenumsDiffer(git_repo.root, RevisionRange("HEAD"))
+    interner = LineInterner()
+
+    result = differ.revision_vs_lines(Path("a.py"), content, 0, interner)
+
+    assert result == [2, 3]
+    assert result == EditedLinenumsDiffer(
+        git_repo.root, RevisionRange("HEAD")
+    ).revision_vs_lines(Path("a.py"), content, 0)
+    assert list(interner.intern(content)) == [0, 3, 2, 1]
+
+
+def test_edited_linenums_cache(git_repo):
+    """Edited lines are computed once per file however lookups jump between files"""
+    paths = git_repo.add(
+        {"a.py": "1\n2\n3\n", "b.py": "1\n2\n3\n"}, commit="Initial commit"
+    )
+    paths["a.py"].write("1\ntwo\n3\n")
+    paths["b.py"].write("one\n2\nthree\n")
+    cache = EditedLinenumsCache(Path(git_repo.root), RevisionRange("HEAD"))
+    lookups = [("a.py", 2), ("b.py", 1), ("a.py", 1), ("b.py", 2), ("b.py", 3)]
+
+    with patch(
+        "darker.git.git_get_content_at_revision",
+        wraps=git_get_content_at_revision,
+    ) as get_content:
+
+        result = [cache.is_edited(Path(path), linenum) for path, linenum in lookups]
+
+    assert result == [True, True, False, False, True]
+    # the worktree and HEAD revisions of both files were read only once
+    assert get_content.call_count == 4
+
+
+def test_edited_linenums_cache_set(git_repo):
+    """Edited lines stored for a file are used without diffing the file"""
+    paths = git_repo.add({"a.py": "1\n2\n3\n"}, commit="Initial commit")
+    paths["a.py"].write("1\ntwo\n3\n")
+    cache = EditedLinenumsCache(Path(git_repo.root), RevisionRange("HEAD"))
+    cache.set(Path("a.py"), [1, 3])
+
+    with patch("darker.git.git_get_content_at_revision") as get_content:
+
+        result = [cache.is_edited(Path("a.py"), linenum) for linenum in [1, 2, 3]]
+
+    assert result == [True, False, True]
+    get_content.assert_not_called()
@@ -0,0 +1,174 @@
+"""Unit tests for :mod:`darker.git_bundle`"""
+
+import json
+import os
+import zipfile
+from pathlib import Path
+from subprocess import CalledProcessError
+from typing import List
+
+import pytest
+
+from darker import git
+from darker.git_bundle import (
+    BUNDLE_FORMAT_VERSION,
+    GitCall,
+    RecordingGitBackend,
+    ReplayGitBackend,
+    record_git,
+    replay_git,
+)
+
+
+def test_recording_git_backend(git_repo):
+    """The recorder stores Git output and contents of files listed by Git"""
+    paths = git_repo.add({"a.py": "original\n"}, commit="Initial commit")
+    paths["a.py"].write("modified\n")
+    root = Path(git_repo.root)
+    recorder = RecordingGitBackend(root)
+
+    diff = recorder.check_output(["git", "diff", "--name-only", "HEAD"], root)
+    with pytest.raises(CalledProcessError):
+        recorder.check_output(["git", "show", "HEAD:./missing.py"], root)
+
+    assert diff == b"a.py\n"
+    assert [(call["cmd"], call["returncode"]) for call in recorder.calls] == [
+        (["git", "diff", "--name-only", "HEAD"], 0),
+        (["git", "show", "HEAD:./missing.py"], 128),
+    ]
+    assert list(recorder.files) == ["a.py"]
+    assert recorder.files["a.py"][0] == b"modified\n"
+
+
+@pytest.mark.parametrize(
+    "cmd, cwd, stdin, expect",
+    [
+        (["git", "show", "HEAD:./a.py"], ".", None, b"a = 1\n"),
+        (["git", "show", "HEAD:./a.py"], "sub", None, LookupError),
+        (["git", "show", "HEAD:./b.py"], ".", None, CalledProcessError),
+        (["git", "cat-file", "--batch"], ".", b"HEAD:a.py\n", b"blob\n"),
+        (["git", "cat-file", "--batch"], ".", b"HEAD:b.py\n", LookupError),
+    ],
+)
+def test_replay_git_backend(tmp_path, cmd, cwd, stdin, expect):
+    """The replayer returns recorded output and raises recorded failures"""
+    calls: List[GitCall] = [
+        {
+            "cmd": ["git", "show", "HEAD:./a.py"],
+            "cwd": ".",
+            "stdin": None,
+            "output": "YSA9IDEK",
+            "returncode": 0,
+        },
+        {
+            "cmd": ["git", "show", "HEAD:./b.py"],
+            "cwd": ".",
+            "stdin": None,
+            "output": "",
+            "returncode": 128,
+        },
+        {
+            "cmd": ["git", "cat-file", "--batch"],
+            "cwd": ".",
+            "stdin": "SEVBRDphLnB5Cg==",
+            "output": "YmxvYgo=",
+            "returncode": 0,
+        },
+    ]
+    replayer = ReplayGitBackend(tmp_path, calls)
+
+    if isinstance(expect, bytes):
+        result = replayer.check_output(cmd, tmp_path / cwd, stdin)
+
+        assert result == expect
+    else:
+        with pytest.raises(expect):
+            replayer.check_output(cmd, tmp_path / cwd, stdin)
+
+
+def test_record_and_replay_git(git_repo, monkeypatch, tmp_path_factory):
+    """Git output and file modification times are restored when replaying a bundle"""
+    paths = git_repo.add(
+        {"setup.cfg": "[flake8]\n", "sub/a.py": "original\n"}, commit="Initial commit"
+    )
+    paths["sub/a.py"].write("modified\n")
+    os.utime(paths["sub/a.py"], (1000000000, 1000000000))
+    monkeypatch.chdir(git_repo.root / "sub")
+    bundle = tmp_path_factory.mktemp("bundle") / "bundle.zip"
+    argv = ["--record", str(bundle), "--diff", "a.py"]
+
+    with record_git(argv, {"diff": True}, bundle):
+        modified = git.git_get_modified_files(
+            [Path("a.py")], git.RevisionRange("HEAD"), Path.cwd()
+        )
+        original = git.git_get_content_at_revision(Path("a.py"), "HEAD", Path.cwd())
+    with replay_git(bundle) as recorded_argv:
+        replayed_modified = git.git_get_modified_files(
+            [Path("a.py")], git.RevisionRange("HEAD"), Path.cwd()
+        )
+        replayed_original = git.git_get_content_at_revision(
+            Path("a.py"), "HEAD", Path.cwd()
+        )
+        replayed_file = Path("a.py")
+        assert Path.cwd().name == "sub"
+        assert replayed_file.read_text() == "modified\n"
+        assert replayed_file.stat().st_mtime == 1000000000
+        assert (Path.cwd().parent / "setup.cfg").is_file()
+
+    assert type(git._git_backend) is git.GitBackend  # pylint: disable=W0212
+    assert recorded_argv == ["--diff", "a.py"]
+    assert replayed_modified == modified == {Path("a.py")}
+    assert replayed_original.lines == original.lines == ("original",)
+
+
+def test_replay_git_unsupported_version(tmp_path):
+    """Replaying a bundle of an unknown format version fails"""
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w") as archive:
+        archive.writestr(
+            "manifest.json", json.dumps({"version": BUNDLE_FORMAT_VERSION + 1})
+        )
+
+    with pytest.raises(ValueError, match="Unsupported bundle format version"):
+        with replay_git(bundle):
+            pass
+
+
+def test_recording_git_backend_outside_root(git_repo, tmp_path_factory, caplog):
+    """Files outside the repository aren't recorded"""
+    git_repo.add({"a.py": "a = 1\n"}, commit="Initial commit")
+    outside = tmp_path_factory.mktemp("outside") / "black.toml"
+    outside.write_text("[tool.black]\n")
+    root = Path(git_repo.root)
+    recorder = RecordingGitBackend(root)
+
+    recorder.write_bundle(
+        root / "bundle.zip", ["--diff", "."], {"config": str(outside)}, root
+    )
+
+    assert not any(".." in relative_path for relative_path in recorder.files)
+    assert f"Not recording {outside}" in caplog.text
+
+
+@pytest.mark.parametrize("cwd, mtimes", [("..", {}), (".", {"../a.py": 1.0})])
+def test_replay_git_outside_root(tmp_path, cwd, mtimes):
+    """Replaying a bundle with paths outside the repository fails"""
+    bundle = tmp_path / "bundle.zip"
+    with zipfile.ZipFile(bundle, "w") as archive:
+        archive.writestr(
+            "manifest.json",
+            json.dumps(
+                {
+                    "version": BUNDLE_FORMAT_VERSION,
+                    "argv": [],
+                    "cwd": cwd,
+                    "config": {},
+                    "mtimes": mtimes,
+                    "git_calls": [],
+                }
+            ),
+        )
+
+    with pytest.raises(ValueError, match="is outside the repository"):
+        with replay_git(bundle):
+            pass
@@ -2,8 +2,8 @@ from pathlib import Path
 from textwrap import dedent
 
 import pytest
-from black import find_project_root
 
+from darker.config import find_project_root
 from darker.import_sorting import apply_isort
 from darker.utils import TextDocument
 
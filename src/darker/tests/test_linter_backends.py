@@ -0,0 +1,121 @@
+"""Unit tests for :mod:`darker.linter_backends`"""
+
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+
+from darker import linter_backends
+from darker.linter_backends import (
+    DmypyBackend,
+    InProcessBackend,
+    LinterBackend,
+    terminate_linter_processes,
+)
+from darker.stats import STATS
+
+
+def test_linter_backend_subprocess(tmp_path):
+    """The default backend runs the command line in a subprocess"""
+    STATS.reset()
+
+    result = list(LinterBackend().run(["echo", "a.py:1: error"], tmp_path))
+
+    assert result == ["a.py:1: error\n"]
+    assert [linter_stats.name for linter_stats in STATS.linters] == ["echo"]
+
+
+def test_terminate_linter_processes(tmp_path):
+    """Running linter subprocesses are terminated and forgotten"""
+    lines = LinterBackend().run(["sh", "-c", "echo started; exec sleep 60"], tmp_path)
+    assert next(lines) == "started\n"
+
+    terminate_linter_processes()
+
+    assert list(lines) == []
+    assert not linter_backends._running_processes  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize(
+    "mypy, expect_dmypy", [("mypy", "dmypy"), ("/venv/bin/mypy", "/venv/bin/dmypy")]
+)
+def test_dmypy_backend(tmp_path, monkeypatch, mypy, expect_dmypy):
+    """The ``dmypy`` backend runs Mypy using a daemon with a per-repository status"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    status_file = linter_backends.get_dmypy_status_file(Path("/repo"))
+    with patch.object(
+        linter_backends, "start_linter_process"
+    ) as start_process, patch.object(linter_backends, "wait_for_subprocess"):
+        start_process.return_value.stdout = ["a.py:1: error: Foo\n"]
+
+        result = list(
+            DmypyBackend().run([mypy, "--strict", "/repo/a.py"], Path("/repo"))
+        )
+
+    start_process.assert_called_once_with(
+        [
+            expect_dmypy,
+            "--status-file",
+            str(status_file),
+            "run",
+            "--",
+            "--strict",
+            "/repo/a.py",
+        ],
+        None,
+    )
+    assert result == ["a.py:1: error: Foo\n"]
+    assert status_file.parent == tmp_path / "darker" / "dmypy"
+
+
+def test_dmypy_backend_status_file(tmp_path, monkeypatch):
+    """Each repository gets its own daemon status file in the Darker cache"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    first = linter_backends.get_dmypy_status_file(tmp_path / "first")
+    second = linter_backends.get_dmypy_status_file(tmp_path / "second")
+
+    assert first.parent.is_dir()
+    assert first != second
+    assert first == linter_backends.get_dmypy_status_file(tmp_path / "first")
+
+
+def test_dmypy_backend_with_cwd(tmp_path, caplog):
+    """A subprocess is run if Mypy needs to run in another working directory"""
+    with patch.object(
+        linter_backends, "start_linter_process"
+    ) as start_process, patch.object(linter_backends, "wait_for_subprocess"):
+        start_process.return_value.stdout = []
+
+        list(DmypyBackend().run(["mypy", "a.py"], Path("/repo"), cwd=tmp_path))
+
+    start_process.assert_called_once_with(["mypy", "a.py"], tmp_path)
+    assert "running a subprocess instead" in caplog.text
+
+
+def test_in_process_backend(tmp_path):
+    """The ``inprocess`` backend calls the Python API runner for the linter"""
+    runner = Mock(return_value="a.py:1: error: Foo\nb.py:2: error: Bar\n")
+    with patch.dict(linter_backends.IN_PROCESS_RUNNERS, {"mypy": runner}):
+
+        result = list(
+            InProcessBackend().run(["/bin/mypy", "--strict", "a.py"], tmp_path)
+        )
+
+    runner.assert_called_once_with(["--strict", "a.py"])
+    assert result == ["a.py:1: error: Foo\n", "b.py:2: error: Bar\n"]
+
+
+@pytest.mark.parametrize(
+    "runners",
+    [{}, {"echo": Mock(side_effect=ImportError)}],
+    ids=["no-runner", "not-installed"],
+)
+def test_in_process_backend_fallback(tmp_path, caplog, runners):
+    """A subprocess is run if the linter can't be run in-process"""
+    with patch.dict(linter_backends.IN_PROCESS_RUNNERS, runners, clear=True):
+
+        result = list(InProcessBackend().run(["echo", "a.py:1: error"], tmp_path))
+
+    assert result == ["a.py:1: error\n"]
+    assert "running a subprocess instead" in caplog.text
@@ -0,0 +1,135 @@
+"""Unit tests for :mod:`darker.linter_cache`"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from darker.linter_cache import LinterCache, get_cache_dir, get_executable_stamp
+
+
+def test_get_cache_dir(monkeypatch, tmp_path):
+    """The cache directory is inside ``$XDG_CACHE_HOME`` if it's set"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+
+    assert get_cache_dir() == tmp_path / "darker"
+
+
+def test_linter_cache_miss(tmp_path):
+    """``None`` is returned for a file without cached output"""
+    (tmp_path / "a.py").write_text("pass\n")
+    cache = LinterCache("flake8", tmp_path, tmp_path / "cache")
+
+    assert cache.get(Path("a.py")) is None
+
+
+@pytest.mark.parametrize(
+    "lines, expect",
+    [
+        ([], []),
+        (["{root}/a.py:1: error\n"], ["{root}/a.py:1: error\n"]),
+        (
+            ["{root}/a.py:1: error\n", "{root}/a.py:2:5: warning\n"],
+            ["{root}/a.py:1: error\n", "{root}/a.py:2:5: warning\n"],
+        ),
+        (["a.py:1:5: relative\n"], ["{relative}:1:5: relative\n"]),
+    ],
+)
+def test_linter_cache_put_get(tmp_path, monkeypatch, lines, expect):
+    """Cached lines are returned with the path of the file added back"""
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "a.py").write_text("pass\n")
+    monkeypatch.chdir(root)
+    cache = LinterCache("flake8", root, tmp_path / "cache")
+
+    cache.put(Path("a.py"), [line.format(root=root) for line in lines])
+    result = LinterCache("flake8", root, tmp_path / "cache").get(Path("a.py"))
+
+    relative = os.path.relpath(root / "a.py")
+    assert result == [line.format(root=root, relative=relative) for line in expect]
+
+
+def test_linter_cache_get_absolute(tmp_path, monkeypatch):
+    """Cached relative paths are returned as absolute paths if requested"""
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "a.py").write_text("pass\n")
+    monkeypatch.chdir(tmp_path)
+    cache = LinterCache("flake8", root, tmp_path / "cache")
+    cache.put(Path("a.py"), ["a.py:1:5: relative\n"])
+
+    result = cache.get(Path("a.py"), absolute=True)
+
+    assert result == [f"{root / 'a.py'}:1:5: relative\n"]
+
+
+@pytest.mark.parametrize(
+    "change",
+    ["content", "cmdline", "config", "scope"],
+)
+def test_linter_cache_invalidation(tmp_path, change):
+    """Cached output isn't used if the file, command line, config or scope changes"""
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "a.py").write_text("pass\n")
+    LinterCache("flake8", root, tmp_path / "cache").put(Path("a.py"), [])
+    cmdline = "flake8"
+    scope = ""
+    if change == "content":
+        (root / "a.py").write_text("pass  # changed\n")
+    elif change == "cmdline":
+        cmdline = "flake8 --max-line-length=100"
+    elif change == "config":
+        (root / "setup.cfg").write_text("[flake8]\n")
+    else:
+        scope = "tree-hash"
+
+    result = LinterCache(cmdline, root, tmp_path / "cache", scope).get(Path("a.py"))
+
+    assert result is None
+
+
+def test_linter_cache_same_content_other_file(tmp_path):
+    """Output cached for one file is reused for another file with the same content"""
+    (tmp_path / "a.py").write_text("pass\n")
+    (tmp_path / "b.py").write_text("pass\n")
+    cache = LinterCache("flake8", tmp_path, tmp_path / "cache")
+    cache.put(Path("a.py"), [f"{tmp_path}/a.py:1: error\n"])
+
+    result = cache.get(Path("b.py"))
+
+    assert result == [f"{tmp_path}/b.py:1: error\n"]
+
+
+def test_get_executable_stamp(tmp_path, monkeypatch):
+    """The stamp changes when the linter executable is modified"""
+    executable = tmp_path / "mylinter"
+    executable.write_text("#!/bin/sh\n")
+    executable.chmod(0o755)
+    os.utime(executable, ns=(1, 1))
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+    stamp = get_executable_stamp("mylinter --strict")
+    os.utime(executable, ns=(2, 2))
+
+    assert stamp == f"{executable.resolve()}:1"
+    assert get_executable_stamp("mylinter") == f"{executable.resolve()}:2"
+    assert get_executable_stamp("missing-linter") == ""
+
+
+def test_linter_cache_invalidation_executable(tmp_path, monkeypatch):
+    """Cached output isn't used if the linter executable changes"""
+    executable = tmp_path / "mylinter"
+    executable.write_text("#!/bin/sh\n")
+    executable.chmod(0o755)
+    monkeypatch.setenv("PATH", str(tmp_path))
+    root = tmp_path / "repo"
+    root.mkdir()
+    (root / "a.py").write_text("pass\n")
+    LinterCache("mylinter", root, tmp_path / "cache").put(Path("a.py"), [])
+    os.utime(executable, ns=(1, 1))
+
+    result = LinterCache("mylinter", root, tmp_path / "cache").get(Path("a.py"))
+
+    assert result is None
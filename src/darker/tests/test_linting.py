@@ -2,12 +2,26 @@
 
 """Unit tests for :mod:`darker.linting`"""
 
+import time
 from pathlib import Path
+from unittest.mock import Mock, patch
 
 import pytest
 
+from darker import linter_backends, linting
 from darker.git import RevisionRange
-from darker.linting import _parse_linter_line, run_linter
+from darker.linter_cache import LinterCache
+from darker.linting import (
+    LinterOptions,
+    LinterOutputParser,
+    _collect_baseline_output,
+    _materialize_revision,
+    _print_new_messages,
+    _split_linter_cmdline,
+    cancel_linters,
+    run_linter,
+    start_linters,
+)
 
 
 @pytest.mark.parametrize(
@@ -18,15 +32,38 @@ from darker.linting import _parse_linter_line, run_linter
         ("no-linenum.py: Description", (None, None)),
         ("mod.py:invalid-linenum:5: Description", (None, None)),
         ("invalid linter output", (None, None)),
+        ("mod.py:42:5:6: Description", (None, None)),
+        ("mod.py:42:5:Description", (None, None)),
+        ("sub/mod.py:42:5: E501 line too long\n", (Path("sub/mod.py"), 42)),
+        (
+            "sub/mod.py:42: error: Name 'x' is not defined  [name-defined]\n",
+            (Path("sub/mod.py"), 42),
+        ),
+        ("Found 1 error in 1 file (checked 1 source file)\n", (None, None)),
+        ("************* Module mod\n", (None, None)),
     ],
 )
-def test_parse_linter_line(git_repo, monkeypatch, line, expect):
+def test_linter_output_parser_parse_line(git_repo, monkeypatch, line, expect):
     """Linter output is parsed correctly"""
     monkeypatch.chdir(git_repo.root)
-    result = _parse_linter_line(line, git_repo.root)
+    result = LinterOutputParser(git_repo.root).parse_line(line)
     assert result == expect
 
 
+def test_linter_output_parser_memoizes_paths(git_repo, monkeypatch):
+    """Each distinct path string in linter output is normalized only once"""
+    monkeypatch.chdir(git_repo.root)
+    parser = LinterOutputParser(git_repo.root)
+    lines = ["a.py:1: first\n", "b.py:2: second\n", "a.py:3:4: third\n"]
+
+    with patch("darker.linting.Path", wraps=Path) as path_class:
+
+        result = [parser.parse_line(line) for line in lines]
+
+    assert result == [(Path("a.py"), 1), (Path("b.py"), 2), (Path("a.py"), 3)]
+    assert path_class.call_count == 2
+
+
 @pytest.mark.parametrize(
     "_descr, paths, location, expect",
     [
@@ -109,3 +146,373 @@ def test_run_linter(git_repo, monkeypatch, capsys, _descr, paths, location, expe
     # The test cases also verify that only linter reports on modified lines are output.
     result = capsys.readouterr().out.splitlines()
     assert result == [line.format(git_repo=git_repo) for line in expect]
+
+
+@pytest.mark.parametrize(
+    "paths, shards, max_length, expect",
+    [
+        (["a.py"], 1, 1000, [["lint", "--x", "/r/a.py"]]),
+        (["a.py"], 4, 1000, [["lint", "--x", "/r/a.py"]]),
+        (
+            ["c.py", "a.py", "b.py"],
+            1,
+            1000,
+            [["lint", "--x", "/r/a.py", "/r/b.py", "/r/c.py"]],
+        ),
+        (
+            ["c.py", "a.py", "b.py"],
+            2,
+            1000,
+            [["lint", "--x", "/r/a.py", "/r/b.py"], ["lint", "--x", "/r/c.py"]],
+        ),
+        (
+            ["c.py", "a.py", "b.py"],
+            3,
+            1000,
+            [
+                ["lint", "--x", "/r/a.py"],
+                ["lint", "--x", "/r/b.py"],
+                ["lint", "--x", "/r/c.py"],
+            ],
+        ),
+        # each argument takes its length + 9 bytes, the command 27 bytes, each path 16
+        (
+            ["c.py", "a.py", "b.py"],
+            1,
+            60,
+            [["lint", "--x", "/r/a.py", "/r/b.py"], ["lint", "--x", "/r/c.py"]],
+        ),
+        (
+            ["c.py", "a.py", "b.py", "d.py"],
+            2,
+            43,
+            [
+                ["lint", "--x", "/r/a.py"],
+                ["lint", "--x", "/r/b.py"],
+                ["lint", "--x", "/r/c.py"],
+                ["lint", "--x", "/r/d.py"],
+            ],
+        ),
+        # a single file is always passed even if the command line becomes too long
+        (["a.py"], 1, 10, [["lint", "--x", "/r/a.py"]]),
+    ],
+)
+def test_split_linter_cmdline(paths, shards, max_length, expect):
+    """Files are split into contiguous shards which fit the command line length limit"""
+    with patch("darker.linting._get_max_cmdline_length", return_value=max_length):
+
+        result = _split_linter_cmdline(
+            "lint --x", Path("/r"), {Path(p) for p in paths}, shards
+        )
+
+    assert result == expect
+
+
+@pytest.mark.parametrize("shards", [1, 2, 3])
+def test_run_linter_shards(git_repo, monkeypatch, capsys, shards):
+    """Output from a sharded linter is in the same order as from a single process"""
+    src_paths = git_repo.add(
+        {"a.py": "1\n", "b.py": "1\n", "c.py": "1\n"}, commit="Initial commit"
+    )
+    for path in src_paths.values():
+        path.write("one\n")
+    monkeypatch.chdir(git_repo.root)
+    # `printf` repeats the format for each of the three paths given to the "linter"
+    cmdline = "printf %s:1:\\040error\\n"
+
+    run_linter(
+        cmdline,
+        Path(git_repo.root),
+        {Path("c.py"), Path("b.py"), Path("a.py")},
+        RevisionRange("HEAD"),
+        LinterOptions(shards=shards),
+    )
+
+    assert capsys.readouterr().out.splitlines() == [
+        f"{git_repo.root}/a.py:1: error",
+        f"{git_repo.root}/b.py:1: error",
+        f"{git_repo.root}/c.py:1: error",
+    ]
+
+
+@pytest.mark.parametrize("shards", [1, 2])
+def test_run_linter_backend(git_repo, monkeypatch, capsys, shards):
+    """The linter is run using the backend chosen in linter options"""
+    src_paths = git_repo.add({"a.py": "1\n", "b.py": "1\n"}, commit="Initial commit")
+    for path in src_paths.values():
+        path.write("one\n")
+    monkeypatch.chdir(git_repo.root)
+    backend = Mock()
+    backend.run.side_effect = lambda cmd, git_root, cwd: [
+        f"{path}:1: {cmd[0]}\n" for path in cmd[1:]
+    ]
+    with patch.dict("darker.linting.LINTER_BACKENDS", {"fake": backend}):
+
+        run_linter(
+            "mylinter",
+            Path(git_repo.root),
+            {Path("a.py"), Path("b.py")},
+            RevisionRange("HEAD"),
+            LinterOptions(shards=shards, backend="fake"),
+        )
+
+    assert backend.run.call_count == shards
+    assert capsys.readouterr().out.splitlines() == [
+        f"{git_repo.root}/a.py:1: mylinter",
+        f"{git_repo.root}/b.py:1: mylinter",
+    ]
+
+
+def test_run_linter_cache(git_repo, monkeypatch, capsys, tmp_path):
+    """With caching enabled, the linter is only run on files without cached output"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    src_paths = git_repo.add({"a.py": "1\n", "b.py": "1\n"}, commit="Initial commit")
+    for path in src_paths.values():
+        path.write("one\n")
+    monkeypatch.chdir(git_repo.root)
+    cmdline = "printf %s:1:\\040error\\n"
+    paths = {Path("a.py"), Path("b.py")}
+    options = LinterOptions(cache=True)
+    run_linter(cmdline, Path(git_repo.root), paths, RevisionRange("HEAD"), options)
+    first_output = capsys.readouterr().out
+    src_paths["b.py"].write("two\n")
+
+    with patch(
+        "darker.linting._run_linter_shards",
+        return_value=[f"{git_repo.root}/b.py:1: error\n"],
+    ) as run_linter_shards:
+
+        run_linter(cmdline, Path(git_repo.root), paths, RevisionRange("HEAD"), options)
+
+    run_linter_shards.assert_called_once_with(
+        cmdline, Path(git_repo.root), {Path("b.py")}, options, None
+    )
+    assert first_output.splitlines() == [
+        f"{git_repo.root}/a.py:1: error",
+        f"{git_repo.root}/b.py:1: error",
+    ]
+    assert capsys.readouterr().out == first_output
+
+
+@pytest.mark.parametrize(
+    "cmdlines, expect",
+    [
+        ([], []),
+        (["echo test.py:2:"], []),
+        (["echo test.py:1:"], ["test.py:1: {git_repo.root}/one.py"]),
+        (
+            ["echo test.py:1:", "echo test.py:2:", "echo test.py:1:42:"],
+            [
+                "test.py:1: {git_repo.root}/one.py",
+                "test.py:1:42: {git_repo.root}/one.py",
+            ],
+        ),
+    ],
+)
+def test_start_linters(git_repo, monkeypatch, capsys, cmdlines, expect):
+    """Background linters print nothing until asked, then output in command order"""
+    src_paths = git_repo.add({"test.py": "1\n2\n"}, commit="Initial commit")
+    src_paths["test.py"].write("one\n2\n")
+    monkeypatch.chdir(git_repo.root)
+
+    print_linter_output = start_linters(
+        cmdlines, Path(git_repo.root), {Path("one.py")}, RevisionRange("HEAD")
+    )
+    output_before = capsys.readouterr().out
+    print_linter_output()
+
+    assert output_before == ""
+    result = capsys.readouterr().out.splitlines()
+    assert result == [line.format(git_repo=git_repo) for line in expect]
+
+
+def test_cancel_linters(git_repo, monkeypatch, tmp_path):
+    """Cancelling background linters terminates their subprocesses"""
+    git_repo.add({"a.py": "1\n"}, commit="Initial commit")
+    linter = tmp_path / "slowlinter"
+    linter.write_text("#!/bin/sh\nexec sleep 60\n")
+    linter.chmod(0o755)
+    monkeypatch.chdir(git_repo.root)
+    start_linters(
+        [str(linter)], Path(git_repo.root), {Path("a.py")}, RevisionRange("HEAD")
+    )
+    futures = list(linting._background_futures)  # pylint: disable=protected-access
+    deadline = time.monotonic() + 10
+    while not linter_backends._running_processes:  # pylint: disable=protected-access
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    cancel_linters()
+
+    assert [future.result(timeout=10) for future in futures] == [[]]
+    assert not linter_backends._running_processes  # pylint: disable=protected-access
+
+
+def test_start_linters_arbitrary_commit(git_repo, monkeypatch, capsys):
+    """Linters check files and configuration from the commit ending the revision range
+
+    We use ``grep`` as our "linter". It reports lines matching patterns listed in
+    ``setup.cfg``. The working tree has different content and patterns, which must not
+    affect the result.
+
+    """
+    git_repo.add({"a.py": " bad\n2\n3\n", "setup.cfg": " bad\n"}, commit="Initial")
+    paths = git_repo.add({"a.py": " bad\n bad\n3\n bad\n"}, commit="Second")
+    paths["a.py"].write(" worse\n")
+    (git_repo.root / "setup.cfg").write(" worse\n")
+    monkeypatch.chdir(git_repo.root)
+
+    print_linter_output = start_linters(
+        ["grep -Hn -f setup.cfg"],
+        Path(git_repo.root),
+        {Path("a.py")},
+        RevisionRange("HEAD~1", "HEAD"),
+    )
+    print_linter_output()
+
+    result = capsys.readouterr().out.splitlines()
+    assert result == [
+        f"{git_repo.root / 'a.py'}:2: bad",
+        f"{git_repo.root / 'a.py'}:4: bad",
+    ]
+
+
+def test_materialize_revision(git_repo, tmp_path_factory):
+    """Files to check, their packages and linter configuration are written out"""
+    tree_root = tmp_path_factory.mktemp("tree")
+    git_repo.add(
+        {
+            "pkg/__init__.py": "",
+            "pkg/sub/__init__.py": "",
+            "pkg/sub/a.py": "a = 1\n",
+            "pkg/b.py": "b = 1\n",
+            "pyproject.toml": "[tool.mypy]\n",
+            "other.py": "",
+        },
+        commit="Initial commit",
+    )
+
+    result = _materialize_revision(
+        Path(git_repo.root),
+        {Path("pkg/sub/a.py"), Path("deleted.py")},
+        "HEAD",
+        tree_root,
+    )
+
+    assert result == {Path("pkg/sub/a.py")}
+    assert sorted(str(p.relative_to(tree_root)) for p in tree_root.glob("**/*.*")) == [
+        "pkg/__init__.py",
+        "pkg/sub/__init__.py",
+        "pkg/sub/a.py",
+        "pyproject.toml",
+    ]
+    assert (tree_root / "pkg/sub/a.py").read_text() == "a = 1\n"
+
+
+def test_print_new_messages(git_repo, monkeypatch, capsys):
+    """Only messages not found on corresponding lines in the baseline are printed"""
+    git_repo.add({"a.py": "1\n2\n3\n"}, commit="Initial commit")
+    paths = git_repo.add({"a.py": "0\n1\n2\nthree\n"}, commit="Second commit")
+    paths["a.py"].write("1\n2\n3\n")
+    monkeypatch.chdir(git_repo.root)
+    baseline_lines = [
+        "a.py:1: old\n",
+        "a.py:2:5: old, column moved\n",
+        "a.py:3: old on a modified line\n",
+        "a.py:1: duplicate\n",
+    ]
+    lines = [
+        "a.py:2: old\n",
+        "a.py:3:7: old, column moved\n",
+        "a.py:4: old on a modified line\n",
+        "a.py:2: duplicate\n",
+        "a.py:2: duplicate\n",
+        "a.py:1: new on an unmodified line\n",
+        "Found 6 errors\n",
+    ]
+
+    _print_new_messages(
+        lines, baseline_lines, Path(git_repo.root), RevisionRange("HEAD~1", "HEAD")
+    )
+
+    assert capsys.readouterr().out.splitlines() == [
+        "a.py:4: old on a modified line",
+        "a.py:2: duplicate",
+        "a.py:1: new on an unmodified line",
+    ]
+
+
+def test_run_linter_baseline(git_repo, monkeypatch, capsys, tmp_path_factory):
+    """With a baseline, errors new since ``rev1`` are printed on any line"""
+    cache_home = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(cache_home))
+    git_repo.add({"a.py": "0\n bad\n2\n", "setup.cfg": " bad\n"}, commit="Initial")
+    (git_repo.root / "a.py").write(" bad\n2\n bad\n")
+    monkeypatch.chdir(git_repo.root)
+
+    run_linter(
+        "grep -Hn -f setup.cfg",
+        Path(git_repo.root),
+        {Path("a.py")},
+        RevisionRange("HEAD"),
+        LinterOptions(baseline=True),
+    )
+
+    assert capsys.readouterr().out.splitlines() == [f"{git_repo.root}/a.py:3: bad"]
+    # the baseline output was cached
+    assert len(list(cache_home.glob("darker/lint/*/*.json"))) == 1
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_run_linter_baseline_cache_key(
+    git_repo, monkeypatch, capsys, tmp_path_factory, cache
+):
+    """Baseline output is keyed by the ``rev1`` tree unless ``--lint-cache`` is used"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path_factory.mktemp("cache")))
+    git_repo.add({"a.py": " bad\n", "setup.cfg": " bad\n"}, commit="Initial")
+    monkeypatch.chdir(git_repo.root)
+    options = LinterOptions(cache=cache, baseline=True)
+    paths = {Path("a.py")}
+    _collect_baseline_output(
+        "grep -Hn -f setup.cfg",
+        Path(git_repo.root),
+        paths,
+        RevisionRange("HEAD"),
+        options,
+    )
+    # another file changes in ``rev1``, which might affect linter output for ``a.py``
+    git_repo.add({"b.py": "import a\n"}, commit="Second")
+
+    with patch("darker.linting._run_linter_shards", return_value=[]) as run_shards:
+        _collect_baseline_output(
+            "grep -Hn -f setup.cfg",
+            Path(git_repo.root),
+            paths,
+            RevisionRange("HEAD"),
+            options,
+        )
+
+    assert run_shards.called is not cache
+
+
+def test_collect_baseline_output_cached_relative(git_repo, monkeypatch, tmp_path):
+    """Cached relative paths are mapped from the temporary tree to the repository"""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    git_repo.add({"a.py": " bad\n", "setup.cfg": " bad\n"}, commit="Initial")
+    monkeypatch.chdir(git_repo.root)
+    cmdline = "grep -n -f setup.cfg"
+    # e.g. Mypy reports relative paths for the working tree
+    LinterCache(cmdline, Path(git_repo.root)).put(Path("a.py"), ["a.py:1: bad\n"])
+
+    with patch("darker.linting._run_linter_shards") as run_shards:
+
+        result = _collect_baseline_output(
+            cmdline,
+            Path(git_repo.root),
+            {Path("a.py")},
+            RevisionRange("HEAD"),
+            LinterOptions(cache=True, baseline=True),
+        )
+
+    run_shards.assert_not_called()
+    assert result == [f"{git_repo.root}/a.py:1: bad\n"]
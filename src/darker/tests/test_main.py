@@ -1,20 +1,32 @@
+import json
+import logging
+import os
+import sys
+import zipfile
 from pathlib import Path
-from subprocess import check_call
+from subprocess import PIPE, check_call, run
 from types import SimpleNamespace
 from unittest.mock import Mock, patch
 
 import pytest
-from black import find_project_root
+from black import assert_equivalent
 
 import darker.__main__
+import darker.git
 import darker.import_sorting
-from darker.git import RevisionRange
+import darker.verification
+from darker.config import find_project_root
+from darker.git import EditedLinenumsCache, RevisionRange
+from darker.profiling import FileProfiler
+from darker.regions import run_black_in_parallel
+from darker.stats import STATS
 from darker.utils import TextDocument
+from darker.verification import NotEquivalentError
 
 
 def test_isort_option_without_isort(tmpdir, without_isort, caplog):
     check_call(["git", "init"], cwd=tmpdir)
-    with patch.object(darker.__main__, "isort", None), pytest.raises(SystemExit):
+    with pytest.raises(SystemExit):
 
         darker.__main__.main(["--isort", str(tmpdir)])
 
@@ -32,10 +44,8 @@ def run_isort(git_repo, monkeypatch, caplog, request):
     paths = git_repo.add({'test1.py': 'original'}, commit='Initial commit')
     paths['test1.py'].write('changed')
     args = getattr(request, "param", ())
-    with patch.multiple(
-        darker.__main__,
-        run_black=Mock(return_value=TextDocument()),
-        verify_ast_unchanged=Mock(),
+    with patch("darker.black_diff.run_black", Mock(return_value=TextDocument())), patch(
+        "darker.verification.verify_ast_unchanged"
     ), patch("darker.import_sorting.isort_code") as isort_code:
         isort_code.return_value = "dummy isort output"
         darker.__main__.main(["--isort", "./test1.py", *args])
@@ -142,6 +152,137 @@ def test_format_edited_parts(git_repo, enable_isort, black_args, newline, expect
     assert changes == expect_changes
 
 
+@pytest.mark.parametrize(
+    "edited, expect_fallbacks",
+    [
+        ("x = [ 1 ]\n\n\ndef f( a ):\n    return [ a ]\n", 0),
+        ("x = [ 1 ]\n\n\ndef f( a ):\n    return [ a ]  # fmt: skip\n", 1),
+    ],
+    ids=["regions", "fallback"],
+)
+def test_format_edited_parts_format_regions(git_repo, edited, expect_fallbacks):
+    """Formatting edited statements separately gives the same result as whole files"""
+    paths = git_repo.add({"a.py": "x = [ 1 ]\n"}, commit="Initial commit")
+    paths["a.py"].write(edited)
+    STATS.reset()
+
+    result = [
+        list(
+            darker.__main__.format_edited_parts(
+                [Path(git_repo.root / "a.py")],
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                format_regions=format_regions,
+            )
+        )
+        for format_regions in [True, False]
+    ]
+
+    assert result[0] == result[1]
+    assert result[0][0][2].lines[0] == "x = [ 1 ]"
+    assert STATS.counters.get("black_region_fallbacks", 0) == expect_fallbacks
+
+
+def test_format_edited_parts_parallel(git_repo, monkeypatch):
+    """Files above the threshold are reformatted in pieces like whole files"""
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    paths = git_repo.add({"a.py": "a = 1\n"}, commit="Initial commit")
+    paths["a.py"].write("a = [ 1 ]\n\n\nb = [ 2 ]\n")
+    STATS.reset()
+
+    result = [
+        list(
+            darker.__main__.format_edited_parts(
+                [Path(git_repo.root / "a.py")],
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                parallel_threshold=parallel_threshold,
+            )
+        )
+        for parallel_threshold in [4, 0]
+    ]
+
+    assert result[0] == result[1]
+    assert result[0][0][2].lines == ("a = [1]", "", "", "b = [2]")
+    assert STATS.counters["black_parallel_pieces"] == 2
+
+
+def test_format_edited_parts_parallel_once_per_file(git_repo, monkeypatch, caplog):
+    """Files are reformatted in pieces only once even if reformatting is retried"""
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    paths = git_repo.add({"a.py": "a  =  1\n\n"}, commit="Initial commit")
+    paths["a.py"].write("a  =  1\n\nb  =  [ 2 ]\n\n\nc  =  [ 3 ]\n")
+    STATS.reset()
+    caplog.set_level(logging.INFO)
+
+    with patch(
+        "darker.regions.run_black_in_parallel", wraps=run_black_in_parallel
+    ) as run_in_parallel, patch(
+        "darker.verification.verify_ast_unchanged",
+        side_effect=[NotEquivalentError(), None],
+    ):
+        result = list(
+            darker.__main__.format_edited_parts(
+                [Path(git_repo.root / "a.py")],
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                parallel_threshold=1,
+            )
+        )
+
+    assert result[0][2].lines == ("a  =  1", "", "b = [2]", "", "", "c = [3]")
+    assert STATS.counters["context_retries"] == 1
+    assert STATS.counters["black_invocations"] == 1
+    run_in_parallel.assert_called_once()
+    assert "in 2 pieces in parallel" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "old, new, expect_lines, expect_counter",
+    [
+        ("a = 1\n", "a = 1\nb = 2\n", None, "fast_path_unchanged"),
+        (None, "a  =  1\nb  =  2\n", ("a = 1", "b = 2"), "fast_path_all_edited"),
+        ("", "a  =  1\nb  =  2\n", ("a = 1", "b = 2"), "fast_path_all_edited"),
+        ("a  =  1\n\n", "a  =  1\n\nb  =  2\n", ("a  =  1", "", "b = 2"), None),
+    ],
+    ids=["unchanged", "untracked", "empty", "partially_edited"],
+)
+def test_format_edited_parts_fast_paths(
+    git_repo, old, new, expect_lines, expect_counter
+):
+    """Chunks aren't chosen or verified if Black made no changes or all lines are new"""
+    if old is not None:
+        git_repo.add({"a.py": old}, commit="Initial commit")
+    else:
+        git_repo.add({"b.py": ""}, commit="Initial commit")
+    (git_repo.root / "a.py").write(new)
+    STATS.reset()
+
+    with patch.object(
+        darker.verification, "assert_equivalent", wraps=assert_equivalent
+    ) as verify:
+        result = list(
+            darker.__main__.format_edited_parts(
+                [Path(git_repo.root / "a.py")], RevisionRange("HEAD"), False, [], {}
+            )
+        )
+
+    assert [chosen.lines for _, _, chosen in result] == (
+        [expect_lines] if expect_lines else []
+    )
+    fast_paths = ["fast_path_unchanged", "fast_path_all_edited"]
+    assert [counter for counter in fast_paths if counter in STATS.counters] == (
+        [expect_counter] if expect_counter else []
+    )
+    assert verify.called == (expect_counter is None)
+
+
 def test_format_edited_parts_all_unchanged(git_repo, monkeypatch):
     """``format_edited_parts()`` yields nothing if no reformatting was needed"""
     monkeypatch.chdir(git_repo.root)
@@ -158,6 +299,113 @@ def test_format_edited_parts_all_unchanged(git_repo, monkeypatch):
     assert result == []
 
 
+@pytest.mark.parametrize(
+    "write_back, expect_calls",
+    [
+        (True, ["run_black", "run_linter"]),
+        (False, ["start_linters", "run_black", "print_linter_output"]),
+    ],
+)
+def test_format_edited_parts_linter_scheduling(git_repo, write_back, expect_calls):
+    """Linters run after reformatting, or in parallel with it if not writing back"""
+    paths = git_repo.add({"a.py": "pass\n"}, commit="Initial commit")
+    paths["a.py"].write("pass  \n")
+    calls = []
+
+    def start_linters(*args):
+        calls.append("start_linters")
+        return lambda: calls.append("print_linter_output")
+
+    def run_black(src, edited, black_args):
+        calls.append("run_black")
+        return edited
+
+    with patch.multiple(
+        darker.__main__,
+        start_linters=Mock(side_effect=start_linters),
+        run_linter=Mock(side_effect=lambda *args: calls.append("run_linter")),
+    ), patch("darker.black_diff.run_black", Mock(side_effect=run_black)):
+
+        list(
+            darker.__main__.format_edited_parts(
+                [Path(git_repo.root / "a.py")],
+                RevisionRange("HEAD"),
+                False,
+                ["mylinter"],
+                {},
+                write_back=write_back,
+            )
+        )
+
+    assert calls == expect_calls
+
+
+def test_format_edited_parts_lint_edited_linenums(git_repo):
+    """Edited lines of reformatted files are passed to linters without a new diff"""
+    paths = git_repo.add({"a.py": "a = 1\nb = 2\n"}, commit="Initial commit")
+    paths["a.py"].write("a = 1\nx  =  [1,\n2]\nb = 2\n")
+    run_linter = Mock()
+    edited_linenums = EditedLinenumsCache(Path(git_repo.root), RevisionRange("HEAD"))
+    read_rev1 = Mock(wraps=darker.git.git_get_content_at_revision)
+
+    with patch.object(darker.__main__, "run_linter", run_linter), patch(
+        "darker.git.git_get_content_at_revision", read_rev1
+    ):
+
+        changes = []
+        for path, old, new in darker.__main__.format_edited_parts(
+            [Path(git_repo.root / "a.py")],
+            RevisionRange("HEAD"),
+            False,
+            ["mylinter"],
+            {},
+            write_back=True,
+            lint_edited_linenums=edited_linenums,
+        ):
+            changes.append((path, old, new))
+            darker.__main__.modify_file(path, new)
+            edited_linenums.mark_written(path)
+
+    assert run_linter.call_args[0][5] is edited_linenums
+    with patch("darker.git.git_get_content_at_revision") as get_content:
+
+        result = [edited_linenums.is_edited(Path("a.py"), n) for n in range(1, 5)]
+
+    assert changes[0][2].lines == ("a = 1", "x = [1, 2]", "b = 2")
+    assert result == [False, True, False, False]
+    get_content.assert_not_called()
+    read_rev1.assert_called_once()
+
+
+@pytest.mark.parametrize("mark_written", [False, True])
+def test_format_edited_parts_lint_edited_linenums_unchanged_lines(
+    git_repo, mark_written
+):
+    """Reformatted lines identical to ``rev1`` aren't passed to linters as edited"""
+    paths = git_repo.add({"a.py": "x = [\n    1,\n    2,\n]\n"}, commit="Initial")
+    paths["a.py"].write("x = [\n    1,\n  2,\n]\n")
+    edited_linenums = EditedLinenumsCache(Path(git_repo.root), RevisionRange("HEAD"))
+
+    with patch.object(darker.__main__, "run_linter"):
+
+        for path, _old, new in darker.__main__.format_edited_parts(
+            [Path(git_repo.root / "a.py")],
+            RevisionRange("HEAD"),
+            False,
+            ["mylinter"],
+            {},
+            write_back=True,
+            lint_edited_linenums=edited_linenums,
+        ):
+            if mark_written:
+                darker.__main__.modify_file(path, new)
+                edited_linenums.mark_written(path)
+
+    result = [edited_linenums.is_edited(Path("a.py"), n) for n in range(1, 5)]
+    # without writing, edited lines are computed from the unmodified file
+    assert result == [False, False, not mark_written, False]
+
+
 @pytest.mark.parametrize(
     'arguments, expect_stdout, expect_a_py, expect_retval',
     [
@@ -221,6 +469,265 @@ def test_main_encoding(git_repo, encoding, text, newline):
     assert result == b"".join(expect)
 
 
+def test_main_stats(git_repo, monkeypatch, tmp_path_factory):
+    """``--stats`` writes resource usage of linters and Git into a JSON file"""
+    monkeypatch.chdir(git_repo.root)
+    paths = git_repo.add({"a.py": "a = 1\n"}, commit="Initial commit")
+    paths["a.py"].write("a = 1\nb  =  2\n")
+    stats_path = tmp_path_factory.mktemp("stats") / "stats.json"
+
+    darker.__main__.main(["--stats", str(stats_path), "-L", "echo", "a.py"])
+
+    result = json.loads(stats_path.read_text())
+    assert [linter["name"] for linter in result["linters"]] == ["echo"]
+    assert result["git"]["calls"] > 0
+    assert list(result["stages"]) == [
+        "git_diff",
+        "black",
+        "chunks",
+        "choose",
+        "verify",
+        "write",
+        "lint",
+    ]
+    assert result["counters"]["black_invocations"] == 1
+    assert result["counters"]["bytes_written"] == len("a = 1\nb = 2\n")
+    a_py_stats = result["files"][str(paths["a.py"])]
+    assert list(a_py_stats["stages"]) == [
+        "git_diff",
+        "black",
+        "chunks",
+        "choose",
+        "verify",
+        "write",
+    ]
+
+
+# Run Darker in a new Python process and report which slow modules were imported
+STARTUP_SCRIPT = """\
+import sys
+from darker.__main__ import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(" ".join(name for name in ["black", "isort"] if name in sys.modules))
+"""
+
+
+@pytest.mark.parametrize(
+    "argv, expect",
+    [
+        (["--version"], ""),
+        (["--diff", "--isort", "."], ""),
+        (["--check", "--lint", "echo", "."], ""),
+        (["--diff", "a.py"], "black"),
+        (["--diff", "--isort", "a.py"], "black isort"),
+    ],
+)
+def test_main_startup_imports(git_repo, argv, expect):
+    """Black and isort are only imported if there are Python files to reformat"""
+    git_repo.add({"a.py": "a = 1\n", "README": "\n"}, commit="Initial commit")
+    git_repo.add({"README": "changed\n"})
+    if "a.py" in argv:
+        git_repo.add({"a.py": "a  =  2\n"})
+
+    result = run(
+        [sys.executable, "-c", STARTUP_SCRIPT, *argv],
+        cwd=str(git_repo.root),
+        stdout=PIPE,
+        check=True,
+        encoding="utf-8",
+    )
+
+    assert result.stdout.splitlines()[-1] == expect
+
+
+def test_main_trace(git_repo, monkeypatch, tmp_path_factory):
+    """``--trace`` writes spans for files, stages, Git and linters as trace events"""
+    monkeypatch.chdir(git_repo.root)
+    git_repo.add({"a.py": "\n"}, commit="Initial commit")
+    git_repo.add({"a.py": "a  =  1\n"})
+    trace_path = tmp_path_factory.mktemp("trace") / "trace.json"
+
+    darker.__main__.main(["--trace", str(trace_path), "-L", "echo", "a.py"])
+
+    result = json.loads(trace_path.read_text())
+    spans = [event for event in result["traceEvents"] if event["ph"] == "X"]
+    assert {(span["cat"], span["name"]) for span in spans} >= {
+        ("file", "a.py"),
+        ("stage", "black"),
+        ("stage", "write"),
+        ("stage", "lint"),
+        ("git", "git show"),
+        ("linter", "echo"),
+    }
+    assert all(span["ts"] >= 0 and span["dur"] >= 0 for span in spans)
+    (file_span,) = (span for span in spans if span["cat"] == "file")
+    black_span = next(span for span in spans if span["name"] == "black")
+    assert black_span["args"] == {"path": str(git_repo.root / "a.py")}
+    assert file_span["ts"] <= black_span["ts"]
+    assert black_span["ts"] + black_span["dur"] <= file_span["ts"] + file_span["dur"]
+    thread_names = [event for event in result["traceEvents"] if event["ph"] == "M"]
+    assert {event["tid"] for event in thread_names} == {span["tid"] for span in spans}
+
+
+def test_main_profile_dir(git_repo, monkeypatch, tmp_path_factory):
+    """``--profile-dir`` saves profiles of files slower than the threshold"""
+    monkeypatch.chdir(git_repo.root)
+    git_repo.add({"pkg/a.py": "\n", "b.py": "\n"}, commit="Initial commit")
+    git_repo.add({"pkg/a.py": "a  =  1\n", "b.py": "b  =  2\n"})
+    profile_dir = tmp_path_factory.mktemp("profiles")
+
+    darker.__main__.main(
+        ["--profile-dir", str(profile_dir), "--profile-threshold", "0", "."]
+    )
+
+    assert sorted(path.name for path in profile_dir.iterdir()) == [
+        "b.py.prof",
+        "pkg%2Fa.py.prof",
+    ]
+
+
+def test_main_record_replay(git_repo, monkeypatch, tmp_path_factory, capsys):
+    """A run recorded with ``--record`` is reproduced by ``--replay`` without Git"""
+    git_repo.add(
+        {
+            "pyproject.toml": "[tool.darker]\nrevision = 'HEAD'\n",
+            "pkg/a.py": "x = 1\n",
+            "pkg/b.py": "y = 2\n",
+        },
+        commit="Initial commit",
+    )
+    git_repo.add({"pkg/a.py": "x = 1\nz = [ 'spam', 'eggs', 'ham' ]\n"})
+    monkeypatch.chdir(git_repo.root / "pkg")
+    bundle = tmp_path_factory.mktemp("bundle") / "bundle.zip"
+    darker.__main__.main(["--record", str(bundle), "--diff", "."])
+    recorded_output = capsys.readouterr().out
+    monkeypatch.chdir(tmp_path_factory.mktemp("elsewhere"))
+
+    with patch("darker.git.check_output") as check_output:
+        retval = darker.__main__.main(["--replay", str(bundle)])
+
+    assert retval == 0
+    check_output.assert_not_called()
+    assert capsys.readouterr().out == recorded_output
+    assert '+z = ["spam", "eggs", "ham"]\n' in recorded_output
+
+
+def test_format_edited_parts_profiler_stopped_before_yield(git_repo):
+    """The profiler doesn't include time spent by the caller on yielded changes"""
+    paths = git_repo.add({"a.py": "a = 1\n", "b.py": "b = 1\n"}, commit="Initial")
+    paths["a.py"].write("a  =  1\n")
+    paths["b.py"].write("b  =  1\n")
+    calls = []
+    profiler = Mock()
+    profiler.start.side_effect = lambda: calls.append("start")
+    profiler.stop.side_effect = lambda path, **kwargs: calls.append(f"stop {path}")
+
+    for path, _old, _new in darker.__main__.format_edited_parts(
+        [Path(git_repo.root)], RevisionRange("HEAD"), False, [], {}, profiler=profiler
+    ):
+        calls.append(f"yield {path.name}")
+
+    assert calls == [
+        "start",
+        "stop a.py",
+        "yield a.py",
+        "start",
+        "stop b.py",
+        "yield b.py",
+    ]
+
+
+def test_format_edited_parts_profiler_stopped_on_error(git_repo, monkeypatch, tmp_path):
+    """The profile is saved even if reformatting a file fails"""
+    # Output of pieces formatted in parallel is verified even with all lines edited
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    paths = git_repo.add({"a.py": "a  =  1\n\n"}, commit="Initial commit")
+    paths["a.py"].write("a  =  1\n\nb  =  [ 2 ]\n\n\nc  =  [ 3 ]\n")
+    profiler = FileProfiler(tmp_path / "profiles", threshold=0.0)
+
+    with patch(
+        "darker.verification.verify_ast_unchanged",
+        side_effect=NotEquivalentError,
+    ), pytest.raises(NotEquivalentError):
+
+        list(
+            darker.__main__.format_edited_parts(
+                [Path(git_repo.root / "a.py")],
+                RevisionRange("HEAD"),
+                False,
+                [],
+                {},
+                profiler=profiler,
+                parallel_threshold=1,
+            )
+        )
+
+    assert [path.name for path in (tmp_path / "profiles").iterdir()] == ["a.py.prof"]
+
+
+def test_main_cancels_linters(git_repo, monkeypatch):
+    """Background linters are stopped if reformatting fails"""
+    monkeypatch.chdir(git_repo.root)
+
+    with patch.object(
+        darker.__main__, "cancel_linters"
+    ) as cancel_linters, patch.object(
+        darker.__main__, "format_edited_parts", Mock(side_effect=RuntimeError)
+    ):
+        with pytest.raises(RuntimeError):
+            darker.__main__.main(["--diff", "--lint", "mylinter", "."])
+
+    cancel_linters.assert_called_once_with()
+
+
+def test_main_record_replay_hash_seed(git_repo, tmp_path_factory):
+    """Git commands for multiple paths are replayed regardless of the hash seed"""
+    paths = git_repo.add(
+        {f"{name}.py": "x = 1\n" for name in "abcdef"}, commit="Initial commit"
+    )
+    for path in paths.values():
+        path.write("x = [ 1 ]\n")
+    bundle = tmp_path_factory.mktemp("bundle") / "bundle.zip"
+    argv = [sys.executable, "-m", "darker", "--diff"]
+    recorded = run(
+        [*argv, "--record", str(bundle), *sorted(paths)],
+        cwd=git_repo.root,
+        env={**os.environ, "PYTHONHASHSEED": "0"},
+        stdout=PIPE,
+        check=True,
+    )
+
+    replayed = [
+        run(
+            [*argv, "--replay", str(bundle)],
+            cwd=git_repo.root,
+            env={**os.environ, "PYTHONHASHSEED": str(seed)},
+            stdout=PIPE,
+            check=True,
+        )
+        for seed in range(1, 4)
+    ]
+
+    assert [result.stdout for result in replayed] == 3 * [recorded.stdout]
+
+
+def test_main_record_before_reformatting(git_repo, monkeypatch, tmp_path_factory):
+    """``--record`` stores modified files as they were before reformatting them"""
+    monkeypatch.chdir(git_repo.root)
+    git_repo.add({"a.py": "\n"}, commit="Initial commit")
+    git_repo.add({"a.py": "a  =  1\n"})
+    bundle = tmp_path_factory.mktemp("bundle") / "bundle.zip"
+
+    darker.__main__.main(["--record", str(bundle), "a.py"])
+
+    assert (git_repo.root / "a.py").read_text("utf-8") == "a = 1\n"
+    with zipfile.ZipFile(bundle) as archive:
+        assert archive.read("files/a.py") == b"a  =  1\n"
+
+
 def test_output_diff(capsys):
     """output_diff() prints Black-style diff output"""
     darker.__main__.print_diff(
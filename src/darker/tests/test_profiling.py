@@ -0,0 +1,90 @@
+"""Unit tests for :mod:`darker.profiling`"""
+
+import logging
+import pstats
+from pathlib import Path
+
+import pytest
+from black import FileMode, format_str
+
+from darker.black_diff import run_black
+from darker.profiling import FileProfiler, get_dominant_callers
+from darker.utils import TextDocument
+from darker.verification import verify_ast_unchanged
+
+
+def test_get_dominant_callers():
+    """Time spent in Black and AST verification is found in the profile"""
+    profiler = FileProfiler(Path("unused"), threshold=0.0)
+    edited = TextDocument.from_lines(["a  =  1"])
+    profiler.start()
+    formatted = run_black(Path("a.py"), edited, {})
+    verify_ast_unchanged(edited, formatted, [], [])
+    assert profiler._profile is not None
+    profiler._profile.disable()
+
+    result = get_dominant_callers(pstats.Stats(profiler._profile))
+
+    assert {name for name, _seconds in result} == {"Black", "assert_equivalent"}
+    assert all(seconds > 0 for _name, seconds in result)
+    assert [seconds for _name, seconds in result] == sorted(
+        (seconds for _name, seconds in result), reverse=True
+    )
+
+
+def test_get_dominant_callers_format_str():
+    """Black is found in the profile also when ``format_str()`` is called directly"""
+    profiler = FileProfiler(Path("unused"), threshold=0.0)
+    profiler.start()
+    format_str("a  =  1\n", mode=FileMode())
+    assert profiler._profile is not None
+    profiler._profile.disable()
+
+    result = get_dominant_callers(pstats.Stats(profiler._profile))
+
+    assert [name for name, _seconds in result] == ["Black"]
+
+
+@pytest.mark.parametrize(
+    "threshold, expect_saved",
+    [(0.0, True), (1000.0, False)],
+)
+def test_file_profiler(tmp_path, caplog, threshold, expect_saved):
+    """Profiles are saved and summarized only for files slower than the threshold"""
+    profiler = FileProfiler(tmp_path / "profiles", threshold)
+    profiler.start()
+    run_black(Path("a.py"), TextDocument.from_lines(["a  =  1"]), {})
+
+    result = profiler.stop(Path("pkg/a.py"), context_retries=2)
+
+    if expect_saved:
+        assert result == tmp_path / "profiles" / "pkg%2Fa.py.prof"
+        saved_callers = get_dominant_callers(pstats.Stats(str(result)))
+        assert [name for name, _seconds in saved_callers] == ["Black"]
+        assert len(caplog.records) == 1
+        assert caplog.records[0].levelno == logging.WARNING
+        assert (
+            caplog.records[0]
+            .getMessage()
+            .startswith(f"Processing {Path('pkg/a.py')} took ")
+        )
+        assert (
+            f"with 2 context retries, saved profile in {result}. Time spent in Black "
+            in caplog.text
+        )
+    else:
+        assert result is None
+        assert not (tmp_path / "profiles").exists()
+        assert caplog.records == []
+
+
+def test_file_profiler_unique_names(tmp_path):
+    """Profiles of files whose paths differ only by separators don't collide"""
+    profiler = FileProfiler(tmp_path, threshold=0.0)
+    result = []
+    for path in [Path("a/b.py"), Path("a__b.py"), Path("a%2Fb.py")]:
+        profiler.start()
+        result.append(profiler.stop(path, context_retries=0))
+
+    assert len(set(result)) == 3
+    assert all(path is not None and path.is_file() for path in result)
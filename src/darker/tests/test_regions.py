@@ -0,0 +1,215 @@
+"""Unit tests for :mod:`darker.regions`"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from darker.black_diff import run_black
+from darker.regions import (
+    Region,
+    find_regions,
+    run_black_for_regions,
+    run_black_in_parallel,
+    split_pieces,
+)
+from darker.utils import TextDocument
+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 8), reason="Requires line spans of statements"
+)
+
+MODULE = [
+    "import os",  # 1
+    "",
+    "@decorator",  # 3
+    "def f( a ):",
+    "    return a",
+    "",
+    "class A:",  # 7
+    "    x = 1; y = 2",
+    "",
+    "    class B:",  # 10
+    "        def g(self):",
+    "            pass",
+    "",
+    "    def h(self): pass",  # 14
+    "",
+    "class C: z = 3",  # 16
+    "# comment",
+]
+
+
+@pytest.mark.parametrize(
+    "linenums, expect",
+    [
+        ([], []),
+        ([2, 17], []),
+        ([1], [Region(1, 1, "")]),
+        ([3, 5], [Region(3, 5, "")]),
+        ([7], [Region(7, 14, "")]),
+        ([8], [Region(8, 8, "    ")]),
+        ([8, 14], [Region(8, 8, "    "), Region(14, 14, "    ")]),
+        ([10], [Region(10, 12, "    ")]),
+        ([12], [Region(11, 12, "        ")]),
+        ([16], [Region(16, 16, "")]),
+    ],
+)
+def test_find_regions(linenums, expect):
+    """Statements enclosing edited lines are found, descending into class bodies"""
+    result = find_regions(TextDocument.from_lines(MODULE), linenums)
+
+    assert result == expect
+
+
+@pytest.mark.parametrize(
+    "source",
+    ["a = 1\n# fmt: off\nb = [ 2 ]\n", "a = 1\n\x0cb = [ 2 ]\n", "a = (\n"],
+    ids=["fmt_off", "form_feed", "syntax_error"],
+)
+def test_find_regions_unsupported(source):
+    """Regions aren't used if line numbers or Black's output can't be trusted"""
+    result = find_regions(TextDocument.from_str(source), [1])
+
+    assert result is None
+
+
+def test_run_black_for_regions():
+    """Only edited statements are reformatted, with their original indentation"""
+    document = TextDocument.from_lines(
+        [
+            "x = [ 1 ]",
+            "class A:",
+            "  def f(self):",
+            "    return [ 2 ]",
+            "  def g(self):",
+            "    return [ 3 ]",
+        ],
+        newline="\r\n",
+    )
+
+    result = run_black_for_regions(Path("a.py"), document, {}, [6])
+
+    assert result is not None
+    assert result.lines == (
+        "x = [ 1 ]",
+        "class A:",
+        "  def f(self):",
+        "    return [ 2 ]",
+        "  def g(self):",
+        "      return [3]",
+    )
+    assert result.newline == "\r\n"
+
+
+def test_run_black_for_regions_line_length():
+    """Statements in classes are reformatted with the line length of their depth"""
+    document = TextDocument.from_lines(
+        ["class A:", "    def f(self):", f"        return [{', '.join(['1'] * 32)}]"]
+    )
+
+    result = run_black_for_regions(Path("a.py"), document, {}, [3])
+
+    assert result == run_black(Path("a.py"), document, {})
+
+
+def test_run_black_for_regions_target_versions():
+    """Target versions are detected from the whole file, not from each region"""
+    arguments = ", ".join(f"argument_number_{n}" for n in range(1, 5))
+    document = TextDocument.from_lines(
+        [
+            'name = f"{1}"',
+            "",
+            "",
+            "def f(kwargs_dict):",
+            f"    return function_with_a_long_name({arguments}, **kwargs_dict)",
+        ]
+    )
+
+    result = run_black_for_regions(Path("a.py"), document, {}, [5])
+
+    assert result is not None
+    assert result.lines[-2] == "        **kwargs_dict,"
+    assert result == run_black(Path("a.py"), document, {})
+
+
+@pytest.mark.parametrize("indent, expect_split", [("  ", False), ("\t", True)])
+def test_run_black_for_regions_line_length_indent(indent, expect_split):
+    """The line length is reduced by the width of the actual indentation"""
+    items = ", ".join(["1"] * 27)
+    # 85 characters, which fits in 88 columns after two spaces but not after a tab
+    line = f"x = [{items}]"
+    document = TextDocument.from_lines(["class A:", f"{indent}{line}"])
+
+    result = run_black_for_regions(Path("a.py"), document, {}, [2])
+
+    assert result is not None
+    if expect_split:
+        assert result.lines[1] == f"{indent}x = ["
+        assert result.lines[-1] == f"{indent}]"
+    else:
+        assert result.lines == ("class A:", f"{indent}{line}")
+
+
+@pytest.mark.parametrize(
+    "lines",
+    [
+        ["class A:", "    def f(self):", "        return '''", "a'''"],
+        ["class A:", "    x = '''", "  a'''"],
+    ],
+    ids=["unindented_string", "shallow_string"],
+)
+def test_run_black_for_regions_fallback(lines):
+    """``None`` is returned if a region can't be dedented for Black"""
+    result = run_black_for_regions(
+        Path("a.py"), TextDocument.from_lines(lines), {}, [2]
+    )
+
+    assert result is None
+
+
+@pytest.mark.parametrize(
+    "lines, piece_count, expect",
+    [
+        (["a = 1", "", "", "b = 2"], 2, [(0, 1), (3, 4)]),
+        (["a = 1", "", "", "b = 2"], 1, None),
+        (["a = 1", "", "b = 2"], 2, None),
+        (["a = 1", "", "# comment", "b = 2"], 2, None),
+        (["a = 1", "", "", "@d", "def f():", "    pass"], 2, [(0, 1), (3, 6)]),
+        (["class A:", "    a = 1", "", "", "    b = 2"], 2, None),
+        (
+            ["a = 1", "", "", "b = 2", "", "", "c = 3", "", "", "d = 4"],
+            3,
+            [(0, 4), (6, 7), (9, 10)],
+        ),
+    ],
+)
+def test_split_pieces(lines, piece_count, expect):
+    """Documents are split only at two empty lines between top-level statements"""
+    result = split_pieces(TextDocument.from_lines(lines), piece_count)
+
+    assert result == expect
+
+
+def test_run_black_in_parallel():
+    """Pieces are reformatted like the whole file, targeting the same Python versions"""
+    document = TextDocument.from_lines(
+        [
+            "x = f'{1}'",
+            "",
+            "",
+            "def f( a ):",
+            "    return a",
+            "",
+            "",
+            f"call({', '.join(['argument'] * 10)}, *args)",
+        ],
+        newline="\r\n",
+    )
+
+    result = run_black_in_parallel(Path("a.py"), document, {}, 2)
+
+    assert result == run_black(Path("a.py"), document, {})
+    assert result is not None
+    assert result.lines[-2:] == ("    *args,", ")")
+    assert result.newline == "\r\n"
@@ -0,0 +1,190 @@
+"""Unit tests for :mod:`darker.stats`"""
+
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from subprocess import Popen
+from unittest.mock import patch
+
+import pytest
+
+from darker.stats import DarkerStats, SubprocessStats, wait_for_subprocess
+
+
+@pytest.mark.skipif(not hasattr(os, "wait4"), reason="Requires os.wait4()")
+def test_wait_for_subprocess():
+    """Resource usage and the return code of a finished subprocess are recorded"""
+    start_time = time.perf_counter()
+    process = Popen([sys.executable, "-c", "raise SystemExit(3)"], encoding="utf-8")
+
+    result = wait_for_subprocess(process, "python", start_time)
+
+    assert result.name == "python"
+    assert result.wall_time > 0
+    assert result.user_time is not None and result.user_time >= 0
+    assert result.system_time is not None and result.system_time >= 0
+    assert result.max_rss_kib is not None and result.max_rss_kib > 0
+    assert process.returncode == 3
+
+
+def test_darker_stats(tmp_path, caplog):
+    """Statistics are summarized in the log and written into a JSON file"""
+    caplog.set_level(logging.INFO)
+    stats = DarkerStats()
+    stats.add_linter(SubprocessStats("mypy", 2.5, 2.0, 0.25, 100_000), 0.0)
+    stats.add_linter(SubprocessStats("pylint", 1.5), 0.0)
+    stats.add_git_call(0.5)
+    stats.add_git_call(0.25)
+
+    stats.log_summary()
+    stats.write_json(tmp_path / "stats.json")
+
+    assert caplog.messages == [
+        "Linter mypy: 2.50s wall, 2.00s user, 0.25s system, 100000 KiB max RSS",
+        "Linter pylint: 1.50s wall, n/a user, n/a system, n/a max RSS",
+        "Git: 2 subprocesses in 0.75s wall",
+    ]
+    assert json.loads((tmp_path / "stats.json").read_text()) == {
+        "linters": [
+            {
+                "name": "mypy",
+                "wall_time": 2.5,
+                "user_time": 2.0,
+                "system_time": 0.25,
+                "max_rss_kib": 100_000,
+            },
+            {
+                "name": "pylint",
+                "wall_time": 1.5,
+                "user_time": None,
+                "system_time": None,
+                "max_rss_kib": None,
+            },
+        ],
+        "git": {"calls": 2, "wall_time": 0.75},
+        "stages": {},
+        "counters": {},
+        "lint_cache_hit_rate": None,
+        "files": {},
+    }
+
+
+def test_darker_stats_reset():
+    """Resetting forgets all collected statistics"""
+    stats = DarkerStats()
+    stats.add_linter(SubprocessStats("mypy", 2.5), 0.0)
+    stats.add_git_call(0.5)
+    stats.count("black_invocations", path=Path("a.py"))
+    with stats.time_stage("black", Path("a.py")):
+        pass
+
+    stats.reset()
+
+    assert stats.as_dict() == {
+        "linters": [],
+        "git": {"calls": 0, "wall_time": 0.0},
+        "stages": {},
+        "counters": {},
+        "lint_cache_hit_rate": None,
+        "files": {},
+    }
+
+
+def test_darker_stats_stages_and_counters(caplog):
+    """Stage times and counters are recorded in total and for each file"""
+    caplog.set_level(logging.INFO)
+    stats = DarkerStats()
+    with patch("darker.stats.time.perf_counter", side_effect=[0, 1, 10, 12, 20, 24]):
+
+        with stats.time_stage("verify", Path("a.py")):
+            pass
+        with stats.time_stage("black", Path("a.py")):
+            pass
+        with stats.time_stage("black", Path("b.py")):
+            pass
+    stats.count("context_retries", path=Path("a.py"))
+    stats.count("lint_cache_hits", 3)
+    stats.count("lint_cache_misses")
+
+    result = json.loads(json.dumps(stats.as_dict()))
+
+    assert list(result["stages"]) == ["black", "verify"]
+    assert result["stages"]["black"]["wall_time"] == 6
+    assert result["stages"]["black"]["count"] == 2
+    assert result["stages"]["verify"]["wall_time"] == 1
+    assert result["counters"] == {
+        "context_retries": 1,
+        "lint_cache_hits": 3,
+        "lint_cache_misses": 1,
+    }
+    assert result["lint_cache_hit_rate"] == 0.75
+    assert result["files"]["a.py"]["stages"]["black"]["wall_time"] == 2
+    assert result["files"]["a.py"]["counters"] == {"context_retries": 1}
+    assert result["files"]["b.py"]["stages"]["black"]["wall_time"] == 4
+    assert result["files"]["b.py"]["counters"] == {}
+    stats.log_summary()
+    assert "Stage black: 6.00s wall" in caplog.text
+    assert "Counter context_retries: 1" in caplog.text
+
+
+def test_darker_stats_trace(tmp_path):
+    """Spans are recorded relative to the reset and written as Chrome trace events"""
+    stats = DarkerStats()
+    with patch("darker.stats.time.perf_counter", side_effect=[10, 11, 12, 13, 14, 15]):
+        stats.reset(trace=True)
+        with stats.time_stage("black", Path("a.py")):
+            pass
+        with stats.time_git_call(["git", "show", "HEAD:a.py"]):
+            pass
+        stats.add_linter(SubprocessStats("mypy", 0.5), 15)
+        stats.add_span("a.py", "file", 10.5)
+
+    stats.write_trace(tmp_path / "trace.json")
+
+    result = json.loads((tmp_path / "trace.json").read_text())
+    assert result["displayTimeUnit"] == "ms"
+    metadata, *spans = result["traceEvents"]
+    assert metadata["ph"] == "M"
+    assert metadata["args"] == {"name": "MainThread"}
+    assert [
+        (span["cat"], span["name"], span["ts"], span["dur"], span["args"])
+        for span in spans
+    ] == [
+        ("stage", "black", 1_000_000, 1_000_000, {"path": "a.py"}),
+        (
+            "git",
+            "git show",
+            3_000_000,
+            1_000_000,
+            {"cmd": ["git", "show", "HEAD:a.py"]},
+        ),
+        (
+            "linter",
+            "mypy",
+            5_000_000,
+            500_000,
+            {
+                "name": "mypy",
+                "wall_time": 0.5,
+                "user_time": None,
+                "system_time": None,
+                "max_rss_kib": None,
+            },
+        ),
+        ("file", "a.py", 500_000, 4_500_000, {}),
+    ]
+    assert {span["tid"] for span in spans} == {metadata["tid"]}
+
+
+def test_darker_stats_trace_disabled(tmp_path):
+    """No spans are recorded unless tracing is enabled"""
+    stats = DarkerStats()
+    stats.add_span("a.py", "file", 0.0)
+
+    stats.write_trace(tmp_path / "trace.json")
+
+    result = json.loads((tmp_path / "trace.json").read_text())
+    assert result == {"traceEvents": [], "displayTimeUnit": "ms"}
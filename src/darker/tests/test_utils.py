@@ -2,15 +2,19 @@
 
 import os
 from pathlib import Path
+from subprocess import check_output
 from textwrap import dedent
 
 import pytest
 
+from darker.stats import STATS
 from darker.utils import (
+    LinesView,
     TextDocument,
     debug_dump,
     get_common_root,
     get_path_ancestry,
+    git_hash_object,
     joinlines,
 )
 
@@ -34,6 +38,60 @@ def test_debug_dump(capsys):
     )
 
 
+@pytest.mark.parametrize(
+    "start, stop, expect",
+    [
+        (0, None, ("a", "b", "c", "d")),
+        (1, 3, ("b", "c")),
+        (3, 3, ()),
+        (2, 4, ("c", "d")),
+        (3, None, ("d",)),
+    ],
+)
+def test_lines_view(start, stop, expect):
+    """LinesView behaves like a slice of a tuple of lines"""
+    lines = ("a", "b", "c", "d")
+
+    view = LinesView(lines, start, stop)
+
+    assert len(view) == len(expect)
+    assert tuple(view) == expect
+    assert list(reversed(view)) == list(reversed(expect))
+    assert view == expect
+    assert expect == view
+    assert view == list(expect)
+    assert view[1:] == expect[1:]
+    assert view[:-1] == expect[:-1]
+    assert repr(view) == repr(expect)
+    for index in range(-len(expect), len(expect)):
+        assert view[index] == expect[index]
+
+
+@pytest.mark.parametrize("index", [-3, 2])
+def test_lines_view_index_error(index):
+    """LinesView raises an IndexError for lines outside the view"""
+    view = LinesView(("a", "b", "c"), 1, 3)
+
+    with pytest.raises(IndexError):
+        view[index]  # pylint: disable=pointless-statement
+
+
+@pytest.mark.parametrize(
+    "view1, view2, expect",
+    [
+        (LinesView(("a", "b"), 0, 1), LinesView(("a", "b"), 0, 1), True),
+        (LinesView(("a", "a"), 0, 1), LinesView(("a", "a"), 1, 2), True),
+        (LinesView(("a", "b"), 0, 1), LinesView(("a", "b"), 0, 2), False),
+        (LinesView(("a", "b"), 0, 1), LinesView(("b", "a"), 0, 1), False),
+        (LinesView(("a",)), "a", False),
+    ],
+)
+def test_lines_view_eq(view1, view2, expect):
+    """Views are compared line by line"""
+    assert (view1 == view2) == expect
+    assert (view1 != view2) != expect
+
+
 def test_joinlines():
     result = joinlines(("a", "b", "c"))
     assert result == "a\nb\nc\n"
@@ -293,6 +351,96 @@ def test_textdocument_mtime(document, expect):
     assert document.mtime == expect
 
 
+def test_textdocument_slots():
+    """TextDocument objects have no ``__dict__``"""
+    document = TextDocument.from_str("a\n")
+
+    with pytest.raises(AttributeError):
+        document.extra = "dummy"  # type: ignore[attr-defined]
+
+
+def test_textdocument_conversions_counted():
+    """Conversions between strings and lines are cached and counted"""
+    STATS.reset()
+    document = TextDocument.from_str("a\nb\n")
+    assert document.lines == document.lines == ("a", "b")
+    assert document.line_count == 2
+    reconstructed = TextDocument.from_lines(document.lines)
+    assert reconstructed.string == reconstructed.string == "a\nb\n"
+    assert reconstructed.encoded_string == b"a\nb\n"
+
+    assert STATS.counters == {
+        "text_string_to_lines": 1,
+        "text_lines_to_string": 1,
+        "text_string_to_bytes": 1,
+    }
+
+
+def test_textdocument_eq_identical_strings():
+    """Documents with identical strings are equal without splitting them into lines"""
+    STATS.reset()
+
+    assert TextDocument.from_str("a\nb\n") == TextDocument.from_str("a\nb\n")
+    assert STATS.counters == {}
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        TextDocument(),
+        TextDocument.from_str("a\nb\n"),
+        TextDocument.from_lines(["a", "b"]),
+        TextDocument.from_lines(["a", "b"], encoding="iso-8859-1"),
+        TextDocument.from_str("a\r\nb\r\n"),
+        TextDocument.from_str("a\nb"),
+        TextDocument.from_str("a\x0cb\n"),
+        TextDocument.from_str("\u00e4\n", encoding="iso-8859-1"),
+    ],
+)
+def test_textdocument_digest(document):
+    """The digest is the Git blob hash of the lines joined with LF newlines in UTF-8"""
+    expect = git_hash_object(joinlines(document.lines).encode("utf-8"))
+
+    assert document.digest == expect
+    assert hash(document) == hash(expect)
+
+
+def test_textdocument_digest_git_compatible(git_repo):
+    """For UTF-8 files with LF newlines the digest is the Git blob hash of the file"""
+    paths = git_repo.add({"a.py": "a = 1\nb = '\u00e4'\n"})
+
+    document = TextDocument.from_file(Path(paths["a.py"]))
+
+    assert document.digest == check_output(
+        ["git", "hash-object", "a.py"], cwd=git_repo.root, encoding="ascii"
+    ).rstrip("\n")
+
+
+def test_textdocument_eq_digest_mismatch():
+    """Documents with different digests are unequal without comparing their lines"""
+    document1 = TextDocument.from_lines(["a"])
+    document2 = TextDocument.from_lines(["a"])
+    document2._digest = "dummy"  # pylint: disable=protected-access
+
+    assert document1 != document2
+
+
+def test_textdocument_eq_digest_match():
+    """Lines are still compared if digests match"""
+    document1 = TextDocument.from_lines(["a"])
+    document2 = TextDocument.from_lines(["b"])
+    document2._digest = document1.digest  # pylint: disable=protected-access
+
+    assert document1 != document2
+
+
+def test_textdocument_hash_dict_key():
+    """Equal documents can be used interchangeably as dictionary keys"""
+    documents = {TextDocument.from_str("a\r\nb\r\n"): "value"}
+
+    assert documents[TextDocument.from_lines(["a", "b"])] == "value"
+
+
 def test_textdocument_from_file(tmp_path):
     """TextDocument.from_file()"""
     dummy_txt = tmp_path / "dummy.txt"
@@ -1,20 +1,46 @@
 """Miscellaneous utility functions"""
 
+import hashlib
 import io
+import re
 import tokenize
 from datetime import datetime
-from itertools import chain
+from itertools import chain, islice
+from operator import eq
 from pathlib import Path
-from typing import Iterable, List, Tuple, Union
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+from darker.stats import STATS
 
 TextLines = Tuple[str, ...]
 
 
 GIT_DATEFORMAT = "%Y-%m-%d %H:%M:%S.%f +0000"
 
+# Characters other than LF which ``str.splitlines()`` treats as line boundaries
+NON_LF_LINE_BOUNDARIES = re.compile("[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
 
 class TextDocument:
-    """Store & handle a multi-line text document, either as a string or list of lines"""
+    """Store & handle a multi-line text document, either as a string or list of lines
+
+    The document is kept in the form it was created from. The string or the tuple of
+    lines is only created from the other one when needed, and then cached. Conversions
+    are counted in :data:`darker.stats.STATS`.
+
+    A digest of the lines is also computed lazily and cached. It's used for hashing
+    documents and for quickly finding out that two documents differ.
+
+    """
+
+    __slots__ = (
+        "_string",
+        "_lines",
+        "_digest",
+        "_encoding",
+        "_newline",
+        "_mtime",
+    )
 
     DEFAULT_ENCODING = "utf-8"
     DEFAULT_NEWLINE = "\n"
@@ -29,6 +55,7 @@ class TextDocument:
     ):
         self._string = string
         self._lines = None if lines is None else tuple(lines)
+        self._digest: Optional[str] = None
         self._encoding = encoding
         self._newline = newline
         self._mtime = mtime
@@ -37,21 +64,59 @@ class TextDocument:
     def string(self) -> str:
         """Return the document as a string, converting and caching if necessary"""
         if self._string is None:
+            STATS.count("text_lines_to_string")
             self._string = joinlines(self._lines or (), self.newline)
         return self._string
 
     @property
     def encoded_string(self) -> bytes:
         """Return the document as a string, converting and caching if necessary"""
+        STATS.count("text_string_to_bytes")
         return self.string.encode(self.encoding)
 
     @property
     def lines(self) -> TextLines:
         """Return the document as a list of lines converting and caching if necessary"""
         if self._lines is None:
+            STATS.count("text_string_to_lines")
             self._lines = tuple((self._string or "").splitlines())
         return self._lines
 
+    @property
+    def line_count(self) -> int:
+        """Return the number of lines in the document"""
+        return len(self.lines)
+
+    @property
+    def digest(self) -> str:
+        """Return a hash of the lines of the document, computing and caching if needed
+
+        The hash is computed like Git computes hashes for blobs, from the lines of the
+        document joined with LF newlines and encoded in UTF-8. For UTF-8 encoded files
+        with LF newlines, ending with a newline, this is equal to the hash Git gives to
+        the file. Documents which are equal, regardless of newlines and encoding, have
+        equal digests.
+
+        >>> crlf_document = TextDocument.from_str("a\\r\\n")
+        >>> crlf_document.digest == TextDocument.from_lines(["a"]).digest
+        True
+        >>> TextDocument.from_str("").digest
+        'e69de29bb2d1d6434b8b29ae775ad8c2e48c5391'
+
+        """
+        if self._digest is None:
+            string = self._string
+            if (
+                string is None
+                or self.newline != "\n"
+                or not string.endswith("\n")
+                or NON_LF_LINE_BOUNDARIES.search(string)
+            ):
+                # Only a string with LF line ends can be hashed as it is
+                string = joinlines(self.lines)
+            self._digest = git_hash_object(string.encode("utf-8", "surrogatepass"))
+        return self._digest
+
     @property
     def encoding(self) -> str:
         """Return the encoding used in the document"""
@@ -132,8 +197,17 @@ class TextDocument:
             return NotImplemented
         if not self._string and not self._lines:
             return not other._string and not other._lines
+        if self._string is not None and self._string == other._string:
+            # Identical strings split into identical lines
+            return True
+        if self.digest != other.digest:
+            return False
         return self.lines == other.lines
 
+    def __hash__(self) -> int:
+        """Return a hash of the document's lines, ignoring newlines and encoding"""
+        return hash(self.digest)
+
     def __repr__(self) -> str:
         """Return a Python representation of the document object"""
         encoding = (
@@ -149,12 +223,85 @@ class TextDocument:
         mtime = "" if not self._mtime else f", mtime={self._mtime!r}"
         return (
             f"{type(self).__name__}("
-            f"[{len(self.lines)} lines]"
+            f"[{self.line_count} lines]"
             f"{encoding}{newline}{mtime})"
         )
 
 
-DiffChunk = Tuple[int, TextLines, TextLines]
+class LinesView(Sequence[str]):
+    """A read-only view of a range of lines in a tuple of lines, without copying them
+
+    Views compare equal to other views, tuples and lists with equal lines, and show up
+    as tuples in their ``repr()``.
+
+    >>> view = LinesView(("a", "b", "c", "d"), 1, 3)
+    >>> view
+    ('b', 'c')
+    >>> view == ("b", "c"), len(view), view[-1], view[1:]
+    (True, 2, 'c', ('c',))
+
+    """
+
+    __slots__ = ("_lines", "_start", "_stop")
+
+    def __init__(self, lines: TextLines, start: int = 0, stop: int = None):
+        """Create a view of ``lines[start:stop]``
+
+        For speed, the range isn't checked. It must satisfy
+        ``0 <= start <= stop <= len(lines)``.
+
+        """
+        self._lines = lines
+        self._start = start
+        self._stop = len(lines) if stop is None else stop
+
+    def __len__(self) -> int:
+        """Return the number of lines in the view"""
+        return self._stop - self._start
+
+    @overload
+    def __getitem__(self, index: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "LinesView":
+        ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, "LinesView"]:
+        """Return a line, or a view of a range of lines, in the view"""
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                raise ValueError("Line views don't support slicing with steps")
+            start, stop, _ = index.indices(len(self))
+            return LinesView(self._lines, self._start + start, self._start + stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        return self._lines[self._start + index]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over lines in the view"""
+        return islice(self._lines, self._start, self._stop)
+
+    def __eq__(self, other: object) -> bool:
+        """Compare lines to those in another view, a tuple or a list"""
+        if not isinstance(other, (LinesView, tuple, list)):
+            return NotImplemented
+        if (
+            isinstance(other, LinesView)
+            and other._lines is self._lines
+            and other._start == self._start
+        ):
+            return other._stop == self._stop
+        return len(self) == len(other) and all(map(eq, self, other))
+
+    def __repr__(self) -> str:
+        """Return the lines in the view as the representation of a tuple"""
+        return repr(tuple(self))
+
+
+DiffChunk = Tuple[int, Sequence[str], Sequence[str]]
 
 
 def debug_dump(
@@ -175,7 +322,7 @@ def debug_dump(
     print(80 * "-")
 
 
-def joinlines(lines: TextLines, newline: str = "\n") -> str:
+def joinlines(lines: Iterable[str], newline: str = "\n") -> str:
     """Join a list of lines back, adding a linefeed after each line
 
     This is the reverse of ``str.splitlines()``.
@@ -184,6 +331,19 @@ def joinlines(lines: TextLines, newline: str = "\n") -> str:
     return "".join(f"{line}{newline}" for line in lines)
 
 
+def git_hash_object(data: bytes) -> str:
+    """Return the hash Git would give to a blob with the given content
+
+    This is the same as the output of ``git hash-object`` for a file with the content.
+
+    >>> git_hash_object(b"")
+    'e69de29bb2d1d6434b8b29ae775ad8c2e48c5391'
+
+    """
+    header = f"blob {len(data)}\0".encode("ascii")
+    return hashlib.sha1(header + data).hexdigest()
+
+
 def get_path_ancestry(path: Path) -> Iterable[Path]:
     reverse_parents = reversed(path.parents)
     if path.is_dir():